@@ -7,31 +7,58 @@ using the SerpApi service. It performs the following tasks:
 4. Iteratively retrieves all available reviews for the given place, handling pagination automatically.
 5. Saves the place information and reviews into a structured JSON file for offline use or analysis.
 6. Displays a few sample reviews in the console for quick reference.
+7. Supports an incremental mode that fetches only reviews newer than the ones already saved
+   and merges them into the existing JSON file.
+8. Records stage timings, SerpApi request latency, credits and pages per place, exported
+   to metrics/collector.json and metrics/collector.prom (see pipeline_metrics.py).
+9. Keeps reviews as compact records (see review_records.py) projected while each page is
+   parsed; set REVIEW_PAYLOAD=full to keep and save the raw SerpApi payload instead.
+10. Collects any number of place IDs in one run (`google-reviews collect`, see reviews_cli.py),
+    each saved as `<title>_<place_id>.json`.
 The script is modular, with separate functions for validation, fetching data, saving files, 
 and displaying results, making it easy to adapt or extend for different places or use cases.
 """
 
-from serpapi import GoogleSearch
 from urllib.parse import parse_qsl
 import json
 import os
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
+# Load environment variables from .env file (before the shared modules read their settings)
 load_dotenv()
 
+from serpapi_cache import cached_search, OFFLINE_MODE, google_search_class
+from pipeline_metrics import metrics, PAGE_BUCKETS
+from review_records import parse_reviews, review_dicts
+
 API_KEY = os.getenv("API")  # Your SerpApi API key
 
+# When the output file already exists, only fetch reviews that are not in it yet
+INCREMENTAL_MODE = True
+
+# Folder holding per-place pagination checkpoints of unfinished crawls
+CHECKPOINT_DIR = "checkpoints"
+
+# "json" keeps all reviews in memory and writes one file at the end,
+# "jsonl" appends every page to a .jsonl file as soon as it arrives
+OUTPUT_FORMAT = "json"
+EXPORT_JSON_AFTER_STREAM = False  # With "jsonl", also write the classic JSON file at the end
+
+# Folder of the Parquet review store (see review_store.py); leave empty to disable
+PARQUET_STORE_DIR = os.getenv("PARQUET_STORE_DIR", "")
+
+# SQLite review index with full-text search (see review_index.py); leave empty to disable
+REVIEW_INDEX_DB = os.getenv("REVIEW_INDEX_DB", "")
+
 def validate_api_key(api_key):
     """
-    Validate the SerpApi key by making a simple test request.
+    Validate the SerpApi key through the Account API, which does not use search credits.
+    Skipped in offline mode, where no request is sent.
     """
-    test_params = {
-        "engine": "google_maps",
-        "q": "Test",
-        "api_key": api_key
-    }
-    response = GoogleSearch(test_params).get_dict()
+    if OFFLINE_MODE:
+        return
+
+    response = google_search_class()({"api_key": api_key}).get_account()
 
     if "error" in response:
         raise Exception(f"SerpApi Error: {response['error']}")
@@ -48,7 +75,7 @@ def get_place_info(api_key, place_id):
         "hl": "en"
     }
 
-    result = GoogleSearch(params).get_dict()
+    result = cached_search(params)
 
     if "error" in result:
         raise Exception(f"SerpApi Error: {result['error']}")
@@ -67,49 +94,275 @@ def get_place_info(api_key, place_id):
     } if place_data else {}
 
 
-def fetch_reviews(api_key, place_id):
+def get_checkpoint_path(place_id):
     """
-    Fetch all available reviews for a given Place ID.
+    Build the checkpoint filename used for a place.
+    """
+    return os.path.join(CHECKPOINT_DIR, f"{place_id}.json")
+
+
+def get_checkpoint_reviews_path(place_id):
+    """
+    Build the filename of the JSONL file holding the reviews of an unfinished crawl.
     """
+    return os.path.join(CHECKPOINT_DIR, f"{place_id}.reviews.jsonl")
+
+
+def load_checkpoint(place_id):
+    """
+    Load the checkpoint of an unfinished crawl, or return None if there is none.
+    """
+    path = get_checkpoint_path(place_id)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(place_id, params, reviews_offset=None, jsonl_offset=None):
+    """
+    Save the params of the next page and the size, after the last complete page, of either
+    the checkpoint's reviews JSONL file or, for JSONL streaming, the output file.
+    The file is replaced atomically so a crash never leaves a half-written checkpoint.
+    """
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = get_checkpoint_path(place_id)
+    data = {
+        "place_id": place_id,
+        "params": {k: v for k, v in params.items() if k != "api_key"}
+    }
+    if reviews_offset is not None:
+        data["reviews_offset"] = reviews_offset
+    if jsonl_offset is not None:
+        data["jsonl_offset"] = jsonl_offset
+
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def clear_checkpoint(place_id):
+    """
+    Remove the checkpoint of a place once its reviews have been saved.
+    """
+    for path in (get_checkpoint_path(place_id), get_checkpoint_reviews_path(place_id)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def iter_review_pages(api_key, place_id, known_review_ids=None, start_params=None):
+    """
+    Yield the reviews of a place one page at a time, as each page arrives.
+
+    Each item is a tuple (page_reviews, next_params), where next_params are the
+    request params of the following page (None on the last page). If
+    `known_review_ids` is given, reviews are fetched newest first, only unknown
+    reviews are yielded, and pagination stops at the first page without any.
+    `start_params` resumes pagination from a previously saved page.
+    """
+    incremental = known_review_ids is not None
+
     params = {
         "engine": "google_maps_reviews",
         "place_id": place_id,
         "api_key": api_key,
         "hl": "en",
-        "sort_by": "qualityScore"
+        "sort_by": "newestFirst" if incremental else "qualityScore"
     }
-
-    search = GoogleSearch(params)
-    reviews = []
+    if start_params:
+        params.update(start_params)
 
     while True:
-        result = search.get_dict()
+        result = cached_search(params)
 
         if "error" in result:
             raise Exception(f"SerpApi Error: {result['error']}")
 
-        reviews.extend(result.get("reviews", []))
+        page_reviews = parse_reviews(result.get("reviews", []))
+
+        if incremental:
+            page_reviews = [r for r in page_reviews if r.get("review_id") not in known_review_ids]
+            if not page_reviews:
+                return
 
         pagination = result.get("serpapi_pagination", {})
         next_page = pagination.get("next")
         next_page_token = pagination.get("next_page_token")
 
         if next_page and next_page_token:
-            search.params_dict.update(dict(parse_qsl(next_page.split('?', 1)[1])))
+            params.update(dict(parse_qsl(next_page.split('?', 1)[1])))
+            yield page_reviews, params
         else:
-            break
+            yield page_reviews, None
+            return
+
+
+def _resume_params(place_id, known_review_ids, checkpoint_key):
+    """
+    Return the checkpoint of a place if it was saved by the same kind of crawl, else None.
+    """
+    checkpoint = load_checkpoint(place_id)
+    sort_by = "newestFirst" if known_review_ids is not None else "qualityScore"
+
+    if checkpoint and checkpoint_key in checkpoint and checkpoint["params"].get("sort_by") == sort_by:
+        return checkpoint
+    return None
+
 
+def fetch_reviews(api_key, place_id, known_review_ids=None):
+    """
+    Fetch all available reviews for a given Place ID.
+
+    If `known_review_ids` is given, reviews are fetched newest first and pagination
+    stops at the first page that contains no unknown review_id. Only the new
+    reviews are returned.
+
+    After every page a checkpoint is saved: the page's reviews are appended to a JSONL file
+    next to it, so each checkpoint writes one page instead of every review so far. If a
+    checkpoint for the same sort order exists, fetching resumes from it instead of starting
+    from the first page.
+    """
+    reviews = []
+    start_params = None
+    reviews_path = get_checkpoint_reviews_path(place_id)
+
+    checkpoint = _resume_params(place_id, known_review_ids, "reviews_offset")
+    if checkpoint and os.path.exists(reviews_path):
+        start_params = checkpoint["params"]
+        with open(reviews_path, "r+b") as f:
+            f.truncate(checkpoint["reviews_offset"])
+        reviews = parse_reviews(read_reviews_jsonl(reviews_path))
+        print(f"↩️ Resuming from checkpoint ({len(reviews)} reviews already fetched)")
+    elif os.path.exists(reviews_path):
+        os.remove(reviews_path)
+
+    pages = 0
+    for page_reviews, next_params in iter_review_pages(api_key, place_id, known_review_ids, start_params):
+        pages += 1
+        reviews.extend(page_reviews)
+        if next_params:
+            os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+            with open(reviews_path, "a", encoding="utf-8") as f:
+                for review in review_dicts(page_reviews):
+                    f.write(json.dumps(review, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+                save_checkpoint(place_id, next_params, reviews_offset=f.tell())
+
+    metrics.observe("serpapi_pages_per_place", pages, buckets=PAGE_BUCKETS)
     return reviews
 
 
+def stream_reviews_to_jsonl(api_key, place_id, filename, known_review_ids=None):
+    """
+    Append the reviews of a place to a JSONL file (one review per line) page by page,
+    so memory stays flat and readers can start on partial data.
+    Returns the number of reviews written.
+
+    The checkpoint stores the file size after the last complete page. On resume the
+    file is cut back to that size and the crawl continues from the next page.
+    """
+    start_params = None
+    written = 0
+
+    checkpoint = _resume_params(place_id, known_review_ids, "jsonl_offset")
+    if checkpoint and os.path.exists(filename):
+        start_params = checkpoint["params"]
+        with open(filename, "r+b") as f:
+            f.truncate(checkpoint["jsonl_offset"])
+        print("↩️ Resuming from checkpoint")
+
+    pages = 0
+    with open(filename, "a", encoding="utf-8") as f:
+        for page_reviews, next_params in iter_review_pages(api_key, place_id, known_review_ids, start_params):
+            pages += 1
+            for review in review_dicts(page_reviews):
+                f.write(json.dumps({"place_id": place_id, **review}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            written += len(page_reviews)
+
+            if next_params:
+                save_checkpoint(place_id, next_params, jsonl_offset=f.tell())
+
+    metrics.observe("serpapi_pages_per_place", pages, buckets=PAGE_BUCKETS)
+    return written
+
+
+def read_reviews_jsonl(filename):
+    """
+    Yield reviews from a JSONL file one at a time. A partially written last line is skipped.
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def get_output_filename(place_info, extension="json"):
+    """
+    Build the output filename used for a place: `<title>_<place_id>`, like the files in
+    Samples/Motilal/reviews, so branches sharing a title do not overwrite each other.
+    A file of the same place saved under the older `<title>_reviews` name keeps being used.
+    """
+    safe_title = place_info['title'].replace(' ', '_').replace('/', '_').lower()
+    legacy_filename = f"{safe_title}_reviews.{extension}"
+    if os.path.exists(legacy_filename) and saved_place_id(legacy_filename) in (None, place_info["place_id"]):
+        return legacy_filename
+    return f"{safe_title}_{place_info['place_id']}.{extension}"
+
+
+def saved_place_id(filename):
+    """place_id recorded in a saved JSON file, or None when unknown (e.g. JSONL files)."""
+    if not filename.endswith(".json"):
+        return None
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            return (json.load(f).get("place_info") or {}).get("place_id")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def load_saved_reviews(filename):
+    """
+    Load previously saved reviews from a JSON file, or return an empty list if there is none.
+    """
+    if not os.path.exists(filename):
+        return []
+
+    with open(filename, "r", encoding="utf-8") as f:
+        return parse_reviews(json.load(f).get("reviews", []))
+
+
+def merge_reviews(new_reviews, saved_reviews):
+    """
+    Put newly fetched reviews in front of the saved ones, dropping duplicate review_ids.
+    """
+    merged = []
+    seen = set()
+
+    for review in new_reviews + saved_reviews:
+        review_id = review.get("review_id")
+        if review_id:
+            if review_id in seen:
+                continue
+            seen.add(review_id)
+        merged.append(review)
+
+    return merged
+
+
 def save_to_file(place_info, reviews):
     """
     Save place info and reviews to a JSON file.
     """
-    filename = f"{place_info['title'].replace(' ', '_').replace('/', '_').lower()}_reviews.json"
+    filename = get_output_filename(place_info)
     data = {
         "place_info": place_info,
-        "reviews": reviews,
+        "reviews": review_dicts(reviews),
         "total_reviews": len(reviews)
     }
 
@@ -119,6 +372,32 @@ def save_to_file(place_info, reviews):
     print(f"\n✅ Place info and reviews saved to: {filename}")
 
 
+def save_to_store(place_id, reviews, full_snapshot):
+    """
+    Write reviews to the Parquet review store: a full crawl replaces the place, an incremental one appends.
+    """
+    # Imported here so pyarrow is only needed when the store is enabled
+    from review_store import append_reviews, replace_place
+
+    if full_snapshot:
+        replace_place(PARQUET_STORE_DIR, place_id, reviews)
+    else:
+        append_reviews(PARQUET_STORE_DIR, place_id, reviews)
+    print(f"✅ Wrote {len(reviews)} reviews to the review store: {PARQUET_STORE_DIR}")
+
+
+def save_to_index(place_info, reviews):
+    """
+    Add reviews to the SQLite review index. Reviews already indexed are updated, not duplicated.
+    """
+    from review_index import connect, index_reviews
+
+    conn = connect(REVIEW_INDEX_DB)
+    count = index_reviews(conn, place_info, reviews)
+    conn.close()
+    print(f"✅ Indexed {count} reviews in: {REVIEW_INDEX_DB}")
+
+
 def display_sample_reviews(reviews, count=3):
     """
     Display a few sample reviews.
@@ -127,47 +406,119 @@ def display_sample_reviews(reviews, count=3):
     for i, review in enumerate(reviews[:count]):
         print(f"\nReview {i + 1}:")
         print(f"Rating: {review.get('rating', 'N/A')} stars")
-        print(f"Date: {review.get('date', 'N/A')}")
+        print(f"Date: {review.get('date') or review.get('iso_date', 'N/A')}")
         print(f"Text: {review.get('snippet', 'N/A')[:200]}...")
 
 
-def main():
-    try:
-        # Validate API key
-        validate_api_key(API_KEY)
+def stream_place_reviews(place_info):
+    """
+    Stream the reviews of a place into its JSONL file, optionally exporting the classic JSON file at the end.
+    """
+    place_id = place_info["place_id"]
+    jsonl_filename = get_output_filename(place_info, "jsonl")
 
-        # Replace this with your desired place ID
-        place_id = "ChIJDT4-m02FXjkRL0OGzSj-W18"
-        print(f"🔍 Using Place ID: {place_id}")
+    # An unfinished crawl keeps the mode it was started with
+    checkpoint = load_checkpoint(place_id)
+    if checkpoint and "jsonl_offset" in checkpoint:
+        incremental = checkpoint["params"].get("sort_by") == "newestFirst"
+    else:
+        incremental = INCREMENTAL_MODE and os.path.exists(jsonl_filename)
 
-        # Get place information
-        place_info = get_place_info(API_KEY, place_id)
+    known_review_ids = None
+    if incremental:
+        known_review_ids = {r.get("review_id") for r in read_reviews_jsonl(jsonl_filename) if r.get("review_id")}
+        print(f"\n⏳ Streaming new reviews ({len(known_review_ids)} already saved)...")
+    else:
+        print("\n⏳ Streaming reviews...")
+
+    written = stream_reviews_to_jsonl(API_KEY, place_id, jsonl_filename, known_review_ids)
+    clear_checkpoint(place_id)
+    print(f"✅ Wrote {written} reviews to: {jsonl_filename}")
+
+    if EXPORT_JSON_AFTER_STREAM:
+        save_to_file(place_info, list(read_reviews_jsonl(jsonl_filename)))
 
-        if not place_info or not place_info.get("title"):
-            print("⚠️ Failed to retrieve place information. Please check the Place ID.")
-            return
 
-        # Print place info
-        print(f"\n🏢 Place: {place_info['title']}")
-        print(f"📍 Address: {place_info['address']}")
-        print(f"⭐ Rating: {place_info['rating']} ({place_info['reviews_count']} reviews)")
-        print(f"📞 Phone: {place_info['phone']}")
-        print(f"🌐 Website: {place_info['website']}")
+def collect_place(place_id):
+    """Fetch (or refresh) one place's reviews and save them. Returns False if the place was not found."""
+    print(f"🔍 Using Place ID: {place_id}")
 
-        # Fetch reviews
+    # Get place information
+    with metrics.stage("collector.place_info"):
+        place_info = get_place_info(API_KEY, place_id)
+
+    if not place_info or not place_info.get("title"):
+        print("⚠️ Failed to retrieve place information. Please check the Place ID.")
+        return False
+
+    # Print place info
+    print(f"\n🏢 Place: {place_info['title']}")
+    print(f"📍 Address: {place_info['address']}")
+    print(f"⭐ Rating: {place_info['rating']} ({place_info['reviews_count']} reviews)")
+    print(f"📞 Phone: {place_info['phone']}")
+    print(f"🌐 Website: {place_info['website']}")
+
+    if OUTPUT_FORMAT == "jsonl":
+        with metrics.stage("collector.reviews"):
+            stream_place_reviews(place_info)
+        return True
+
+    # Fetch reviews (only the new ones if we already have a saved file)
+    saved_reviews = load_saved_reviews(get_output_filename(place_info)) if INCREMENTAL_MODE else []
+
+    if saved_reviews:
+        print(f"\n⏳ Fetching new reviews ({len(saved_reviews)} already saved)...")
+        known_review_ids = {r.get("review_id") for r in saved_reviews if r.get("review_id")}
+        with metrics.stage("collector.reviews"):
+            new_reviews = fetch_reviews(API_KEY, place_id, known_review_ids)
+        print(f"✅ Fetched {len(new_reviews)} new reviews.")
+        reviews = merge_reviews(new_reviews, saved_reviews)
+    else:
         print("\n⏳ Fetching reviews...")
-        reviews = fetch_reviews(API_KEY, place_id)
+        with metrics.stage("collector.reviews"):
+            reviews = new_reviews = fetch_reviews(API_KEY, place_id)
         print(f"✅ Fetched {len(reviews)} reviews.")
 
-        # Save results to file
+    # Save results to file
+    with metrics.stage("collector.save"):
         save_to_file(place_info, reviews)
+        if PARQUET_STORE_DIR:
+            save_to_store(place_id, review_dicts(new_reviews), full_snapshot=not saved_reviews)
+        if REVIEW_INDEX_DB:
+            save_to_index(place_info, review_dicts(new_reviews))
+    clear_checkpoint(place_id)
+
+    # Display sample reviews
+    if reviews:
+        display_sample_reviews(reviews)
+    return True
 
-        # Display sample reviews
-        if reviews:
-            display_sample_reviews(reviews)
 
+def main(place_ids=None):
+    """
+    Collect the given places (one after another, with one metrics export for the run).
+    Returns True when every place was collected.
+    """
+    # Replace this with your desired place ID (or pass place IDs: `google-reviews collect ...`)
+    place_ids = place_ids or ["ChIJDT4-m02FXjkRL0OGzSj-W18"]
+    failed = 0
+    try:
+        # Validate API key
+        validate_api_key(API_KEY)
+
+        for place_id in place_ids:
+            try:
+                if not collect_place(place_id):
+                    failed += 1
+            except Exception as e:
+                failed += 1
+                print(f"\n❌ Error: {e}")
     except Exception as e:
+        failed = len(place_ids)
         print(f"\n❌ Error: {e}")
+    finally:
+        metrics.export("collector")
+    return failed == 0
 
 
 if __name__ == "__main__":
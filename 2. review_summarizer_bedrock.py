@@ -8,12 +8,39 @@ Key functionalities include:
 2. Counting tokens for reviews using OpenAI’s tiktoken library to respect model token limits.
 3. Using AWS Bedrock’s "meta.llama3-70b-instruct-v1:0" model for intelligent text summarization.
 4. Automatically splitting long review sets into manageable chunks and summarizing each separately.
-5. Aggregating all partial summaries into one cohesive final report covering:
+   The CSV is read in blocks and each block is tokenized in one batch, so every review is
+   counted once and chunks are built in the same pass with bounded memory.
+   Chunk boundaries are content-defined and chunk summaries are cached on disk, so a re-run
+   only pays Bedrock for new or changed chunks (plus the final merge).
+5. Summarizing chunks concurrently (bounded number of parallel Bedrock calls) and merging the
+   partial summaries in fixed-size groups, level by level, into one cohesive final report covering:
    - Overall sentiment
    - Pros and positive feedback
    - Cons or complaints
    - Key features and themes
-6. Providing a simple CLI interface where users input a CSV file path containing a “review” column.
+6. Optionally routing reviews to the five areas with a deterministic keyword tagger
+   (category_tagger.py) and summarizing each area only from the reviews that mention it.
+7. Optionally collapsing near-duplicate reviews (stock phrases, copy-pasted or templated text)
+   with MinHash LSH (near_duplicates.py, DEDUP_REVIEWS=1): each cluster is sent once with its
+   size, and the token reduction is reported.
+8. A token-budgeted sample mode (review_sampler.py): a stratified (rating x period), TF-IDF
+   diversified subset within a fixed token budget is summarized together with the counts of
+   all reviews, so large and small branches cost the same.
+9. Retrying throttled or transient Bedrock errors with jittered exponential backoff, under an
+   adaptive concurrency limit that halves on throttling and grows back as calls succeed.
+10. Streaming the final summary with Bedrock's response stream API, so the CLI prints text as
+    soon as it is generated. A local fake client (fake_bedrock.py, BEDROCK_FAKE=1) simulates
+    latency and throttling for testing, and replays replies recorded with BEDROCK_RECORDINGS.
+11. A batch mode over the combined CSV of Samples/Motilal/app.py: reviews are grouped by place_id,
+    small branches are packed together into shared prompts, and every branch summary plus a
+    brand-level rollup runs through one pool of Bedrock calls under a global concurrency limit
+    and an optional tokens-per-minute budget. The same prompts can instead be written as an
+    offline Bedrock batch-inference JSONL job.
+12. Recording tokenization and summarization time, Bedrock latency, retries and input/output
+    tokens per call, exported to metrics/summarizer.json and metrics/summarizer.prom.
+13. Providing a simple CLI interface where users input a CSV file path containing a “review” column
+    or the combined CSV with its “review_text” column (or `google-reviews summarize <csv>`, see reviews_cli.py).
+14. Importing boto3, pandas, numpy and the tokenizer only when a run first needs them.
 
 This design ensures scalability for large review datasets, efficient token usage, 
 and detailed, actionable insights for business analysis or reputation monitoring.
@@ -22,172 +49,979 @@ and detailed, actionable insights for business analysis or reputation monitoring
 
 import os
 import json
+import time
+import random
+import re
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 import dotenv
-import boto3
-import pandas as pd
-import tiktoken
+
+from category_tagger import CategoryTagger
+from pipeline_metrics import metrics
 
 # Load environment variables
 dotenv.load_dotenv()
 
-# Token counter setup
-tokenizer = tiktoken.get_encoding("cl100k_base")
+# Token counter setup. boto3, pandas, tiktoken and numpy are imported where they are first
+# needed, so loading this script (e.g. from reviews_cli.py) takes milliseconds
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+TOKENIZER_THREADS = 8  # Threads used by tiktoken's batch encoder
+CSV_BLOCK_SIZE = 50000  # Rows read from the CSV at a time
+
+def get_tokenizer():
+    """The cl100k_base encoding, loaded on first use."""
+    global _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding("cl100k_base")
+        return _tokenizer
 
 def count_tokens_simple(text: str) -> int:
     """Simple token counter function"""
     if not text:
         return 0
-    return len(tokenizer.encode(text))
+    return len(get_tokenizer().encode(text))
+
+def count_tokens_batch(texts) -> list:
+    """Count tokens for many texts at once, encoding them across worker threads."""
+    with metrics.stage("summarizer.tokenize"):
+        return [len(tokens) for tokens in get_tokenizer().encode_ordinary_batch(texts, num_threads=TOKENIZER_THREADS)]
+
+def iter_review_blocks(csv_path: str, column: str = "review", block_size: int = None):
+    """
+    Yield the non-empty values of one CSV column, block_size rows at a time.
+    The combined CSV of Samples/Motilal/app.py is read from its review_text column.
+    A folder is read as a Parquet review store (see review_store.py), loading only the snippet column.
+    """
+    if os.path.isdir(csv_path):
+        from review_store import iter_review_batches
+        for batch in iter_review_batches(csv_path, columns=["snippet"], batch_size=block_size or CSV_BLOCK_SIZE):
+            yield [review for review in batch.column(0).to_pylist() if review]
+        return
+
+    import pandas as pd
+    header = pd.read_csv(csv_path, nrows=0).columns
+    if column == "review" and column not in header and "review_text" in header:
+        column = "review_text"
+    if column not in header:
+        raise ValueError("CSV must contain a 'review' or 'review_text' column." if column == "review" else f"CSV must contain a '{column}' column.")
+
+    for block in pd.read_csv(csv_path, usecols=[column], chunksize=block_size or CSV_BLOCK_SIZE):
+        yield block[column].dropna().astype(str).tolist()
 
 MAX_TOKENS_PER_CHUNK = 7500  
+# Content-defined chunk boundaries: once a chunk holds MIN_TOKENS_PER_CHUNK tokens, it ends
+# after any review whose hash is divisible by CHUNK_BOUNDARY_DIVISOR. Boundaries therefore
+# depend only on nearby reviews, and adding reviews leaves the other chunks unchanged.
+MIN_TOKENS_PER_CHUNK = 3000
+CHUNK_BOUNDARY_DIVISOR = 32
+SUMMARY_CACHE_DIR = ".summary_cache"
+MAX_CONCURRENT_REQUESTS = 4  # Bedrock calls running at the same time
+REDUCE_GROUP_SIZE = 4  # Partial summaries merged per reduce call
+# Send one representative per cluster of near-duplicate reviews ("1"). Clustering needs every
+# review in memory at once, so by default the CSV is streamed block by block instead
+DEDUP_REVIEWS = os.getenv("DEDUP_REVIEWS", "0") == "1"
+SAMPLE_TOKEN_BUDGET = int(os.getenv("SAMPLE_TOKEN_BUDGET", "6000"))  # Review tokens sent in sample mode
+
+# Retries of throttled or transient Bedrock errors
+MAX_RETRIES = 6
+RETRY_BASE_DELAY = 1.0  # Seconds; doubled per attempt, with full jitter
+RETRY_MAX_DELAY = 30.0
+THROTTLING_ERROR_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceQuotaExceededException"}
+RETRYABLE_ERROR_CODES = THROTTLING_ERROR_CODES | {
+    "ServiceUnavailableException", "InternalServerException", "ModelNotReadyException", "ModelTimeoutException"
+}
+DECREASE_INTERVAL = 1.0  # Throttles within this many seconds of a decrease count as one
+MAX_GEN_LEN = 1024
+
+# Global Bedrock token budget (prompt + max generation tokens per minute); 0 means unlimited
+BEDROCK_TOKENS_PER_MINUTE = int(os.getenv("BEDROCK_TOKENS_PER_MINUTE", "0"))
+
+# Batch mode (one summary per branch of the combined CSV, plus a brand rollup)
+SMALL_BRANCH_TOKENS = 1500  # Branches up to this size are packed together into shared prompts
+MAX_BRANCHES_PER_PROMPT = 4  # Keeps each branch's part of the 1024 generated tokens useful
+BATCH_OUTPUT_DIR = "batch_summaries"
+BATCH_JOB_FILE = os.getenv("BATCH_JOB_FILE", "")  # Write a batch-inference JSONL job instead of calling Bedrock
+
+
+SUMMARY_PROMPT_TEMPLATE = """
+
+You are an AI assistant that reads Google reviews and summarizes key feedback to help business owners improve their services.
+
+Focus on these 5 areas:
+
+Customer Experience: Overall feelings, staff behavior, and satisfaction.
+
+Product / Service Quality: Quality, reliability, and performance.
+
+Pricing and Charges: Fairness, transparency, value, and billing issues.
+
+Digital Platform Experience: Usability and functionality of website, app, or online tools.
+
+Support and Issue Resolution: Responsiveness, helpfulness, and problem-solving effectiveness.
+
+For each area, provide:
+
+A clear sentiment overview (e.g., percentage positive/negative/neutral if possible).
+
+Key themes or examples mentioned frequently by customers.
+
+Any notable praise or common complaints.
+
+If a category is not discussed, write “Not mentioned.”
+
+Conclude with a brief overall summary highlighting major strengths and any clear improvement areas.
+
+Keep language simple, actionable, and focused on what business owners can learn.
+
+Avoid rewriting full reviews or including unrelated content.   
+
+Review Text:
+{reviews}
+"""
+
+
+SECTION_PROMPT_TEMPLATE = """
+You are an AI assistant that reads Google reviews and summarizes key feedback to help business owners improve their services.
+
+The reviews below were selected because they mention {category}. Summarize only what customers say about {category}:
+
+A clear sentiment overview (e.g., percentage positive/negative/neutral if possible).
+
+Key themes or examples mentioned frequently by customers.
+
+Any notable praise or common complaints.
+
+Keep language simple, actionable, and focused on what business owners can learn.
+
+Review Text:
+{reviews}
+"""
+
+
+SAMPLE_PROMPT_TEMPLATE = SUMMARY_PROMPT_TEMPLATE.replace(
+    "Review Text:\n{reviews}",
+    "The reviews below are a representative sample. Base any percentages on these counts of ALL reviews:\n"
+    "{statistics}\n\n"
+    "Sampled Review Text (grouped by rating and period):\n{reviews}"
+)
+
+
+PACKED_PROMPT_TEMPLATE = """
+You are an AI assistant that reads Google reviews and summarizes key feedback to help business owners improve their services.
+
+The reviews below belong to several branches. Summarize each branch separately and briefly: overall sentiment, notable praise and common complaints about Customer Experience, Product / Service Quality, Pricing and Charges, Digital Platform Experience and Support and Issue Resolution (skip areas that are not mentioned).
+
+Start each branch's summary with its marker line exactly as given (for example "=== BRANCH 1 ===") and never mix reviews of different branches.
+
+{reviews}
+"""
+
+BRANCH_MARKER = "=== BRANCH {} ==="
+BRANCH_MARKER_PATTERN = re.compile(r"^\W*=+ BRANCH (\d+) =+\W*$", re.MULTILINE)
+
+
+def format_representative(review: str, count: int) -> str:
+    """Prompt line for a cluster of near-duplicate reviews."""
+    if count == 1:
+        return review
+    return f"[{count} similar reviews] {review}"
+
+
+def is_chunk_boundary(review: str) -> bool:
+    """Stable (process independent) decision whether a chunk may end after this review."""
+    digest = hashlib.md5(review.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % CHUNK_BOUNDARY_DIVISOR == 0
+
+
+class SummaryCache:
+    """
+    On-disk cache of chunk summaries keyed by a hash of the chunk text, the prompt
+    template and the model ID. Keeps hit/miss counts and the Bedrock tokens saved.
+    """
+
+    def __init__(self, cache_dir: str, model_id: str):
+        self.cache_dir = cache_dir
+        self.model_id = model_id
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.lock = threading.Lock()
+
+    def key(self, chunk_text: str, prompt_template: str) -> str:
+        payload = "\0".join([self.model_id, prompt_template, chunk_text])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, chunk_text: str, prompt_template: str):
+        """Return the cached summary for this chunk, or None."""
+        try:
+            with open(self._path(self.key(chunk_text, prompt_template)), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+            self.tokens_saved += entry.get("input_tokens", 0) + entry.get("output_tokens", 0)
+        return entry["summary"]
+
+    def put(self, chunk_text: str, prompt_template: str, summary: str, input_tokens: int, output_tokens: int):
+        path = self._path(self.key(chunk_text, prompt_template))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "model_id": self.model_id,
+            "summary": summary,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens
+        }
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def report(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "chunks": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "tokens_saved": self.tokens_saved
+        }
+
+
+def error_code(error) -> str:
+    """Error code of a botocore ClientError (or anything with the same `response` shape)."""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code", "")
+    return ""
+
+
+def retry_delay(attempt: int) -> float:
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every Bedrock call so the combined token usage never
+    exceeds `rate` tokens per second (with bursts up to `capacity`).
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount):
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def load_branches(csv_path: str) -> list:
+    """
+    Group the combined CSV (Samples/Motilal/app.py) by place_id. Returns a list of
+    {"place_id", "name", "reviews", "tokens"} dicts, one per branch, in file order, with
+    per-review token counts computed in one batch.
+    """
+    import pandas as pd
+    header = pd.read_csv(csv_path, nrows=0).columns
+    if "place_id" not in header:
+        raise ValueError("CSV must contain a 'place_id' column for batch mode.")
+    text_column = "review_text" if "review_text" in header else "review"
+    if text_column not in header:
+        raise ValueError("CSV must contain a 'review_text' or 'review' column.")
+
+    columns = [c for c in ("place_id", "branch_name", text_column) if c in header]
+    df = pd.read_csv(csv_path, usecols=columns, dtype="string").dropna(subset=["place_id", text_column])
+    df["tokens"] = count_tokens_batch(df[text_column].tolist())
+
+    branches = []
+    for place_id, group in df.groupby("place_id", sort=False):
+        name = group["branch_name"].dropna().iloc[0] if "branch_name" in group and group["branch_name"].notna().any() else place_id
+        branches.append({
+            "place_id": place_id,
+            "name": name,
+            "reviews": group[text_column].tolist(),
+            "tokens": group["tokens"].tolist()
+        })
+    return branches
+
+
+def split_packed_summary(text: str, count: int) -> dict:
+    """Split the reply to a packed prompt into {branch number: summary}."""
+    parts = BRANCH_MARKER_PATTERN.split(text)
+    summaries = {}
+    for number, summary in zip(parts[1::2], parts[2::2]):
+        if 1 <= int(number) <= count and summary.strip():
+            summaries[int(number)] = summary.strip()
+    return summaries
+
+
+class BedrockStreamError(Exception):
+    """An error event received inside a response stream."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on concurrent Bedrock calls: halves on throttling (at most once per
+    DECREASE_INTERVAL) and grows by about one call per `limit` successful calls, up to max_limit.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.throttles = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, outcome: str = "success"):
+        """Free a slot; outcome is "success", "throttled" or "error"."""
+        with self.condition:
+            self.in_flight -= 1
+            if outcome == "throttled":
+                self.throttles += 1
+                now = time.monotonic()
+                if now - self.last_decrease >= DECREASE_INTERVAL:
+                    self.limit = max(1.0, self.limit / 2)
+                    self.last_decrease = now
+            elif outcome == "success":
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self.condition.notify_all()
 
 
 class ReviewSummarizer:
-    def __init__(self):
+    def __init__(self, client=None, max_concurrency=MAX_CONCURRENT_REQUESTS, cache_dir=SUMMARY_CACHE_DIR, dedup=DEDUP_REVIEWS,
+                 on_text=None):
         self.aws_region = "ap-south-1"
         self.model_id = "meta.llama3-70b-instruct-v1:0"
-        self.client = boto3.client(
-            service_name="bedrock-runtime",
-            region_name=self.aws_region,
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+        self.max_concurrency = max_concurrency
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.token_bucket = (
+            TokenBucket(BEDROCK_TOKENS_PER_MINUTE / 60, BEDROCK_TOKENS_PER_MINUTE) if BEDROCK_TOKENS_PER_MINUTE else None
         )
+        # Called with each piece of the final summary as it is generated (streaming)
+        self.on_text = on_text
+        self.dedup = dedup
+        self.dedup_report = None  # Filled by deduplicate_reviews()
+        # Pass cache_dir=None to always call Bedrock
+        self.summary_cache = SummaryCache(cache_dir, self.model_id) if cache_dir else None
+        # Any object with bedrock-runtime style invoke_model() / invoke_model_with_response_stream()
+        # can be passed in (e.g. fake_bedrock.FakeBedrockClient)
+        self.client = client
+        if client is None:
+            import boto3
+            self.client = boto3.client(
+                service_name="bedrock-runtime",
+                region_name=self.aws_region,
+                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+            )
 
-    def call_llama3(self, prompt: str) -> str:
+    def _request_body(self, prompt: str) -> str:
         formatted_prompt = f"<|begin_of_text|><|start_header_id|>user<|end_header_id|>\n\n{prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n"
         body = {
             "prompt": formatted_prompt,
-            "max_gen_len": 1024,
+            "max_gen_len": MAX_GEN_LEN,
             "temperature": 0.2,
         }
-        response = self.client.invoke_model(
-            modelId=self.model_id,
-            body=json.dumps(body),
-            contentType="application/json",
-            accept="application/json"
+        return json.dumps(body)
+
+    def call_llama3(self, prompt: str, on_text=None) -> str:
+        """
+        Generate a reply. With on_text, the response is streamed and on_text receives each piece
+        of text as it arrives. Throttled and transient errors are retried.
+        """
+        if self.token_bucket:
+            self.token_bucket.acquire(count_tokens_simple(prompt) + MAX_GEN_LEN)
+
+        if on_text:
+            pieces = []
+            for text in self.stream_llama3(prompt):
+                pieces.append(text)
+                on_text(text)
+            return "".join(pieces).strip()
+
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire()
+            try:
+                with metrics.request("bedrock", self.model_id):
+                    response = self.client.invoke_model(
+                        modelId=self.model_id,
+                        body=self._request_body(prompt),
+                        contentType="application/json",
+                        accept="application/json"
+                    )
+                    result = json.loads(response['body'].read())
+            except Exception as e:
+                self._release_after_error(e, attempt)
+                continue
+            self.limiter.release("success")
+            metrics.record_bedrock_tokens(result.get("prompt_token_count"), result.get("generation_token_count"))
+            return result.get('generation', '').strip()
+
+    def stream_llama3(self, prompt: str):
+        """
+        Yield the reply text piece by piece using invoke_model_with_response_stream.
+        Errors before the first piece are retried like call_llama3; later errors are raised,
+        since the caller has already received part of the text.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            started = False
+            invocation_metrics = {}
+            self.limiter.acquire()
+            try:
+                with metrics.request("bedrock", self.model_id):
+                    start = time.perf_counter()
+                    response = self.client.invoke_model_with_response_stream(
+                        modelId=self.model_id,
+                        body=self._request_body(prompt),
+                        contentType="application/json",
+                        accept="application/json"
+                    )
+                    for event in response["body"]:
+                        payload = self._stream_event_payload(event)
+                        # The last chunk carries the token counts of the whole call
+                        invocation_metrics = payload.get("amazon-bedrock-invocationMetrics", invocation_metrics)
+                        text = payload.get("generation", "")
+                        if text:
+                            if not started:
+                                metrics.observe("bedrock_time_to_first_token_seconds", time.perf_counter() - start)
+                            started = True
+                            yield text
+            except GeneratorExit:
+                # The caller stopped reading
+                self.limiter.release("error")
+                raise
+            except Exception as e:
+                if started:
+                    self.limiter.release("error")
+                    raise
+                self._release_after_error(e, attempt)
+                continue
+            self.limiter.release("success")
+            metrics.record_bedrock_tokens(invocation_metrics.get("inputTokenCount"), invocation_metrics.get("outputTokenCount"))
+            return
+
+    @staticmethod
+    def _stream_event_payload(event) -> dict:
+        if "chunk" in event:
+            return json.loads(event["chunk"]["bytes"])
+        # Error events, e.g. {"throttlingException": {"message": "..."}}
+        for key, error in event.items():
+            raise BedrockStreamError(key[0].upper() + key[1:], (error or {}).get("message", ""))
+        return {}
+
+    def _release_after_error(self, error, attempt):
+        """Free the limiter slot after a failed call, then re-raise or wait before the next attempt."""
+        code = error_code(error)
+        self.limiter.release("throttled" if code in THROTTLING_ERROR_CODES else "error")
+        metrics.inc("bedrock_errors_total", code=code or type(error).__name__)
+        if code not in RETRYABLE_ERROR_CODES or attempt == MAX_RETRIES:
+            raise error
+
+        delay = retry_delay(attempt)
+        print(f"⏳ {code}, retrying in {delay:.1f}s (concurrency limit {int(self.limiter.limit)})")
+        time.sleep(delay)
+
+    def pack_chunks(self, review_blocks, stable_boundaries=False):
+        """
+        Group reviews into chunks within MAX_TOKENS_PER_CHUNK in a single pass.
+        Takes an iterable of review lists (blocks) and yields (chunk, chunk_token_count).
+        Every review is tokenized exactly once, one batch per block.
+
+        With stable_boundaries, chunks also end at content-defined boundaries (see
+        is_chunk_boundary), so adding reviews only changes the chunks around them.
+        """
+        counted_reviews = (
+            (review, review_tokens)
+            for block in review_blocks
+            for review, review_tokens in zip(block, count_tokens_batch(block))
         )
-        result = json.loads(response['body'].read())
-        return result.get('generation', '').strip()
+        return self.pack_counted_reviews(counted_reviews, stable_boundaries)
 
-    def split_reviews_into_chunks(self, reviews_list):
-        """Split list of reviews into chunks within MAX_TOKENS_PER_CHUNK."""
-        chunks = []
+    def pack_counted_reviews(self, counted_reviews, stable_boundaries=False):
+        """Same as pack_chunks for (review, token_count) pairs that are already counted."""
         current_chunk = []
         current_token_count = 0
 
-        for review in reviews_list:
-            review_tokens = count_tokens_simple(review)
-            if current_token_count + review_tokens > MAX_TOKENS_PER_CHUNK:
-                # Save previous chunk and start new one
-                chunks.append(current_chunk)
-                current_chunk = [review]
-                current_token_count = review_tokens
-            else:
-                current_chunk.append(review)
-                current_token_count += review_tokens
+        for review, review_tokens in counted_reviews:
+            if current_chunk and current_token_count + review_tokens > MAX_TOKENS_PER_CHUNK:
+                # Emit previous chunk and start new one
+                yield current_chunk, current_token_count
+                current_chunk = []
+                current_token_count = 0
 
-        # Add last remaining chunk
+            current_chunk.append(review)
+            current_token_count += review_tokens
+
+            if stable_boundaries and current_token_count >= MIN_TOKENS_PER_CHUNK and is_chunk_boundary(review):
+                yield current_chunk, current_token_count
+                current_chunk = []
+                current_token_count = 0
+
+        # Emit last remaining chunk
         if current_chunk:
-            chunks.append(current_chunk)
+            yield current_chunk, current_token_count
+
+    def split_reviews_into_chunks(self, reviews_list):
+        """Split list of reviews into chunks within MAX_TOKENS_PER_CHUNK."""
+        return [chunk for chunk, _ in self.pack_chunks([reviews_list])]
 
-        return chunks
+    def deduplicate_reviews(self, review_blocks):
+        """
+        Cluster near-duplicate reviews and return one prompt line per cluster
+        (see format_representative). Cluster sizes and token counts are kept in self.dedup_report.
+        """
+        reviews = []
+        tokens_before = 0
+        for block in review_blocks:
+            reviews.extend(block)
+            tokens_before += sum(count_tokens_batch(block))
 
-    def summarize_reviews(self, csv_path: str) -> str:
-        df = pd.read_csv(csv_path)
-        if "review" not in df.columns:
-            raise ValueError("CSV must contain a 'review' column.")
+        from near_duplicates import find_near_duplicates
+        clusters = find_near_duplicates(reviews)
+        lines = [format_representative(review, count) for review, count in clusters.representatives()]
+        tokens_after = sum(count_tokens_batch(lines))
 
-        reviews_list = df["review"].dropna().astype(str).tolist()
-        total_tokens = sum(count_tokens_simple(r) for r in reviews_list)
+        self.dedup_report = {
+            "reviews": len(reviews),
+            "clusters": len(lines),
+            "cluster_sizes": clusters.sizes(),
+            "most_repeated": clusters.largest(),
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after
+        }
+        self.print_dedup_report()
+        return lines
 
-        print(f"📊 Total tokens in reviews: {total_tokens}")
+    def print_dedup_report(self):
+        report = self.dedup_report
+        if not report:
+            return
+        saved = report["tokens_before"] - report["tokens_after"]
+        share = saved / report["tokens_before"] if report["tokens_before"] else 0.0
+        print(
+            f"🧹 Near-duplicates: {report['reviews']} reviews -> {report['clusters']} distinct, "
+            f"{report['tokens_before']} -> {report['tokens_after']} tokens ({share:.0%} fewer)"
+        )
+        for review, count in report["most_repeated"][:3]:
+            print(f"   {count}x {review[:60]!r}")
 
-        if total_tokens <= MAX_TOKENS_PER_CHUNK:
-            # Single pass summarization
-            reviews_text = "\n".join(reviews_list)
-            return self._generate_summary_from_text(reviews_text)
+    def summarize_reviews(self, csv_path: str) -> str:
+        review_blocks = iter_review_blocks(csv_path)
+        if self.dedup:
+            review_blocks = [self.deduplicate_reviews(review_blocks)]
+        chunks = self.pack_chunks(review_blocks, stable_boundaries=True)
+
+        # Look ahead until the reviews are known to exceed one prompt
+        head = []
+        head_tokens = 0
+        for chunk, chunk_tokens in chunks:
+            head.append((chunk, chunk_tokens))
+            head_tokens += chunk_tokens
+            if head_tokens > MAX_TOKENS_PER_CHUNK:
+                break
         else:
-            # Multi-chunk processing
-            chunks = self.split_reviews_into_chunks(reviews_list)
-            print(f"📦 Splitting into {len(chunks)} chunks due to token limits.")
-            
-            partial_summaries = []
+            # Single pass summarization
+            print(f"📊 Total tokens in reviews: {head_tokens}")
+            reviews_text = "\n".join(review for chunk, _ in head for review in chunk)
+            return self._generate_summary_from_text(reviews_text, on_text=self.on_text)
+
+        # Multi-chunk processing: chunks are summarized while the CSV is still being read
+        print("📦 Splitting into chunks due to token limits.")
+        stats = {"tokens": 0, "chunks": 0}
+
+        def counted_chunks():
+            for chunk, chunk_tokens in chain(head, chunks):
+                stats["tokens"] += chunk_tokens
+                stats["chunks"] += 1
+                yield chunk
+
+        partial_summaries = self._map_summaries(counted_chunks())
+        print(f"📊 Total tokens in reviews: {stats['tokens']} ({stats['chunks']} chunks)")
+        self.print_cache_report()
+        return self._reduce_summaries(partial_summaries, on_text=self.on_text)
+
+    def summarize_by_category(self, csv_path: str, column: str = "review") -> str:
+        """
+        Tag every review with the summary areas (see category_tagger.py) and summarize each
+        area only from the reviews that mention it. Areas nobody mentions cost no Bedrock call.
+        """
+        tagger = CategoryTagger()
+        section_reviews = {category: [] for category in tagger.categories}
+
+        for block in iter_review_blocks(csv_path, column):
+            for review, categories in zip(block, tagger.tag_many(block)):
+                for category in categories:
+                    section_reviews[category].append(review)
+
+        sections = []
+        for category, reviews in section_reviews.items():
+            print(f"🏷️ {category}: {len(reviews)} reviews")
+            if not reviews:
+                sections.append(f"## {category}\n\nNot mentioned.")
+                continue
+
+            # Fill in the category now; {reviews} is filled per chunk
+            prompt_template = SECTION_PROMPT_TEMPLATE.replace("{category}", category)
+            if self.dedup:
+                reviews = self.deduplicate_reviews([reviews])
+            chunks = (chunk for chunk, _ in self.pack_chunks([reviews], stable_boundaries=True))
+            summary = self._reduce_summaries(self._map_summaries(chunks, prompt_template))
+            sections.append(f"## {category}\n\n{summary}")
+
+        self.print_cache_report()
+        return "\n\n".join(sections)
+
+    def summarize_sample(self, csv_path: str, token_budget: int = SAMPLE_TOKEN_BUDGET) -> str:
+        """
+        Summarize a representative sample of at most token_budget review tokens (see review_sampler.py),
+        with per-stratum counts of all reviews in the prompt.
+        """
+        from review_sampler import load_review_frame, sample_reviews, check_sample_quality
+        sample = sample_reviews(load_review_frame(csv_path), token_budget, count_tokens_batch)
+        print(
+            f"🎯 Sampled {len(sample.reviews)} of {len(sample.population)} reviews "
+            f"({int(sample.reviews['tokens'].sum())} of {int(sample.population['tokens'].sum())} tokens)"
+        )
+
+        quality = check_sample_quality(sample)
+        status = "✅" if quality["within_tolerance"] else "⚠️"
+        print(f"{status} Sample quality: largest category share error {quality['max_error']:.1%}")
+
+        # Fill in the statistics now; {reviews} is filled per chunk
+        prompt_template = SAMPLE_PROMPT_TEMPLATE.replace("{statistics}", sample.statistics_text())
+        # A budget up to MAX_TOKENS_PER_CHUNK is summarized in a single call
+        chunks = (chunk for chunk, _ in self.pack_chunks([sample.review_lines()]))
+        summary = self._reduce_summaries(self._map_summaries(chunks, prompt_template))
+        self.print_cache_report()
+        return summary
+
+    def plan_branch_jobs(self, branches) -> list:
+        """
+        Turn branches into first-stage prompts. Branches up to SMALL_BRANCH_TOKENS are packed
+        together (up to MAX_BRANCHES_PER_PROMPT per prompt, within MAX_TOKENS_PER_CHUNK); larger
+        ones are split into chunks. Each job is {"branches", "lines", "template", "packed"}.
+        """
+        jobs = []
+        group = []
+        group_tokens = 0
+
+        def flush():
+            if len(group) == 1:
+                jobs.append({"branches": list(group), "lines": group[0]["reviews"], "template": SUMMARY_PROMPT_TEMPLATE, "packed": False})
+            elif group:
+                lines = []
+                for number, branch in enumerate(group, 1):
+                    lines += ["", BRANCH_MARKER.format(number)] + branch["reviews"]
+                jobs.append({"branches": list(group), "lines": lines, "template": PACKED_PROMPT_TEMPLATE, "packed": True})
+            group.clear()
+
+        for branch in branches:
+            branch_tokens = sum(branch["tokens"])
+            if branch_tokens > SMALL_BRANCH_TOKENS:
+                counted = zip(branch["reviews"], branch["tokens"])
+                for chunk, _ in self.pack_counted_reviews(counted, stable_boundaries=True):
+                    jobs.append({"branches": [branch], "lines": chunk, "template": SUMMARY_PROMPT_TEMPLATE, "packed": False})
+                continue
+
+            if group and (group_tokens + branch_tokens > MAX_TOKENS_PER_CHUNK or len(group) == MAX_BRANCHES_PER_PROMPT):
+                flush()
+                group_tokens = 0
+            group.append(branch)
+            group_tokens += branch_tokens
+
+        flush()
+        return jobs
+
+    def _run_branch_job(self, i, job) -> dict:
+        """Run one first-stage prompt; returns {place_id: partial summary}."""
+        summary = self._summarize_chunk(i, job["lines"], job["template"])
+        if not job["packed"]:
+            return {job["branches"][0]["place_id"]: summary}
+
+        parts = split_packed_summary(summary, len(job["branches"]))
+        results = {}
+        for number, branch in enumerate(job["branches"], 1):
+            if number not in parts:
+                # The reply did not keep this branch apart; summarize it on its own
+                print(f"↩️ Re-running {branch['name']} separately")
+                parts[number] = self._summarize_chunk(i, branch["reviews"], SUMMARY_PROMPT_TEMPLATE)
+            results[branch["place_id"]] = parts[number]
+        return results
+
+    def _reduce_many(self, executor, summaries_by_key) -> dict:
+        """Like _reduce_summaries for many keys at once, all merges of a level sharing one pool."""
+        level = 1
+        while any(len(summaries) > 1 for summaries in summaries_by_key.values()):
+            merges = sum((len(s) + REDUCE_GROUP_SIZE - 1) // REDUCE_GROUP_SIZE for s in summaries_by_key.values() if len(s) > 1)
+            print(f"🔗 Reduce level {level}: {merges} merges...")
+            futures = {
+                key: [executor.submit(self._combine_summaries, summaries[i:i + REDUCE_GROUP_SIZE])
+                      for i in range(0, len(summaries), REDUCE_GROUP_SIZE)]
+                for key, summaries in summaries_by_key.items()
+            }
+            summaries_by_key = {key: [future.result() for future in group] for key, group in futures.items()}
+            level += 1
+        return {key: summaries[0] for key, summaries in summaries_by_key.items()}
+
+    def summarize_branches(self, csv_path: str, out_dir: str = BATCH_OUTPUT_DIR) -> dict:
+        """
+        Summarize every branch of the combined CSV and roll the branch summaries up into one
+        brand summary. Writes branch_summaries.json and brand_summary.md to out_dir and
+        returns {"branches": {place_id: {...}}, "brand": summary}.
+        """
+        branches = load_branches(csv_path)
+        jobs = self.plan_branch_jobs(branches)
+        packed = sum(len(job["branches"]) for job in jobs if job["packed"])
+        print(f"🏢 {len(branches)} branches -> {len(jobs)} first-stage prompts ({packed} small branches packed together)")
+
+        partials = {branch["place_id"]: [] for branch in branches}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = [executor.submit(self._run_branch_job, i, job) for i, job in enumerate(jobs)]
+            for future in futures:
+                for place_id, summary in future.result().items():
+                    partials[place_id].append(summary)
+
+            branch_summaries = self._reduce_many(executor, partials)
+
+            print("🏷️ Rolling branch summaries up into the brand summary...")
+            labelled = [f"Branch: {branch['name']}\n{branch_summaries[branch['place_id']]}" for branch in branches]
+            brand_summary = self._reduce_many(executor, {"brand": labelled})["brand"]
+
+        self.print_cache_report()
+        result = {
+            "branches": {
+                branch["place_id"]: {
+                    "name": branch["name"],
+                    "reviews": len(branch["reviews"]),
+                    "summary": branch_summaries[branch["place_id"]]
+                }
+                for branch in branches
+            },
+            "brand": brand_summary
+        }
+
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(out_dir, "branch_summaries.json"), "w", encoding="utf-8") as f:
+            json.dump(result["branches"], f, ensure_ascii=False, indent=2)
+        with open(os.path.join(out_dir, "brand_summary.md"), "w", encoding="utf-8") as f:
+            f.write(brand_summary + "\n")
+        print(f"💾 Branch summaries saved to: {out_dir}")
+        return result
+
+    def write_batch_job(self, csv_path: str, job_path: str) -> int:
+        """
+        Write the first-stage branch prompts as a Bedrock batch-inference input file
+        ({"recordId", "modelInput"} per line) instead of calling Bedrock, plus
+        <job_path>.manifest.json mapping each recordId to its branches. Branches that fit
+        in one prompt are complete after the job; the merges of larger ones run afterwards.
+        Returns the number of records.
+        """
+        jobs = self.plan_branch_jobs(load_branches(csv_path))
+        manifest = {}
+
+        with open(job_path + ".tmp", "w", encoding="utf-8") as f:
+            for i, job in enumerate(jobs):
+                record_id = f"REC{i:08d}"  # 11 alphanumeric characters
+                prompt = job["template"].format(reviews="\n".join(job["lines"]))
+                f.write(json.dumps({"recordId": record_id, "modelInput": json.loads(self._request_body(prompt))}, ensure_ascii=False) + "\n")
+                manifest[record_id] = {
+                    "place_ids": [branch["place_id"] for branch in job["branches"]],
+                    "packed": job["packed"]
+                }
+        os.replace(job_path + ".tmp", job_path)
+
+        with open(job_path + ".manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"📝 Batch job with {len(jobs)} records saved to: {job_path}")
+        return len(jobs)
+
+    def print_cache_report(self):
+        if not self.summary_cache:
+            return
+        report = self.summary_cache.report()
+        print(
+            f"💾 Summary cache: {report['hits']}/{report['chunks']} chunks reused "
+            f"({report['hit_rate']:.0%} hit rate), ~{report['tokens_saved']} Bedrock tokens saved"
+        )
+
+    def _map_summaries(self, chunks, prompt_template=SUMMARY_PROMPT_TEMPLATE):
+        """
+        Summarize every chunk, running at most max_concurrency Bedrock calls at once.
+        Chunks may come from a generator; only a few are held in memory at a time.
+        """
+        summaries = []
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
             for i, chunk in enumerate(chunks):
-                print(f"🧠 Processing chunk {i+1}/{len(chunks)}...")
-                chunk_text = "\n".join(chunk)
-                partial_summary = self._generate_summary_from_text(chunk_text)
-                partial_summaries.append(partial_summary)
-
-            # Final aggregation step
-            combined_summary_input = "\n\n---\n\n".join(partial_summaries)
-            final_prompt = (
-                "You are given several partial summaries of customer reviews.\n"
-                "Your task is to combine them into a single cohesive summary covering:\n"
-                "- Overall Sentiment\n"
-                "- Pros\n"
-                "- Cons / Complaints\n"
-                "- Key Features Mentioned\n"
-                "- Recurring Themes\n\n"
-                "Here are the partial summaries:\n\n"
-                f"{combined_summary_input}"
-            )
-            return self.call_llama3(final_prompt)
+                pending.append(executor.submit(self._summarize_chunk, i, chunk, prompt_template))
+                if len(pending) >= 2 * self.max_concurrency:
+                    summaries.append(pending.popleft().result())
 
-    def _generate_summary_from_text(self, reviews_text: str) -> str:
-        system_prompt = """
+            summaries.extend(future.result() for future in pending)
 
-You are an AI assistant that reads Google reviews and summarizes key feedback to help business owners improve their services.
+        return summaries
 
-Focus on these 5 areas:
+    def _summarize_chunk(self, i, chunk, prompt_template=SUMMARY_PROMPT_TEMPLATE):
+        chunk_text = "\n".join(chunk)
 
-Customer Experience: Overall feelings, staff behavior, and satisfaction.
+        if self.summary_cache:
+            summary = self.summary_cache.get(chunk_text, prompt_template)
+            if summary is not None:
+                return summary
 
-Product / Service Quality: Quality, reliability, and performance.
+        print(f"🧠 Processing chunk {i+1}...")
+        summary = self._generate_summary_from_text(chunk_text, prompt_template)
 
-Pricing and Charges: Fairness, transparency, value, and billing issues.
+        if self.summary_cache:
+            prompt_tokens = count_tokens_simple(prompt_template.format(reviews=chunk_text))
+            self.summary_cache.put(chunk_text, prompt_template, summary, prompt_tokens, count_tokens_simple(summary))
+        return summary
 
-Digital Platform Experience: Usability and functionality of website, app, or online tools.
+    def _reduce_summaries(self, summaries, on_text=None):
+        """
+        Merge partial summaries in groups of REDUCE_GROUP_SIZE, level by level, until one remains.
+        Each level runs its merges concurrently, so the number of sequential calls grows with
+        log(chunks) and no single prompt holds more than REDUCE_GROUP_SIZE summaries.
+        With on_text, the last merge is streamed to it.
+        """
+        level = 1
+        while len(summaries) > 1:
+            groups = [summaries[i:i + REDUCE_GROUP_SIZE] for i in range(0, len(summaries), REDUCE_GROUP_SIZE)]
+            print(f"🔗 Reduce level {level}: merging {len(summaries)} summaries into {len(groups)}...")
 
-Support and Issue Resolution: Responsiveness, helpfulness, and problem-solving effectiveness.
+            if len(groups) == 1 and on_text:
+                return self._combine_summaries(groups[0], on_text)
 
-For each area, provide:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                summaries = list(executor.map(self._combine_summaries, groups))
+            level += 1
 
-A clear sentiment overview (e.g., percentage positive/negative/neutral if possible).
+        return summaries[0]
 
-Key themes or examples mentioned frequently by customers.
+    def _combine_summaries(self, summaries, on_text=None):
+        """Combine a group of partial summaries into one. A group of one is passed through."""
+        if len(summaries) == 1:
+            return summaries[0]
 
-Any notable praise or common complaints.
+        combined_summary_input = "\n\n---\n\n".join(summaries)
+        final_prompt = (
+            "You are given several partial summaries of customer reviews.\n"
+            "Your task is to combine them into a single cohesive summary covering:\n"
+            "- Overall Sentiment\n"
+            "- Pros\n"
+            "- Cons / Complaints\n"
+            "- Key Features Mentioned\n"
+            "- Recurring Themes\n\n"
+            "Here are the partial summaries:\n\n"
+            f"{combined_summary_input}"
+        )
+        return self.call_llama3(final_prompt, on_text)
 
-If a category is not discussed, write “Not mentioned.”
+    def _generate_summary_from_text(self, reviews_text: str, prompt_template: str = SUMMARY_PROMPT_TEMPLATE, on_text=None) -> str:
+        prompt = prompt_template.format(reviews=reviews_text)
+        return self.call_llama3(prompt, on_text)
 
-Conclude with a brief overall summary highlighting major strengths and any clear improvement areas.
 
-Keep language simple, actionable, and focused on what business owners can learn.
+# "full" summarizes all reviews at once, "sections" summarizes each area from the reviews that mention it,
+# "sample" summarizes a representative sample within SAMPLE_TOKEN_BUDGET,
+# "batch" summarizes every branch of the combined CSV plus a brand rollup (see BATCH_JOB_FILE)
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "full")
+STREAM_OUTPUT = os.getenv("STREAM_OUTPUT", "1") == "1"  # Print the final summary while it is generated
+BEDROCK_FAKE = os.getenv("BEDROCK_FAKE") == "1"  # Use the local fake client from fake_bedrock.py
+# JSONL of recorded replies: live runs append to it, BEDROCK_FAKE runs replay it
+BEDROCK_RECORDINGS = os.getenv("BEDROCK_RECORDINGS", "")
 
-Avoid rewriting full reviews or including unrelated content.   
 
-Review Text:
-{reviews}
-"""
+def main(csv_path=None):
+    """Summarize csv_path (asked for when not given) in SUMMARY_MODE. Returns True on success."""
+    streamed = []
 
-        prompt = system_prompt.format(reviews=reviews_text)
-        return self.call_llama3(prompt)
+    def show_text(text):
+        if not streamed:
+            print("\n===== REVIEW SUMMARY =====")
+        streamed.append(text)
+        print(text, end="", flush=True)
 
+    client = None
+    if BEDROCK_FAKE:
+        from fake_bedrock import FakeBedrockClient
+        client = FakeBedrockClient(throttle_rate=0.1, recordings=BEDROCK_RECORDINGS or None)
 
-def main():
-    summarizer = ReviewSummarizer()
-    csv_path = input("Enter path to the CSV file with reviews: ").strip()
+    summarizer = ReviewSummarizer(client=client, on_text=show_text if STREAM_OUTPUT else None)
+    if BEDROCK_RECORDINGS and not BEDROCK_FAKE:
+        from fake_bedrock import RecordingBedrockClient
+        summarizer.client = RecordingBedrockClient(summarizer.client, BEDROCK_RECORDINGS)
+    if csv_path is None:
+        csv_path = input("Enter path to the CSV file with reviews (or a Parquet review store folder): ").strip()
 
     if not os.path.exists(csv_path):
         print(f"❌ File not found: {csv_path}")
-        return
+        return False
 
     try:
-        summary = summarizer.summarize_reviews(csv_path)
-        print("\n===== REVIEW SUMMARY =====")
-        print(summary)
+        with metrics.stage(f"summarizer.{SUMMARY_MODE}"):
+            if SUMMARY_MODE == "sections":
+                summary = summarizer.summarize_by_category(csv_path)
+            elif SUMMARY_MODE == "sample":
+                summary = summarizer.summarize_sample(csv_path)
+            elif SUMMARY_MODE == "batch" and BATCH_JOB_FILE:
+                summarizer.write_batch_job(csv_path, BATCH_JOB_FILE)
+                return True
+            elif SUMMARY_MODE == "batch":
+                summary = summarizer.summarize_branches(csv_path)["brand"]
+            else:
+                summary = summarizer.summarize_reviews(csv_path)
+
+        if streamed:
+            print()
+        else:
+            print("\n===== REVIEW SUMMARY =====")
+            print(summary)
+        return True
     except Exception as e:
         print(f"⚠️ Error during summarization: {e}")
+        return False
+    finally:
+        metrics.export("summarizer")
 
 
 if __name__ == "__main__":
@@ -10,6 +10,10 @@ Main features:
 4. Extracts relevant information — place ID, title, address, rating, and review count.
 5. Saves the collected data into both JSON and CSV formats for further use or analysis.
 6. Displays a formatted list of all found branches in the console.
+7. Splits the state into a grid of lat/long tiles, searches the tiles in parallel,
+   follows result pagination and merges branches by place ID.
+8. Records search timings, SerpApi latency and credits in metrics/branches_scraper.json
+   and metrics/branches_scraper.prom (see pipeline_metrics.py).
 
 This script is useful for building datasets of business branches or for automating 
 local business information gathering through Google Maps search results.
@@ -18,14 +22,64 @@ local business information gathering through Google Maps search results.
 
 import os
 import json
-import pandas as pd
-from serpapi import GoogleSearch
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
 from dotenv import load_dotenv
 
+# Before the shared modules read their settings (SERPAPI_OFFLINE, SERPAPI_CACHE_DIR, ...)
 load_dotenv()
+
+from serpapi_cache import cached_search
+from pipeline_metrics import metrics, PAGE_BUCKETS
 API_KEY = os.getenv("API")
 
-def get_all_place_ids(api_key, query, location_ll=None):
+BRAND_KEYWORD = "Honest"
+REGION_KEYWORD = "Gujarat"
+QUERY = "Honest restaurant Gujarat"
+BRANCHES_JSON = "honest_branches_gujarat.json"
+BRANCHES_CSV = "honest_branches_gujarat.csv"
+
+# Bounding box of the region to cover: (south, west, north, east)
+REGION_BOUNDS = (20.1, 68.1, 24.7, 74.5)
+TILE_ROWS = 4
+TILE_COLS = 4
+TILE_ZOOM = 11  # Google Maps zoom level used for every tile
+
+MAX_WORKERS = 8  # Tiles searched in parallel
+MAX_PAGES_PER_TILE = 5  # Google Maps returns 20 results per page
+
+
+def make_tiles(bounds, rows, cols, zoom=TILE_ZOOM):
+    """
+    Split a bounding box into rows x cols tiles and return the Google Maps `ll`
+    value ("@lat,long,zoomz") for the center of each tile.
+    """
+    south, west, north, east = bounds
+    lat_step = (north - south) / rows
+    lng_step = (east - west) / cols
+
+    tiles = []
+    for row in range(rows):
+        for col in range(cols):
+            lat = south + (row + 0.5) * lat_step
+            lng = west + (col + 0.5) * lng_step
+            tiles.append(f"@{lat:.6f},{lng:.6f},{zoom}z")
+
+    return tiles
+
+
+def is_branch(place):
+    return REGION_KEYWORD in place.get("address", "") and BRAND_KEYWORD in place.get("title", "")
+
+
+def get_all_place_ids(api_key, query, location_ll=None, seen=None, lock=None, max_pages=MAX_PAGES_PER_TILE):
+    """
+    Search Google Maps for `query` and return the matching branches, following pagination.
+
+    `seen` is a set of place IDs already found (shared between tiles). Pagination stops
+    early when a page brings no place ID that is not in it yet.
+    """
     params = {
         "engine": "google_maps",
         "q": query,
@@ -37,56 +91,110 @@ def get_all_place_ids(api_key, query, location_ll=None):
     if location_ll:
         params["ll"] = location_ll  # Optional: pass lat,long if needed
 
-    search = GoogleSearch(params)
-    results = search.get_dict()
-
-    print(json.dumps(results, indent=2))  # Debug print
+    if seen is None:
+        seen = set()
+    if lock is None:
+        lock = threading.Lock()
 
     branches = []
+    pages = 0
+
+    for _ in range(max_pages):
+        results = cached_search(params)
+        pages += 1
 
-    if "local_results" in results:
-        for place in results["local_results"]:
-            address = place.get("address", "")
-            title = place.get("title", "")
-            if "Gujarat" in address and "Honest" in title:
+        if "error" in results:
+            raise Exception(f"SerpApi Error: {results['error']}")
+
+        new_places = 0
+        for place in results.get("local_results", []):
+            place_id = place.get("place_id")
+            with lock:
+                if not place_id or place_id in seen:
+                    continue
+                seen.add(place_id)
+            new_places += 1
+
+            if is_branch(place):
                 branches.append({
-                    "place_id": place.get("place_id"),
-                    "title": title,
-                    "address": address,
+                    "place_id": place_id,
+                    "title": place.get("title", ""),
+                    "address": place.get("address", ""),
                     "rating": place.get("rating"),
                     "reviews": place.get("reviews")
                 })
 
+        next_page = results.get("serpapi_pagination", {}).get("next")
+        if not new_places or not next_page:
+            break
+
+        params.update(dict(parse_qsl(next_page.split('?', 1)[1])))
+
+    metrics.observe("serpapi_pages_per_tile", pages, buckets=PAGE_BUCKETS)
     return branches
 
-def save_to_json(data, filename="honest_branches_gujarat.json"):
+def discover_branches(api_key, query, bounds=REGION_BOUNDS, rows=TILE_ROWS, cols=TILE_COLS, max_workers=MAX_WORKERS):
+    """
+    Search every tile of the region in parallel and merge the branches by place ID.
+    A failing tile is reported and skipped.
+    """
+    tiles = make_tiles(bounds, rows, cols)
+    seen = set()
+    lock = threading.Lock()
+    branches = []
+
+    print(f"Searching {len(tiles)} tiles with {max_workers} workers...")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(get_all_place_ids, api_key, query, tile, seen, lock): tile
+            for tile in tiles
+        }
+
+        for future, tile in futures.items():
+            try:
+                tile_branches = future.result()
+            except Exception as e:
+                print(f"Tile {tile} failed: {e}")
+                continue
+            branches.extend(tile_branches)
+            print(f"Tile {tile}: {len(tile_branches)} new branches")
+
+    return branches
+
+def save_to_json(data, filename=BRANCHES_JSON):
     with open(filename, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
     print(f"Saved JSON to {filename}")
 
-def save_to_csv(data, filename="honest_branches_gujarat.csv"):
+def save_to_csv(data, filename=BRANCHES_CSV):
+    import pandas as pd
     df = pd.DataFrame(data)
     df.to_csv(filename, index=False)
     print(f"Saved CSV to {filename}")
 
-def main():
-    query = "Honest restaurant Gujarat"
-    location_ll = None  # Optional: specify lat,long if needed
-
-    print("Searching for Honest branches in Gujarat...")
-    branches = get_all_place_ids(API_KEY, query, location_ll)
+def main(query=QUERY, bounds=REGION_BOUNDS, rows=TILE_ROWS, cols=TILE_COLS,
+         json_filename=BRANCHES_JSON, csv_filename=BRANCHES_CSV):
+    """Find and save the branches. Returns the list of branches."""
+    print(f"Searching for {BRAND_KEYWORD} branches in {REGION_KEYWORD}...")
+    with metrics.stage("scraper.discover"):
+        branches = discover_branches(API_KEY, query, bounds, rows, cols)
 
     if not branches:
-        print("No Honest branches found in Gujarat.")
-        return
+        print(f"No {BRAND_KEYWORD} branches found in {REGION_KEYWORD}.")
+        metrics.export("branches_scraper")
+        return branches
 
-    print(f"Found {len(branches)} Honest branches in Gujarat.\n")
+    print(f"Found {len(branches)} {BRAND_KEYWORD} branches in {REGION_KEYWORD}.\n")
 
     for i, branch in enumerate(branches):
         print(f"{i+1}. {branch['title']} - {branch['address']} (Place ID: {branch['place_id']})")
 
-    save_to_json(branches)
-    save_to_csv(branches)
+    with metrics.stage("scraper.save"):
+        save_to_json(branches, json_filename)
+        save_to_csv(branches, csv_filename)
+    metrics.export("branches_scraper")
+    return branches
 
 if __name__ == "__main__":
     main()
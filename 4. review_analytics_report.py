@@ -0,0 +1,266 @@
+"""
+This script turns the combined review dataset (the CSV written by Samples/Motilal/app.py) into the
+standard Google review analysis report: a set of charts plus a Markdown and PDF summary.
+
+Key functionalities include:
+1. Loading only the needed columns of the combined CSV with explicit dtypes.
+2. Deriving shared columns once (review date, month, text length, sentiment, category flags)
+   and computing every aggregate from them with vectorized pandas group-bys, with no per-review Python loop.
+3. Parsing ISO review dates, or relative dates like "3 weeks ago" for older exports without them.
+4. Rendering the standard charts:
+   - rating_distribution.png
+   - review_volume_by_month.png
+   - avg_rating_over_time.png
+   - sentiment_breakdown.png
+   - review_length_vs_rating.png
+   - category_mentions.png
+   - branch_top12_avg_rating.png
+5. Writing report.md (tables plus chart links) and report.pdf (all charts) in one command:
+
+   python "4. review_analytics_report.py" motilal_oswal_reviews_combined.csv --out report
+
+Sentiment is derived from the star rating (4-5 positive, 3 neutral, 1-2 negative).
+"""
+
+import argparse
+import os
+from datetime import datetime, timezone
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+import pandas as pd
+
+from category_tagger import CategoryTagger
+from review_records import parse_relative_dates
+
+USE_COLUMNS = ["place_id", "branch_name", "branch_address", "review_rating", "review_date", "review_text", "review_iso_date"]
+DTYPES = {
+    "place_id": "string",
+    "branch_name": "string",
+    "branch_address": "string",
+    "review_rating": "float32",
+    "review_date": "string",
+    "review_text": "string",
+    "review_iso_date": "string",
+}
+
+MIN_REVIEWS_FOR_BRANCH_RANKING = 5
+
+
+def load_reviews(csv_path):
+    header = pd.read_csv(csv_path, nrows=0).columns
+    columns = [c for c in USE_COLUMNS if c in header]
+    return pd.read_csv(csv_path, usecols=columns, dtype={c: DTYPES[c] for c in columns})
+
+
+def prepare(df, reference_time, tagger):
+    """
+    Add the intermediate columns shared by every aggregate, computing each only once.
+    """
+    dates = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns, UTC]")
+    if "review_iso_date" in df:
+        dates = pd.to_datetime(df["review_iso_date"], utc=True, errors="coerce")
+    missing = dates.isna()
+    if missing.any() and "review_date" in df:
+        dates = dates.where(~missing, parse_relative_dates(df["review_date"], reference_time))
+
+    text = df["review_text"].fillna("")
+    rating = df["review_rating"]
+
+    df["date"] = dates
+    df["month"] = dates.dt.tz_localize(None).dt.to_period("M")
+    df["text_length"] = text.str.count(r"\S+").astype("int32")
+    df["sentiment"] = pd.cut(rating, bins=[0, 2, 3, 5], labels=["Negative", "Neutral", "Positive"])
+
+    # One scan per review tags every category (see category_tagger.py)
+    tagger.add_category_columns(df, "review_text")
+
+    address = df["branch_address"].fillna("").str.split(",")
+    df["branch_label"] = (address.str[-4].str.strip() + ", " + address.str[-3].str.strip()).fillna(df["place_id"])
+    return df
+
+
+def compute_aggregates(df, categories):
+    rating = df["review_rating"]
+    by_month = df.dropna(subset=["month"]).groupby("month", observed=True)["review_rating"]
+
+    branches = df.groupby("place_id").agg(
+        branch=("branch_label", "first"),
+        reviews=("review_rating", "size"),
+        avg_rating=("review_rating", "mean"),
+    )
+    top_branches = (
+        branches[branches["reviews"] >= MIN_REVIEWS_FOR_BRANCH_RANKING]
+        .sort_values(["avg_rating", "reviews"], ascending=False)
+        .head(12)
+    )
+
+    text_length_by_rating = df.groupby("review_rating")["text_length"].agg(["mean", "median", "size"])
+
+    # Months without reviews show up as zero volume instead of being skipped
+    volume_by_month = by_month.size()
+    if len(volume_by_month):
+        all_months = pd.period_range(volume_by_month.index.min(), volume_by_month.index.max(), freq="M")
+        volume_by_month = volume_by_month.reindex(all_months, fill_value=0)
+
+    return {
+        "total_reviews": len(df),
+        "total_branches": df["place_id"].nunique(),
+        "average_rating": float(rating.mean()) if len(df) else 0.0,
+        "rating_distribution": rating.value_counts().reindex([1.0, 2.0, 3.0, 4.0, 5.0], fill_value=0),
+        "volume_by_month": volume_by_month,
+        "avg_rating_by_month": by_month.mean(),
+        "sentiment": df["sentiment"].value_counts().reindex(["Positive", "Neutral", "Negative"], fill_value=0),
+        "text_length_by_rating": text_length_by_rating,
+        "category_mentions": df[categories].sum().sort_values(ascending=False),
+        "top_branches": top_branches,
+    }
+
+
+def _bar(ax, index, values, title, xlabel, ylabel, color="#2f6db5"):
+    ax.bar([str(i) for i in index], values, color=color)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+
+
+def render_charts(aggregates, out_dir):
+    """
+    Render every chart to a PNG in out_dir. Returns a list of (filename, figure).
+    """
+    charts = []
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    dist = aggregates["rating_distribution"]
+    _bar(ax, [int(i) for i in dist.index], dist.values, "Rating Distribution", "Stars", "Reviews")
+    charts.append(("rating_distribution.png", fig))
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    volume = aggregates["volume_by_month"]
+    ax.plot(volume.index.astype(str), volume.values, marker="o")
+    ax.set_title("Review Volume by Month")
+    ax.set_ylabel("Reviews")
+    ax.tick_params(axis="x", rotation=90)
+    charts.append(("review_volume_by_month.png", fig))
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    avg = aggregates["avg_rating_by_month"]
+    ax.plot(avg.index.astype(str), avg.values, marker="o", color="#d98a1c")
+    ax.set_title("Average Rating Over Time")
+    ax.set_ylabel("Average stars")
+    ax.set_ylim(0, 5.2)
+    ax.tick_params(axis="x", rotation=90)
+    charts.append(("avg_rating_over_time.png", fig))
+
+    fig, ax = plt.subplots(figsize=(6, 6))
+    sentiment = aggregates["sentiment"]
+    ax.pie(sentiment.values, labels=sentiment.index, autopct="%1.1f%%", colors=["#3a9d5d", "#c9b037", "#c0392b"])
+    ax.set_title("Sentiment Breakdown (by rating)")
+    charts.append(("sentiment_breakdown.png", fig))
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    lengths = aggregates["text_length_by_rating"]
+    _bar(ax, [int(i) for i in lengths.index], lengths["mean"].values, "Review Length vs Rating", "Stars", "Average words")
+    charts.append(("review_length_vs_rating.png", fig))
+
+    fig, ax = plt.subplots(figsize=(9, 5))
+    mentions = aggregates["category_mentions"]
+    ax.barh(mentions.index[::-1], mentions.values[::-1], color="#6a4fb3")
+    ax.set_title("Category Mentions")
+    ax.set_xlabel("Reviews mentioning the category")
+    charts.append(("category_mentions.png", fig))
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    top = aggregates["top_branches"]
+    ax.barh(top["branch"][::-1], top["avg_rating"][::-1], color="#2f6db5")
+    ax.set_title(f"Top {len(top)} Branches by Average Rating (min {MIN_REVIEWS_FOR_BRANCH_RANKING} reviews)")
+    ax.set_xlim(0, 5.2)
+    charts.append(("branch_top12_avg_rating.png", fig))
+
+    for filename, fig in charts:
+        fig.tight_layout()
+        fig.savefig(os.path.join(out_dir, filename), dpi=120)
+
+    return charts
+
+
+def write_markdown(aggregates, charts, out_dir):
+    total = aggregates["total_reviews"] or 1
+    lines = [
+        "# Google Customer Reviews Analysis",
+        "",
+        f"* Reviews: {aggregates['total_reviews']}",
+        f"* Branches: {aggregates['total_branches']}",
+        f"* Average rating: {aggregates['average_rating']:.2f}",
+        "",
+        "## Sentiment",
+        "",
+        "| Sentiment | Reviews | Share |",
+        "|---|---|---|",
+    ]
+    for label, count in aggregates["sentiment"].items():
+        lines.append(f"| {label} | {count} | {count / total:.1%} |")
+
+    lines += ["", "## Category Mentions", "", "| Category | Reviews |", "|---|---|"]
+    for category, count in aggregates["category_mentions"].items():
+        lines.append(f"| {category} | {int(count)} |")
+
+    lines += ["", "## Top Branches", "", "| Branch | Reviews | Average rating |", "|---|---|---|"]
+    for _, row in aggregates["top_branches"].iterrows():
+        lines.append(f"| {row['branch']} | {row['reviews']} | {row['avg_rating']:.2f} |")
+
+    lines += ["", "## Charts", ""]
+    for filename, _ in charts:
+        lines.append(f"![{filename[:-4].replace('_', ' ')}]({filename})")
+
+    path = os.path.join(out_dir, "report.md")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def write_pdf(charts, out_dir):
+    path = os.path.join(out_dir, "report.pdf")
+    with PdfPages(path) as pdf:
+        for _, fig in charts:
+            pdf.savefig(fig)
+    return path
+
+
+def build_report(csv_path, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    reference_time = pd.Timestamp(datetime.fromtimestamp(os.path.getmtime(csv_path), tz=timezone.utc))
+
+    tagger = CategoryTagger()
+    df = prepare(load_reviews(csv_path), reference_time, tagger)
+    aggregates = compute_aggregates(df, tagger.categories)
+    charts = render_charts(aggregates, out_dir)
+    markdown_path = write_markdown(aggregates, charts, out_dir)
+    pdf_path = write_pdf(charts, out_dir)
+
+    for _, fig in charts:
+        plt.close(fig)
+    return aggregates, markdown_path, pdf_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the review analysis charts and report.")
+    parser.add_argument("csv_path", nargs="?", default="motilal_oswal_reviews_combined.csv", help="Combined reviews CSV")
+    parser.add_argument("--out", default="report", help="Output folder for charts and reports")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.csv_path):
+        print(f"❌ File not found: {args.csv_path}")
+        return False
+
+    aggregates, markdown_path, pdf_path = build_report(args.csv_path, args.out)
+    print(f"📊 Analyzed {aggregates['total_reviews']} reviews across {aggregates['total_branches']} branches.")
+    print(f"✅ Charts saved to: {args.out}")
+    print(f"✅ Report saved to: {markdown_path} and {pdf_path}")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,322 @@
 import os
+import sys
+import csv
 import json
-import pandas as pd
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-# Folder containing your individual JSON files
-json_folder = "/home/mihir/Desktop/DigitQt/Projects/Google Reviews/Motilal/reviews"  # change if your files are in a different folder
+# Shared modules (review_store.py, ...) live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from pipeline_metrics import metrics
+
+# Folder containing your individual JSON files (or pass it as the first argument)
+json_folder = sys.argv[1] if len(sys.argv) > 1 else os.getenv("REVIEWS_FOLDER", "reviews")
 output_csv = "motilal_oswal_reviews_combined.csv"
 
-def load_reviews_from_file(filepath):
+# Per-file CSV parts and the manifest used to skip files that have not changed
+parts_folder = ".merge_parts"
+manifest_path = os.path.join(parts_folder, "manifest.json")
+
+MAX_WORKERS = os.cpu_count() or 4
+
+# Folder of the Parquet review store (see review_store.py); leave empty to disable
+PARQUET_STORE_DIR = os.getenv("PARQUET_STORE_DIR", "")
+
+# SQLite review index with full-text search (see review_index.py); leave empty to disable
+REVIEW_INDEX_DB = os.getenv("REVIEW_INDEX_DB", "")
+
+COLUMNS = [
+    "place_id",
+    "branch_name",
+    "branch_address",
+    "branch_rating",
+    "review_rating",
+    "review_date",
+    "review_text",
+    "review_author",
+    "review_id",
+    "review_iso_date"
+]
+
+def make_row(place_info, review):
+    iso_date = review.get("iso_date", "")
+    return {
+        "place_id": place_info.get("place_id", "") or review.get("place_id", ""),
+        "branch_name": place_info.get("title", ""),
+        "branch_address": place_info.get("address", ""),
+        "branch_rating": place_info.get("rating", ""),
+        "review_rating": review.get("rating", ""),
+        # Compact collector files keep only iso_date, not SerpApi's relative date
+        "review_date": review.get("date", "") or iso_date[:10],
+        "review_text": review.get("snippet", ""),
+        "review_author": review.get("user", {}).get("name", "") if review.get("user") else "",
+        "review_id": review.get("review_id", ""),
+        "review_iso_date": iso_date
+    }
+
+def iter_reviews_from_file(filepath):
+    """
+    Yield (place_info, review) pairs from a collector .json file or a streamed .jsonl file.
+    """
+    if filepath.endswith(".jsonl"):
+        with open(filepath, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield {}, json.loads(line)
+                except ValueError:
+                    continue  # Partially written last line
+        return
+
     with open(filepath, "r", encoding="utf-8") as f:
         data = json.load(f)
     place_info = data.get("place_info", {})
-    reviews = data.get("reviews", [])
-    rows = []
-
-    for review in reviews:
-        rows.append({
-            "place_id": place_info.get("place_id", ""),
-            "branch_name": place_info.get("title", ""),
-            "branch_address": place_info.get("address", ""),
-            "branch_rating": place_info.get("rating", ""),
-            "review_rating": review.get("rating", ""),
-            "review_date": review.get("date", ""),
-            "review_text": review.get("snippet", ""),
-            "review_author": review.get("user", {}).get("name", "") if review.get("user") else ""
-        })
-
-    return rows
+    for review in data.get("reviews", []):
+        yield place_info, review
 
-def main():
-    all_reviews = []
+def load_reviews_from_file(filepath):
+    return [make_row(place_info, review) for place_info, review in iter_reviews_from_file(filepath)]
 
-    # List all JSON files in the folder that end with '.json'
-    files = [f for f in os.listdir(json_folder) if f.endswith(".json")]
+def write_part(filepath, part_path):
+    """
+    Convert one review file into a CSV part (runs in a worker process).
+    Rows are written as they are produced. Returns the number of rows and the file's place_ids.
+    """
+    count = 0
+    place_ids = set()
+    with open(part_path + ".tmp", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        for place_info, review in iter_reviews_from_file(filepath):
+            row = make_row(place_info, review)
+            writer.writerow(row)
+            count += 1
+            if row["place_id"]:
+                place_ids.add(row["place_id"])
+    os.replace(part_path + ".tmp", part_path)
 
-    print(f"Found {len(files)} JSON files. Processing...")
+    return count, sorted(place_ids)
 
+def write_store_place(place_id, filepaths):
+    """
+    Replace one place in the Parquet review store with its reviews from all of its files
+    (runs in a worker process). A place can span several files, e.g. a collector file and a
+    browser_reviews_ingest.py file, so reviews are deduplicated by review_id.
+    """
+    from review_store import replace_place
+
+    reviews = []
+    seen = set()
+    for filepath in filepaths:
+        for place_info, review in iter_reviews_from_file(filepath):
+            if (place_info.get("place_id") or review.get("place_id")) != place_id:
+                continue
+            review_id = review.get("review_id")
+            if review_id:
+                if review_id in seen:
+                    continue
+                seen.add(review_id)
+            reviews.append(review)
+    replace_place(PARQUET_STORE_DIR, place_id, reviews)
+    return len(reviews)
+
+def file_hash(filepath):
+    sha1 = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+def load_manifest():
+    """
+    Load the per-file manifest. Parts written with different columns are all treated as changed.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("columns") != COLUMNS:
+        return {}
+    return data["files"]
+
+def save_manifest(manifest):
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"columns": COLUMNS, "files": manifest}, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def find_changed_files(files, manifest):
+    """
+    Return the files whose size/mtime changed since the last merge and whose content hash differs.
+    Files that were only touched get their manifest entry refreshed.
+    """
+    changed = []
     for file in files:
         filepath = os.path.join(json_folder, file)
-        try:
-            reviews = load_reviews_from_file(filepath)
-            all_reviews.extend(reviews)
-            print(f"Processed {file} ({len(reviews)} reviews)")
-        except Exception as e:
-            print(f"Error processing {file}: {e}")
+        stat = os.stat(filepath)
+        entry = manifest.get(file)
+        part_path = os.path.join(parts_folder, file + ".csv")
+
+        if entry and "place_ids" in entry and os.path.exists(part_path):
+            if entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                continue
+            digest = file_hash(filepath)
+            if entry["sha1"] == digest:
+                entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+                continue
+
+        changed.append(file)
+    return changed
+
+def update_store(place_ids, manifest):
+    """
+    Rebuild the review store partition of every given place from all files of that place.
+    """
+    place_files = {}
+    for file in sorted(manifest):
+        for place_id in manifest[file].get("place_ids", []):
+            place_files.setdefault(place_id, []).append(os.path.join(json_folder, file))
+
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(write_store_place, place_id, place_files.get(place_id, [])): place_id
+            for place_id in sorted(place_ids)
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error writing {futures[future]} to the review store: {e}")
+    print(f"Updated {len(place_ids)} places in the review store: {PARQUET_STORE_DIR}")
+
+def update_index(files, manifest):
+    """
+    Add every file not yet in the SQLite review index to it, from this process only (SQLite has
+    a single writer). Manifest entries record the index they were added to, so turning
+    REVIEW_INDEX_DB on (or pointing it at a new database) indexes unchanged files too.
+    """
+    from review_index import connect, index_reviews
+
+    if not os.path.exists(REVIEW_INDEX_DB):
+        for entry in manifest.values():
+            entry.pop("indexed", None)
+
+    pending = [file for file in files if file in manifest and manifest[file].get("indexed") != REVIEW_INDEX_DB]
+    if not pending:
+        return
+
+    conn = connect(REVIEW_INDEX_DB)
+    try:
+        for file in pending:
+            place_reviews = {}
+            for place_info, review in iter_reviews_from_file(os.path.join(json_folder, file)):
+                place_id = place_info.get("place_id") or review.get("place_id")
+                if place_id:
+                    place_reviews.setdefault(place_id, ({**place_info, "place_id": place_id}, []))[1].append(review)
+            for place_info, reviews in place_reviews.values():
+                index_reviews(conn, place_info, reviews)
+            manifest[file]["indexed"] = REVIEW_INDEX_DB
+    finally:
+        conn.close()
+    print(f"Indexed {len(pending)} files in the review index: {REVIEW_INDEX_DB}")
+
+def combine_parts(files, manifest):
+    """
+    Stream every part into the combined CSV (one header, atomic replace).
+    A place can have several files, e.g. a finished .json next to the .jsonl of an earlier
+    streamed run: their parts are copied row by row, keeping the first row of every
+    (place_id, review_id). Parts of places with a single file are copied block by block.
+    """
+    file_counts = {}
+    for file in files:
+        for place_id in manifest.get(file, {}).get("place_ids", []):
+            file_counts[place_id] = file_counts.get(place_id, 0) + 1
+    shared_places = {place_id for place_id, count in file_counts.items() if count > 1}
+
+    place_col = COLUMNS.index("place_id")
+    id_col = COLUMNS.index("review_id")
+    seen = set()
+
+    with open(output_csv + ".tmp", "w", encoding="utf-8", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(COLUMNS)
+        for file in files:
+            with open(os.path.join(parts_folder, file + ".csv"), "r", encoding="utf-8", newline="") as part:
+                if not shared_places.intersection(manifest.get(file, {}).get("place_ids", [])):
+                    for block in iter(lambda: part.read(1024 * 1024), ""):
+                        out.write(block)
+                    continue
+
+                for row in csv.reader(part):
+                    if row[place_col] in shared_places and row[id_col]:
+                        key = (row[place_col], row[id_col])
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    writer.writerow(row)
+    os.replace(output_csv + ".tmp", output_csv)
+
+def main():
+    os.makedirs(parts_folder, exist_ok=True)
+
+    # List all review files in the folder (.json from the collectors, .jsonl from streaming)
+    files = sorted(f for f in os.listdir(json_folder) if f.endswith((".json", ".jsonl")))
+    manifest = load_manifest()
+
+    # Places whose reviews changed, so their review store partition is rebuilt
+    touched_places = set()
+
+    # Forget files that are gone
+    for file in set(manifest) - set(files):
+        touched_places.update(manifest.pop(file).get("place_ids", []))
+        part_path = os.path.join(parts_folder, file + ".csv")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    with metrics.stage("merge.scan"):
+        changed = find_changed_files(files, manifest)
+    print(f"Found {len(files)} JSON files, {len(changed)} new or changed. Processing...")
+    metrics.inc("merge_files_total", len(files) - len(changed), status="unchanged")
+
+    failed = set()
+    with metrics.stage("merge.convert"), ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(write_part, os.path.join(json_folder, file), os.path.join(parts_folder, file + ".csv")): file
+            for file in changed
+        }
+
+        for future in as_completed(futures):
+            file = futures[future]
+            filepath = os.path.join(json_folder, file)
+            touched_places.update((manifest.get(file) or {}).get("place_ids", []))
+            try:
+                count, place_ids = future.result()
+            except Exception as e:
+                failed.add(file)
+                manifest.pop(file, None)
+                metrics.inc("merge_files_total", status="failed")
+                print(f"Error processing {file}: {e}")
+                continue
+
+            stat = os.stat(filepath)
+            manifest[file] = {"mtime": stat.st_mtime, "size": stat.st_size, "sha1": file_hash(filepath), "place_ids": place_ids}
+            touched_places.update(place_ids)
+            metrics.inc("merge_files_total", status="converted")
+            metrics.inc("merge_rows_total", count)
+            print(f"Processed {file} ({count} reviews)")
+
+    if REVIEW_INDEX_DB:
+        with metrics.stage("merge.index"):
+            update_index([f for f in files if f not in failed], manifest)
+
+    save_manifest(manifest)
 
-    # Convert to DataFrame
-    df = pd.DataFrame(all_reviews)
+    if PARQUET_STORE_DIR and touched_places:
+        with metrics.stage("merge.store"):
+            update_store(touched_places, manifest)
 
     # Save to CSV
-    df.to_csv(output_csv, index=False, encoding="utf-8")
+    with metrics.stage("merge.combine"):
+        combine_parts([f for f in files if f not in failed and os.path.exists(os.path.join(parts_folder, f + ".csv"))], manifest)
     print(f"\nAll reviews saved to {output_csv}")
+    metrics.export("merge")
 
 if __name__ == "__main__":
     main()
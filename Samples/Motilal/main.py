@@ -1,24 +1,102 @@
-from serpapi import GoogleSearch
 from urllib.parse import parse_qsl
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
+import sys
+import threading
+import time
 from dotenv import load_dotenv
 import os
 
+# Load .env first: it can select the SerpApi stand-in and configure the shared modules below
 load_dotenv()
 
+# Shared modules (pipeline_metrics.py, ...) live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from pipeline_metrics import metrics, PAGE_BUCKETS
+from review_records import parse_reviews, review_dicts
+from refresh_scheduler import (
+    RefreshState, CreditBudget, plan_refresh, pages_for, find_saved_file, MAX_PAGES_PER_PLACE
+)
+
+if os.getenv("SERPAPI_FAKE_DIR") or os.getenv("SERPAPI_RECORDINGS_DIR"):
+    # Local replay stand-in (see fake_serpapi.py): no API key, no credits
+    from fake_serpapi import GoogleSearch
+else:
+    from serpapi import GoogleSearch
+
 API_KEY = os.getenv("API")  # Your SerpApi API key
 
-def get_place_info(api_key, place_id):
+# Concurrency settings (override through .env if needed)
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "8"))  # Branches fetched in parallel
+REQUESTS_PER_SECOND = float(os.getenv("REQUESTS_PER_SECOND", "5"))  # Shared SerpApi request rate
+BURST_SIZE = int(os.getenv("BURST_SIZE", "5"))  # Requests allowed back-to-back before throttling
+
+# Folder holding per-place pagination checkpoints of unfinished crawls
+CHECKPOINT_DIR = "checkpoints"
+
+# SerpApi credits one run may spend. When set, only the branches picked by the refresh
+# scheduler are re-crawled, and only their new reviews are fetched (see refresh_scheduler.py).
+REFRESH_CREDIT_BUDGET = int(os.getenv("REFRESH_CREDIT_BUDGET", "0"))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every worker so the combined request
+    rate never exceeds `rate` requests per second (with bursts up to `capacity`).
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def search(params, limiter=None):
+    """
+    Run a single SerpApi request, waiting for a token first when a limiter is given.
+    The wait, the request latency and the credit are recorded in the run metrics.
+    """
+    if limiter:
+        with metrics.stage("collect.rate_limit_wait"):
+            limiter.acquire()
+
+    engine = params.get("engine", "")
+    with metrics.request("serpapi", engine) as call:
+        result = GoogleSearch(params).get_dict()
+        if "error" in result:
+            call.status = "error"
+
+    if "error" not in result:
+        metrics.inc("serpapi_credits_total", engine=engine)
+    return result
+
+
+def get_place_info(api_key, place_id, limiter=None):
     params = {
         "engine": "google_maps",
         "place_id": place_id,
         "api_key": api_key,
         "hl": "en"
     }
-    
-    search = GoogleSearch(params)
-    result = search.get_dict()
-    
+
+    result = search(params, limiter)
+
     place_info = {}
     if "place_results" in result:
         place_data = result["place_results"]
@@ -33,10 +111,63 @@ def get_place_info(api_key, place_id):
             "hours": place_data.get("hours", {}),
             "type": place_data.get("type", "")
         }
-    
+
     return place_info
 
-def fetch_reviews(api_key, place_id):
+def get_checkpoint_path(place_id):
+    return os.path.join(CHECKPOINT_DIR, f"{place_id}.json")
+
+def get_checkpoint_reviews_path(place_id):
+    return os.path.join(CHECKPOINT_DIR, f"{place_id}.reviews.jsonl")
+
+def load_checkpoint(place_id):
+    path = get_checkpoint_path(place_id)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(place_id, params, page_reviews):
+    """
+    Append one page of reviews to the checkpoint's JSONL file, then save the params of the
+    next page and that file's size (atomic replace), so each page writes only its own reviews.
+    """
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    with open(get_checkpoint_reviews_path(place_id), "a", encoding="utf-8") as f:
+        for review in page_reviews:
+            f.write(json.dumps(review, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+        reviews_offset = f.tell()
+
+    path = get_checkpoint_path(place_id)
+    data = {
+        "place_id": place_id,
+        "params": {k: v for k, v in params.items() if k != "api_key"},
+        "reviews_offset": reviews_offset
+    }
+
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+def load_checkpoint_reviews(place_id, reviews_offset):
+    """
+    Read the reviews saved with a checkpoint, dropping anything written after its last complete page.
+    """
+    path = get_checkpoint_reviews_path(place_id)
+    with open(path, "r+b") as f:
+        f.truncate(reviews_offset)
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_reviews(json.loads(line) for line in f if line.strip())
+
+def clear_checkpoint(place_id):
+    for path in (get_checkpoint_path(place_id), get_checkpoint_reviews_path(place_id)):
+        if os.path.exists(path):
+            os.remove(path)
+
+def fetch_reviews(api_key, place_id, limiter=None):
     params = {
         "engine": "google_maps_reviews",
         "place_id": place_id,
@@ -45,13 +176,28 @@ def fetch_reviews(api_key, place_id):
         "sort_by": "qualityScore"
     }
 
-    search = GoogleSearch(params)
     reviews = []
 
+    # Resume an interrupted crawl from its last good page
+    checkpoint = load_checkpoint(place_id)
+    if checkpoint and "reviews_offset" in checkpoint and os.path.exists(get_checkpoint_reviews_path(place_id)):
+        params.update(checkpoint["params"])
+        reviews = load_checkpoint_reviews(place_id, checkpoint["reviews_offset"])
+    else:
+        clear_checkpoint(place_id)
+
+    # Pages depend on the previous page's token, so they are always fetched in order
+    pages = 0
     while True:
-        result = search.get_dict()
+        result = search(params, limiter)
+        pages += 1
+        if "error" in result:
+            # Keep the checkpoint: the next run resumes from this page instead of saving a partial crawl
+            metrics.observe("serpapi_pages_per_place", pages, buckets=PAGE_BUCKETS)
+            raise Exception(f"SerpApi Error: {result['error']}")
         if "reviews" in result:
-            reviews.extend(result["reviews"])
+            page_reviews = parse_reviews(result["reviews"])
+            reviews.extend(page_reviews)
         else:
             break
 
@@ -60,48 +206,241 @@ def fetch_reviews(api_key, place_id):
         next_page_token = serpapi_pagination.get("next_page_token")
 
         if next_page and next_page_token:
-            search.params_dict.update(dict(parse_qsl(next_page.split('?', 1)[1])))
+            params.update(dict(parse_qsl(next_page.split('?', 1)[1])))
+            save_checkpoint(place_id, params, review_dicts(page_reviews))
         else:
             break
 
+    metrics.observe("serpapi_pages_per_place", pages, buckets=PAGE_BUCKETS)
     return reviews
 
-def main():
-    # Load your list of branches from a JSON file or hardcode it here
-    # For example, load from a file:
-    with open("motilal_oswal_branches_gujarat.json", "r", encoding="utf-8") as f:
-        branches = json.load(f)
+def collect_branch(api_key, branch, limiter=None):
+    """
+    Fetch place info and reviews for one branch and save them to a JSON file.
+    Returns (saved filename, number of reviews).
+    """
+    place_id = branch["place_id"]
 
-    print(f"Found {len(branches)} branches. Starting review scraping...\n")
+    # Get place info (optional - you already have some from the list)
+    with metrics.stage("collect.place_info"):
+        place_info = get_place_info(api_key, place_id, limiter)
 
-    for branch in branches:
-        place_id = branch.get("place_id")
-        if not place_id:
-            print("Skipping branch with missing place_id")
-            continue
+    # Fetch reviews
+    with metrics.stage("collect.reviews"):
+        reviews = fetch_reviews(api_key, place_id, limiter)
+
+    output_data = {
+        "place_info": place_info,
+        "reviews": review_dicts(reviews),
+        "total_reviews": len(reviews)
+    }
+
+    # Create a safe filename using the place title or place_id
+    safe_title = place_info.get('title', 'place').replace(' ', '_').replace('/', '_').lower()
+    filename = f"{safe_title}_{place_id}.json"
+
+    with open(filename + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(output_data, f, ensure_ascii=False, indent=2)
+    os.replace(filename + ".tmp", filename)
+    clear_checkpoint(place_id)
+
+    return filename, len(reviews)
 
-        print(f"Fetching data for: {branch.get('title')} ({place_id})")
+def fetch_new_reviews(api_key, place_id, known_review_ids, max_pages, budget, limiter=None):
+    """
+    Fetch reviews newest first until a page has no unknown review, `max_pages` pages were
+    fetched or the credit budget refuses the next page.
+    Returns (new reviews, whether the crawl reached the known reviews).
+    """
+    params = {
+        "engine": "google_maps_reviews",
+        "place_id": place_id,
+        "api_key": api_key,
+        "hl": "en",
+        "sort_by": "newestFirst"
+    }
 
-        # Get place info (optional - you already have some from the list)
-        place_info = get_place_info(API_KEY, place_id)
+    reviews = []
+    pages = 0
+    complete = False
+    while pages < max_pages and budget.spend(place_id):
+        result = search(params, limiter)
+        pages += 1
+        if "error" in result:
+            raise Exception(f"SerpApi Error: {result['error']}")
+
+        page_reviews = [r for r in parse_reviews(result.get("reviews", [])) if r.get("review_id") not in known_review_ids]
+        reviews.extend(page_reviews)
+
+        serpapi_pagination = result.get("serpapi_pagination", {})
+        next_page = serpapi_pagination.get("next")
+        if not page_reviews or not (next_page and serpapi_pagination.get("next_page_token")):
+            complete = True
+            break
+        params.update(dict(parse_qsl(next_page.split('?', 1)[1])))
 
-        # Fetch reviews
-        reviews = fetch_reviews(API_KEY, place_id)
-        print(f" - Fetched {len(reviews)} reviews")
+    metrics.observe("serpapi_pages_per_place", pages, buckets=PAGE_BUCKETS)
+    return reviews, complete
 
+def refresh_branch(api_key, branch, planned, state, budget, limiter=None):
+    """
+    Refresh one branch picked by the scheduler: probe its reviews_count, fetch only the
+    reviews added since the last crawl and merge them into its saved file.
+    Returns the saved filename and the number of new reviews.
+    """
+    place_id = branch["place_id"]
+    entry = state.get(place_id)
+
+    if not budget.spend(place_id):
+        raise Exception("Credit budget exhausted before the place info request")
+    with metrics.stage("collect.place_info"):
+        place_info = get_place_info(api_key, place_id, limiter)
+    if not place_info:
+        raise Exception("No place information returned")
+
+    filename = (entry or {}).get("file") or find_saved_file(place_id)
+    saved_reviews = []
+    if filename and os.path.exists(filename):
+        with open(filename, "r", encoding="utf-8") as f:
+            saved_reviews = parse_reviews(json.load(f).get("reviews", []))
+
+    # The reviews_count delta tells how many pages the new reviews need
+    reviews_count = place_info.get("reviews_count")
+    if entry and isinstance(reviews_count, int) and entry.get("reviews_count") is not None:
+        wanted = max(reviews_count - entry["reviews_count"], 0) + entry.get("backlog", 0)
+    elif not entry and isinstance(reviews_count, int):
+        wanted = reviews_count
+    else:
+        wanted = None
+
+    new_reviews = []
+    backlog = 0
+    if wanted != 0:
+        max_pages = min(pages_for(wanted), MAX_PAGES_PER_PLACE) if wanted else planned["pages"]
+        known_review_ids = {r.get("review_id") for r in saved_reviews if r.get("review_id")}
+        with metrics.stage("collect.reviews"):
+            new_reviews, complete = fetch_new_reviews(api_key, place_id, known_review_ids, max_pages, budget, limiter)
+        if not complete and wanted:
+            backlog = max(wanted - len(new_reviews), 0)
+
+    reviews = review_dicts(new_reviews + saved_reviews)
+    if new_reviews or not filename:
+        if not filename:
+            safe_title = place_info.get('title', 'place').replace(' ', '_').replace('/', '_').lower()
+            filename = f"{safe_title}_{place_id}.json"
         output_data = {
             "place_info": place_info,
             "reviews": reviews,
             "total_reviews": len(reviews)
         }
+        with open(filename + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(output_data, f, ensure_ascii=False, indent=2)
+        os.replace(filename + ".tmp", filename)
 
-        # Create a safe filename using the place title or place_id
-        safe_title = place_info.get('title', 'place').replace(' ', '_').replace('/', '_').lower()
-        filename = f"{safe_title}_{place_id}.json"
+    state.record_crawl(place_id, reviews_count, reviews, backlog=backlog, path=filename)
+    state.save()
+    return filename, len(new_reviews)
 
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
-        print(f" - Saved data to {filename}\n")
+def refresh_branches(api_key, branches, credit_budget, max_workers=MAX_WORKERS, requests_per_second=REQUESTS_PER_SECOND):
+    """
+    Refresh the branches the scheduler picks for this run without spending more than
+    `credit_budget` SerpApi credits. Returns a list of place_ids that failed.
+    """
+    state = RefreshState()
+    seeded = state.seed_from_files([b["place_id"] for b in branches])
+    if seeded:
+        print(f"Seeded refresh state from {seeded} saved review files")
+
+    plan = plan_refresh(branches, state, credit_budget)
+    print(f"Refreshing {len(plan)} of {len(branches)} branches with {sum(p['credits'] for p in plan)} "
+          f"of {credit_budget} credits planned")
+    for planned in plan:
+        print(f"   {planned['title'] or planned['place_id']}: {planned['reason']}, "
+              f"~{planned['expected_new']} new reviews, up to {planned['pages']} pages")
+
+    budget = CreditBudget(credit_budget)
+    for planned in plan:
+        budget.reserve(planned["place_id"], planned["credits"])
+
+    branches_by_id = {b["place_id"]: b for b in branches}
+    limiter = TokenBucket(requests_per_second, BURST_SIZE)
+    failed = []
+
+    def run(planned):
+        try:
+            return refresh_branch(api_key, branches_by_id[planned["place_id"]], planned, state, budget, limiter)
+        finally:
+            budget.release(planned["place_id"])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run, planned): planned for planned in plan}
+
+        for future in as_completed(futures):
+            planned = futures[future]
+            try:
+                filename, count = future.result()
+                print(f"Fetched {count} new reviews for: {planned['title']} ({planned['place_id']}) -> {filename}")
+            except Exception as e:
+                failed.append(planned["place_id"])
+                print(f"Failed: {planned['title']} ({planned['place_id']}): {e}")
+
+    print(f"Spent {budget.spent} of {credit_budget} credits")
+    return failed
+
+def collect_branches(api_key, branches, max_workers=MAX_WORKERS, requests_per_second=REQUESTS_PER_SECOND):
+    """
+    Collect many branches in parallel behind one shared rate limiter.
+    A failing branch is reported and skipped without stopping the others.
+    Returns a list of place_ids that failed.
+    """
+    limiter = TokenBucket(requests_per_second, BURST_SIZE)
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(collect_branch, api_key, branch, limiter): branch
+            for branch in branches
+        }
+
+        for future in as_completed(futures):
+            branch = futures[future]
+            try:
+                filename, count = future.result()
+                print(f"Fetched {count} reviews for: {branch.get('title')} ({branch['place_id']}) -> {filename}")
+            except Exception as e:
+                failed.append(branch["place_id"])
+                print(f"Failed: {branch.get('title')} ({branch['place_id']}): {e}")
+
+    return failed
+
+def main():
+    # Load your list of branches from a JSON file or hardcode it here
+    # For example, load from a file:
+    with open("motilal_oswal_branches_gujarat.json", "r", encoding="utf-8") as f:
+        branches = json.load(f)
+
+    print(f"Found {len(branches)} branches. Starting review scraping...\n")
+
+    valid_branches = []
+    for branch in branches:
+        if not branch.get("place_id"):
+            print("Skipping branch with missing place_id")
+            continue
+        valid_branches.append(branch)
+
+    print(f"Using {MAX_WORKERS} workers at {REQUESTS_PER_SECOND} requests/second\n")
+    if REFRESH_CREDIT_BUDGET > 0:
+        with metrics.stage("collect.refresh"):
+            failed = refresh_branches(API_KEY, valid_branches, REFRESH_CREDIT_BUDGET)
+        print(f"\nDone. {len(failed)} failed.")
+    else:
+        with metrics.stage("collect.branches"):
+            failed = collect_branches(API_KEY, valid_branches)
+        print(f"\nDone. {len(valid_branches) - len(failed)} succeeded, {len(failed)} failed.")
+
+    if failed:
+        print("Failed place_ids: " + ", ".join(failed))
+    metrics.export("collect_branches")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,246 @@
+"""
+This script benchmarks the pipeline offline, on a synthetic corpus (synthetic_corpus.py) with
+the local SerpApi and Bedrock stand-ins (fake_serpapi.py, fake_bedrock.py), so throughput can be
+compared across commits without an API key, AWS credentials or credits.
+
+Key functionalities include:
+1. collection: the collector's fetch_reviews over every place, including pagination,
+   checkpoints and cache writes (reviews per second).
+2. merge / merge_unchanged: Samples/Motilal/app.py over per-place JSON files, first run and a
+   re-run with nothing changed (reviews per second).
+3. chunking: the summarizer's tokenization and chunk packing (reviews per second).
+4. dedup: near-duplicate clustering (reviews per second).
+5. summarization: end-to-end summarize_reviews latency with the fake Bedrock client, whose
+   time to first token is set with --bedrock-latency.
+6. Results saved as benchmarks/<commit>.json, and compared with an earlier result file:
+
+   python benchmarks.py --reviews 100000 --compare benchmarks/<older commit>.json
+
+Each benchmark runs --repeat times in a fresh temporary folder and the fastest run is kept.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from reviews_cli import load_script
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DIR = os.path.join(ROOT, "benchmarks")
+BENCHMARKS = ["collection", "merge", "merge_unchanged", "chunking", "dedup", "summarization"]
+SUMMARIZATION_REVIEWS = 5000  # End-to-end summarization runs on (at most) this many reviews
+
+
+@contextlib.contextmanager
+def quiet():
+    """Hide the progress output of the benchmarked code."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def workdir():
+    """Run inside a fresh temporary folder (checkpoints, caches and outputs land there)."""
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_") as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(previous)
+
+
+@contextlib.contextmanager
+def patched(target, **values):
+    """Set attributes of a module or object, restoring the previous values on exit."""
+    previous = {name: getattr(target, name) for name in values}
+    for name, value in values.items():
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(target, name, value)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short=12", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_collection(corpus, args):
+    import fake_serpapi
+    import serpapi_cache
+    from pipeline_metrics import metrics
+
+    collector = load_script("1. serpapi_place_reviews_collector.py", "collector")
+    server = fake_serpapi.FakeSerpApi(places=corpus, latency=args.serpapi_latency)
+
+    # The fake server (as fake_serpapi.install would set it), client, cache folder and metrics
+    # switch are restored afterwards, so later benchmarks and callers are unaffected
+    with workdir() as path, \
+            patched(fake_serpapi, _default_server=server), \
+            patched(serpapi_cache, GoogleSearch=fake_serpapi.GoogleSearch, CACHE_DIR=os.path.join(path, ".serpapi_cache")), \
+            patched(metrics, enabled=False):
+        start = time.perf_counter()
+        with quiet():
+            count = sum(len(collector.fetch_reviews("fake", place_id)) for place_id in corpus)
+        return count, time.perf_counter() - start
+
+
+def _run_merge(folder, runs):
+    """Run app.py `runs` times over `folder`; return the duration of the last run."""
+    env = {**os.environ, "PIPELINE_METRICS": "0"}
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "Samples", "Motilal", "app.py"), folder],
+            env=env, check=True, stdout=subprocess.DEVNULL
+        )
+    return time.perf_counter() - start
+
+
+def bench_merge(corpus, args, runs=1):
+    with workdir() as path:
+        folder = os.path.join(path, "reviews")
+        os.makedirs(folder)
+        for place_id, (place_info, reviews) in corpus.items():
+            with open(os.path.join(folder, f"place_{place_id}.json"), "w", encoding="utf-8") as f:
+                json.dump({"place_info": place_info, "reviews": reviews, "total_reviews": len(reviews)}, f)
+        seconds = _run_merge(folder, runs)
+    return sum(len(reviews) for _, reviews in corpus.values()), seconds
+
+
+def bench_merge_unchanged(corpus, args):
+    return bench_merge(corpus, args, runs=2)
+
+
+def _texts(corpus):
+    return [review["snippet"] for _, reviews in corpus.values() for review in reviews]
+
+
+def _summarizer(args):
+    from fake_bedrock import FakeBedrockClient
+    module = load_script("2. review_summarizer_bedrock.py", "summarizer")
+    client = FakeBedrockClient(capacity=module.MAX_CONCURRENT_REQUESTS, first_token_latency=args.bedrock_latency, seed=0)
+    return module, module.ReviewSummarizer(client=client, cache_dir=None)
+
+
+def bench_chunking(corpus, args):
+    module, summarizer = _summarizer(args)
+    texts = _texts(corpus)
+    blocks = [texts[i:i + module.CSV_BLOCK_SIZE] for i in range(0, len(texts), module.CSV_BLOCK_SIZE)]
+    start = time.perf_counter()
+    for _ in summarizer.pack_chunks(blocks):
+        pass
+    return len(texts), time.perf_counter() - start
+
+
+def bench_dedup(corpus, args):
+    from near_duplicates import find_near_duplicates
+    texts = _texts(corpus)
+    start = time.perf_counter()
+    find_near_duplicates(texts)
+    return len(texts), time.perf_counter() - start
+
+
+def bench_summarization(corpus, args):
+    import csv
+    _, summarizer = _summarizer(args)
+    texts = _texts(corpus)[:SUMMARIZATION_REVIEWS]
+    with workdir():
+        with open("reviews.csv", "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["review"])
+            writer.writerows([text] for text in texts)
+        start = time.perf_counter()
+        with quiet():
+            summarizer.summarize_reviews("reviews.csv")
+        return len(texts), time.perf_counter() - start
+
+
+def run_benchmarks(names, corpus, args):
+    results = {}
+    for name in names:
+        bench = globals()[f"bench_{name}"]
+        best = None
+        for _ in range(args.repeat):
+            count, seconds = bench(corpus, args)
+            best = seconds if best is None else min(best, seconds)
+        results[name] = {"reviews": count, "seconds": round(best, 4), "reviews_per_second": round(count / best, 1)}
+        print(f"⏱️ {name}: {count} reviews in {best:.2f}s ({count / best:,.0f} reviews/s)")
+    return results
+
+
+def print_comparison(results, baseline):
+    print(f"\n📊 Compared with {baseline['commit']} ({baseline['reviews']} reviews):")
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if not old:
+            continue
+        change = result["reviews_per_second"] / old["reviews_per_second"] - 1
+        print(f"   {name}: {old['reviews_per_second']:,.0f} -> {result['reviews_per_second']:,.0f} reviews/s ({change:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark collection, merge, chunking and summarization offline.")
+    parser.add_argument("--reviews", type=int, default=100000, help="Reviews in the synthetic corpus")
+    parser.add_argument("--places", type=int, default=200, help="Places in the synthetic corpus")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per benchmark; the fastest is kept")
+    parser.add_argument("--serpapi-latency", type=float, default=0.0, help="Seconds per fake SerpApi request")
+    parser.add_argument("--bedrock-latency", type=float, default=0.2, help="Fake Bedrock time to first token")
+    parser.add_argument("--compare", help="Earlier result file to compare with")
+    args = parser.parse_args()
+
+    # Shared modules live next to this script
+    sys.path.insert(0, ROOT)
+    from synthetic_corpus import CorpusGenerator
+
+    print(f"🧪 Generating {args.reviews} reviews over {args.places} places...")
+    corpus = {
+        place_info["place_id"]: (place_info, reviews)
+        for place_info, reviews in CorpusGenerator().iter_places(args.reviews, args.places)
+    }
+
+    # Read the baseline first: it may be the file this run overwrites
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "reviews": args.reviews,
+        "places": args.places,
+        "results": run_benchmarks(args.only or BENCHMARKS, corpus, args)
+    }
+
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    path = os.path.join(BENCHMARK_DIR, f"{commit}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results saved to: {path}")
+
+    if baseline:
+        print_comparison(report["results"], baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+This script ingests the CSV files downloaded by scraping.js (Author, Rating, Date, Review) into
+the same per-place review JSON files the collector writes, so Samples/Motilal/app.py merges
+browser-scraped reviews into the combined dataset next to the SerpApi ones.
+
+Key functionalities include:
+1. Reading one or more CSV files or folders (the google_maps_reviews_partNNN.csv chunks of the
+   observer mode, or the single google_maps_reviews.csv of the poll mode), one row at a time.
+2. Normalizing every row to the SerpApi review shape:
+   - the rating from the aria-label ("5 stars", "Rated 4.0 out of 5", "4 Sterne") as 1-5,
+   - the relative date ("3 months ago", "Edited a year ago") kept as `date`, plus an
+     approximate `iso_date` counted back from the time the CSV was downloaded,
+   - the author as `user.name` and the text as `snippet` (empty for rating-only reviews).
+3. A content hash (normalized author + normalized text) as `review_id`, since the page does not
+   expose Google's review IDs. Rows whose hash is already known are skipped: repeated rows across
+   chunks, reviews ingested in earlier runs, and reviews of the same place already collected
+   through SerpApi (matched by the same hash of their author and text).
+4. Writing `browser_<place_id>.json` ({"place_info", "reviews", "total_reviews"}) into the
+   reviews folder, atomically, so re-running the ingest only adds new reviews.
+
+Example:
+    python browser_reviews_ingest.py ~/Downloads/google_maps_reviews_part*.csv \
+        --place-id ChIJ... --title "Motilal Oswal Financial Services Limited" \
+        --address "Ahmedabad, Gujarat, India" --reviews-dir Samples/Motilal/reviews
+    python Samples/Motilal/app.py Samples/Motilal/reviews
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+from near_duplicates import normalize
+from review_records import RELATIVE_DATE_PATTERN, RELATIVE_UNIT_DAYS
+
+REVIEWS_DIR = os.path.join("Samples", "Motilal", "reviews")
+FILE_PREFIX = "browser_"
+HASH_PREFIX = "sha1:"
+CSV_COLUMNS = ["Author", "Rating", "Date", "Review"]
+
+RATING_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?)")
+
+
+def content_hash(author, text):
+    """Stable ID for a review without a Google review ID."""
+    key = f"{normalize(author or '')}\n{normalize(text or '')}"
+    return HASH_PREFIX + hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def parse_rating(label):
+    """First number of an aria-label like "5 stars" or "Rated 4.0 out of 5", or None."""
+    match = RATING_PATTERN.search(label or "")
+    if not match:
+        return None
+    rating = round(float(match.group(1).replace(",", ".")))
+    return rating if 1 <= rating <= 5 else None
+
+
+def parse_relative_date(relative, reference):
+    """ISO date for "a week ago" / "Edited 3 months ago" counted back from `reference`, or ""."""
+    match = RELATIVE_DATE_PATTERN.search(relative or "")
+    if not match:
+        return ""
+    amount = 1 if match.group(1).lower() in ("a", "an") else int(match.group(1))
+    days = amount * RELATIVE_UNIT_DAYS[match.group(2).lower()]
+    return (reference - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def find_csv_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith(".csv")
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def iter_csv_reviews(filepath):
+    """Yield SerpApi-shaped reviews from one scraping.js CSV file."""
+    # The browser saved the file right after scraping; relative dates count back from then
+    reference = datetime.fromtimestamp(os.path.getmtime(filepath), timezone.utc).replace(microsecond=0)
+
+    with open(filepath, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = set(CSV_COLUMNS) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"{filepath} is missing the columns {sorted(missing)} (expected {CSV_COLUMNS}).")
+
+        for row in reader:
+            text = (row["Review"] or "").strip()
+            rating = parse_rating(row["Rating"])
+            if not text and rating is None:
+                continue
+            author = (row["Author"] or "").strip()
+            review = {
+                "review_id": content_hash(author, text),
+                "rating": rating,
+                "date": (row["Date"] or "").strip(),
+                "iso_date": parse_relative_date(row["Date"], reference),
+                "source": "Browser",
+                "user": {"name": author},
+                "snippet": text
+            }
+            if review["rating"] is None:
+                del review["rating"]
+            yield review
+
+
+def load_place_file(filepath):
+    with open(filepath, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, dict) else {"reviews": data}
+
+
+def known_place(reviews_dir, place_id, browser_file):
+    """
+    place_info and content hashes of the place's reviews already in the reviews folder
+    (SerpApi files; the browser file itself is read by `ingest`).
+    """
+    place_info = {}
+    hashes = set()
+    if not os.path.isdir(reviews_dir):
+        return place_info, hashes
+
+    for name in sorted(os.listdir(reviews_dir)):
+        filepath = os.path.join(reviews_dir, name)
+        if not name.endswith(".json") or filepath == browser_file:
+            continue
+        try:
+            data = load_place_file(filepath)
+        except (OSError, ValueError):
+            continue
+        file_place_id = (data.get("place_info") or {}).get("place_id") or ""
+        if file_place_id != place_id and not name[:-len(".json")].endswith(place_id):
+            continue
+        place_info.update(data.get("place_info") or {})
+        for review in data.get("reviews", []):
+            hashes.add(content_hash((review.get("user") or {}).get("name"), review.get("snippet")))
+    return place_info, hashes
+
+
+def ingest(csv_paths, place_info, reviews_dir=REVIEWS_DIR):
+    """
+    Add the reviews of the given CSV files to `<reviews_dir>/browser_<place_id>.json`.
+    Returns (added, skipped).
+    """
+    place_id = place_info["place_id"]
+    browser_file = os.path.join(reviews_dir, f"{FILE_PREFIX}{place_id}.json")
+    collected_info, seen = known_place(reviews_dir, place_id, browser_file)
+
+    # Branch details given on the command line win over earlier runs and SerpApi files
+    existing = []
+    if os.path.exists(browser_file):
+        data = load_place_file(browser_file)
+        existing = data.get("reviews", [])
+        collected_info.update(data.get("place_info") or {})
+    place_info = {**collected_info, **{k: v for k, v in place_info.items() if v}}
+
+    seen.update(review["review_id"] for review in existing)
+
+    added = []
+    skipped = 0
+    for filepath in find_csv_files(csv_paths):
+        for review in iter_csv_reviews(filepath):
+            if review["review_id"] in seen:
+                skipped += 1
+                continue
+            seen.add(review["review_id"])
+            added.append(review)
+        print(f"📄 Read {filepath}")
+
+    if not added:
+        return 0, skipped
+
+    reviews = existing + added
+    os.makedirs(reviews_dir, exist_ok=True)
+    with open(browser_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"place_info": place_info, "reviews": reviews, "total_reviews": len(reviews)}, f, indent=2, ensure_ascii=False)
+    os.replace(browser_file + ".tmp", browser_file)
+    print(f"💾 Reviews saved to: {browser_file}")
+    return len(added), skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest scraping.js CSV exports into the per-place review files.")
+    parser.add_argument("csv", nargs="+", help="CSV files or folders of CSV files downloaded by scraping.js")
+    parser.add_argument("--place-id", required=True, help="Google place ID of the scraped place")
+    parser.add_argument("--title", default="", help="Branch name")
+    parser.add_argument("--address", default="", help="Branch address")
+    parser.add_argument("--rating", type=float, help="Overall place rating")
+    parser.add_argument("--reviews-dir", default=REVIEWS_DIR, help="Folder of review JSON files merged by app.py")
+    args = parser.parse_args()
+
+    place_info = {"place_id": args.place_id, "title": args.title, "address": args.address, "rating": args.rating}
+    added, skipped = ingest(args.csv, place_info, args.reviews_dir)
+
+    print(f"✅ Added {added} new reviews, skipped {skipped} already known")
+    if added:
+        print(f"🔄 Run: python Samples/Motilal/app.py {args.reviews_dir}")
+
+
+if __name__ == "__main__":
+    main()
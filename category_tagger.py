@@ -0,0 +1,98 @@
+"""
+This module tags reviews with the five summary areas used by the summarizer prompt
+(customer experience, product/service quality, pricing, digital platform, support)
+without calling an LLM.
+
+Key functionalities include:
+1. Configurable synonym lists per category (CATEGORY_SYNONYMS, or a JSON file with the same shape).
+2. All synonyms of all categories compiled into one regular expression, so each review is
+   scanned once no matter how many categories or synonyms there are.
+3. Tagging single texts, lists of texts, or a pandas column (one boolean column per category).
+
+Example:
+    tagger = CategoryTagger()
+    tagger.tag("The app keeps failing at OTP login")   # {"Digital Platform Experience"}
+    df = tagger.add_category_columns(df, "review_text")
+"""
+
+import json
+import re
+
+CATEGORY_SYNONYMS = {
+    "Customer Experience": [
+        "staff", "friendly", "behaviour", "behavior", "experience", "helpful", "polite",
+        "rude", "welcoming", "courteous", "attitude", "professional", "unprofessional"
+    ],
+    "Product / Service Quality": [
+        "advice", "advisory", "research", "quality", "guidance", "portfolio", "recommendation",
+        "recommendations", "tips", "returns", "execution", "knowledge", "expertise"
+    ],
+    "Pricing and Charges": [
+        "brokerage", "charges", "charge", "charged", "fees", "fee", "price", "pricing",
+        "hidden charges", "cost", "amc", "commission", "deducted", "deduction", "value for money"
+    ],
+    "Digital Platform Experience": [
+        "app", "application", "website", "online", "login", "otp", "platform", "portal",
+        "trading app", "mobile app", "crash", "crashes", "glitch", "interface", "ui"
+    ],
+    "Support and Issue Resolution": [
+        "support", "resolve", "resolved", "resolution", "issue", "issues", "complaint",
+        "complaints", "response", "call", "calls", "query", "queries", "follow up", "customer care"
+    ],
+}
+
+
+class CategoryTagger:
+    def __init__(self, synonyms=None):
+        self.synonyms = synonyms or CATEGORY_SYNONYMS
+        self.categories = list(self.synonyms)
+
+        # Normalized phrase -> categories it belongs to (a phrase may be listed under several)
+        self.phrase_categories = {}
+        for category, phrases in self.synonyms.items():
+            for phrase in phrases:
+                key = " ".join(phrase.lower().split())
+                self.phrase_categories.setdefault(key, set()).add(category)
+
+        # Longest phrases first so "hidden charges" wins over "charges"; \s+ lets multi-word
+        # phrases match across any whitespace
+        alternatives = sorted(self.phrase_categories, key=len, reverse=True)
+        body = "|".join(r"\s+".join(re.escape(word) for word in phrase.split()) for phrase in alternatives)
+        self.pattern = re.compile(rf"\b(?:{body})\b", re.IGNORECASE)
+
+    @classmethod
+    def from_json(cls, path):
+        """Load synonym lists from a JSON file shaped like CATEGORY_SYNONYMS."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _categories_of(self, match):
+        return self.phrase_categories[" ".join(match.lower().split())]
+
+    def tag(self, text):
+        """Return the set of categories mentioned in one text."""
+        found = set()
+        if not text:
+            return found
+        for match in self.pattern.findall(text):
+            found |= self._categories_of(match)
+        return found
+
+    def tag_many(self, texts):
+        """Tag a list of texts, scanning each one once."""
+        return [self.tag(text) for text in texts]
+
+    def add_category_columns(self, df, text_column):
+        """
+        Add one boolean column per category to a pandas DataFrame.
+        Each review is scanned once by the combined pattern; the matches are then
+        mapped to categories with vectorized pandas operations.
+        """
+        matches = df[text_column].fillna("").astype(str).str.findall(self.pattern).explode().dropna()
+        categories = matches.map(self._categories_of).explode()
+
+        for category in self.categories:
+            tagged_rows = categories.index[categories == category].unique()
+            df[category] = df.index.isin(tagged_rows)
+
+        return df
@@ -0,0 +1,197 @@
+"""
+This module provides a local stand-in for the boto3 `bedrock-runtime` client, so the
+summarizer's concurrency, retry and streaming code can be exercised without AWS credentials.
+
+Key functionalities include:
+1. `invoke_model` and `invoke_model_with_response_stream` with the same request and response
+   shapes as Bedrock's Meta Llama 3 models.
+2. Simulated latency: a fixed time to first token plus a per-token generation delay.
+3. Simulated throttling: requests above `capacity` concurrent calls (and a random share of
+   the others, `throttle_rate`) fail with a ThrottlingException shaped like botocore's ClientError.
+   A further share (`error_rate`) fails with ServiceUnavailableException.
+4. Replies to packed multi-branch prompts keep each "=== BRANCH n ===" section apart.
+5. Counters for calls, throttles and peak concurrency.
+6. Record/replay: RecordingBedrockClient wraps a real client and appends every reply to a
+   JSONL file; FakeBedrockClient(recordings=...) replays those replies for the same prompts
+   and generates the rest.
+
+Example:
+    summarizer = ReviewSummarizer(client=FakeBedrockClient(capacity=2, throttle_rate=0.1))
+
+The summarizer script uses it when BEDROCK_FAKE=1 (replaying BEDROCK_RECORDINGS if set).
+"""
+
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+
+THROTTLE_MESSAGE = "Too many requests, please wait before trying again."
+UNAVAILABLE_MESSAGE = "Bedrock is unable to process your request."
+BRANCH_MARKER = re.compile(r"=== BRANCH \d+ ===")
+
+
+class FakeClientError(Exception):
+    """Same `response` shape as botocore.exceptions.ClientError."""
+
+    def __init__(self, code, message, operation_name):
+        super().__init__(f"An error occurred ({code}) when calling the {operation_name} operation: {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+        self.operation_name = operation_name
+
+
+def prompt_key(body):
+    """Recording key of a request: the SHA-256 of its prompt."""
+    return hashlib.sha256(json.loads(body)["prompt"].encode("utf-8")).hexdigest()
+
+
+def load_recordings(path):
+    """Read a RecordingBedrockClient JSONL file into {prompt key: record}."""
+    recordings = {}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Partially written last line
+                recordings[record["key"]] = record
+    return recordings
+
+
+class FakeBedrockClient:
+    def __init__(self, capacity=4, throttle_rate=0.0, first_token_latency=0.2, token_latency=0.002,
+                 generation_tokens=60, seed=None, error_rate=0.0, recordings=None):
+        self.capacity = capacity
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.recordings = load_recordings(recordings)
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.generation_tokens = generation_tokens
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+        self.errors = 0
+        self.replayed = 0
+        self.peak_in_flight = 0
+
+    def _start(self, operation_name):
+        with self.lock:
+            self.calls += 1
+            if self.in_flight >= self.capacity or self.random.random() < self.throttle_rate:
+                self.throttled += 1
+                raise FakeClientError("ThrottlingException", THROTTLE_MESSAGE, operation_name)
+            if self.random.random() < self.error_rate:
+                self.errors += 1
+                raise FakeClientError("ServiceUnavailableException", UNAVAILABLE_MESSAGE, operation_name)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _finish(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def _generation(self, body):
+        prompt = json.loads(body)["prompt"]
+        recorded = self.recordings.get(prompt_key(body))
+        if recorded:
+            with self.lock:
+                self.replayed += 1
+            return prompt, re.findall(r"\s*\S+", recorded["generation"]) or [""]
+
+        words = [f" word{i}" for i in range(self.generation_tokens)]
+        # Echo the prompt size so different prompts give different summaries
+        pieces = [f"Summary of {len(prompt)} characters:"] + words
+
+        # Prompts that pack several branches get one marked section per branch
+        markers = list(dict.fromkeys(BRANCH_MARKER.findall(prompt)))
+        if markers:
+            pieces = [piece for marker in markers for piece in [f"{marker}\n"] + pieces + ["\n"]]
+        return prompt, pieces
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self._start("InvokeModel")
+        try:
+            prompt, pieces = self._generation(body)
+            time.sleep(self.first_token_latency + self.token_latency * len(pieces))
+            result = {
+                "generation": "".join(pieces),
+                "prompt_token_count": len(prompt) // 4,
+                "generation_token_count": len(pieces),
+                "stop_reason": "stop"
+            }
+            return {"body": io.BytesIO(json.dumps(result).encode("utf-8"))}
+        finally:
+            self._finish()
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        self._start("InvokeModelWithResponseStream")
+        prompt, pieces = self._generation(body)
+        return {"body": self._stream(prompt, pieces)}
+
+    def _stream(self, prompt, pieces):
+        try:
+            time.sleep(self.first_token_latency)
+            for i, piece in enumerate(pieces):
+                time.sleep(self.token_latency)
+                event = {"generation": piece, "stop_reason": "stop" if i == len(pieces) - 1 else None}
+                if i == len(pieces) - 1:
+                    event["amazon-bedrock-invocationMetrics"] = {
+                        "inputTokenCount": len(prompt) // 4,
+                        "outputTokenCount": len(pieces)
+                    }
+                yield {"chunk": {"bytes": json.dumps(event).encode("utf-8")}}
+        finally:
+            self._finish()
+
+
+class RecordingBedrockClient:
+    """
+    Wraps a bedrock-runtime client and appends every successful reply (prompt key, generation,
+    token counts) to a JSONL file that FakeBedrockClient(recordings=path) can replay.
+    """
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.lock = threading.Lock()
+
+    def _record(self, body, generation, input_tokens, output_tokens):
+        record = {
+            "key": prompt_key(body),
+            "generation": generation,
+            "prompt_token_count": input_tokens,
+            "generation_token_count": output_tokens
+        }
+        with self.lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def invoke_model(self, modelId, body, **kwargs):
+        response = self.client.invoke_model(modelId=modelId, body=body, **kwargs)
+        payload = response["body"].read()
+        result = json.loads(payload)
+        self._record(body, result["generation"], result.get("prompt_token_count"), result.get("generation_token_count"))
+        return {**response, "body": io.BytesIO(payload)}
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        response = self.client.invoke_model_with_response_stream(modelId=modelId, body=body, **kwargs)
+        return {**response, "body": self._recorded_stream(body, response["body"])}
+
+    def _recorded_stream(self, body, events):
+        pieces = []
+        usage = {}
+        for event in events:
+            if "chunk" in event:
+                payload = json.loads(event["chunk"]["bytes"])
+                pieces.append(payload.get("generation", ""))
+                usage = payload.get("amazon-bedrock-invocationMetrics", usage)
+            yield event
+        self._record(body, "".join(pieces), usage.get("inputTokenCount"), usage.get("outputTokenCount"))
@@ -0,0 +1,230 @@
+"""
+This module provides a local stand-in for SerpApi, so the collector, branch scraper and
+Samples/Motilal scripts can be run, timed and regression-tested without an API key or credits.
+
+Key functionalities include:
+1. Replaying recorded responses: any folder in the serpapi_cache.py layout (e.g. a copy of
+   .serpapi_cache after a live run) is served first, matched by the same request key.
+2. Answering everything else from place fixtures, i.e. collector-style review JSON files
+   (Samples/Motilal/reviews, or a corpus from synthetic_corpus.py):
+   - `google_maps` with a place_id returns `place_results`,
+   - `google_maps` searches return the fixture places as `local_results`,
+   - `google_maps_reviews` returns 8 reviews on the first page and 20 on the following ones,
+     with `serpapi_pagination` links and `sort_by` (newestFirst / qualityScore) honoured.
+3. Simulated latency per request and a random share of failed searches (`error_rate`),
+   returned as `{"error": ...}` like SerpApi does.
+4. A drop-in `GoogleSearch` class (`get_dict()`, `get_account()`) used by serpapi_cache.py and
+   Samples/Motilal/main.py when SERPAPI_FAKE_DIR is set.
+
+Example:
+    SERPAPI_FAKE_DIR=Samples/Motilal/reviews python "1. serpapi_place_reviews_collector.py"
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+FAKE_DIR = os.getenv("SERPAPI_FAKE_DIR", "")  # Place fixtures (review JSON files)
+RECORDINGS_DIR = os.getenv("SERPAPI_RECORDINGS_DIR", "")  # Recorded responses in the serpapi_cache layout
+FAKE_LATENCY = float(os.getenv("SERPAPI_FAKE_LATENCY", "0"))  # Seconds per request
+FAKE_ERROR_RATE = float(os.getenv("SERPAPI_FAKE_ERROR_RATE", "0"))  # Share of searches that fail
+
+FIRST_PAGE_REVIEWS = 8
+NEXT_PAGE_REVIEWS = 20
+SEARCH_PAGE_SIZE = 20
+ENDPOINT = "https://serpapi.com/search.json"
+
+NO_RESULTS_ERROR = "Google hasn't returned any results for this query."
+SIMULATED_ERROR = "Simulated SerpApi error."
+
+
+def _place_id_from_name(name):
+    # Titles and place IDs both contain underscores; Google place IDs start with "ChI"
+    stem = name[:-len(".json")]
+    index = stem.find("ChI")
+    return stem[index:] if index >= 0 else stem.split("_", 1)[-1]
+
+
+def load_places(fixtures_dir):
+    """
+    Read collector-style review files ({"place_info", "reviews"}) into {place_id: (place_info, reviews)}.
+    The place_id comes from place_info, or else from the `<title>_<place_id>.json` file name.
+    """
+    places = {}
+    for name in sorted(os.listdir(fixtures_dir)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(fixtures_dir, name), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or "reviews" not in data:
+            continue
+        place_info = data.get("place_info") or {}
+        place_id = place_info.get("place_id") or _place_id_from_name(name)
+        places[place_id] = ({**place_info, "place_id": place_id}, data.get("reviews", []))
+    return places
+
+
+class FakeSerpApi:
+    def __init__(self, fixtures_dir=None, recordings_dir=None, latency=0.0, error_rate=0.0, seed=None, places=None):
+        self.places = places if places is not None else (load_places(fixtures_dir) if fixtures_dir else {})
+        self.recordings_dir = recordings_dir
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.newest_first = {}  # place_id -> reviews sorted by iso_date, built on first use
+
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.replayed = 0
+
+    def search(self, params):
+        with self.lock:
+            self.calls += 1
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            return {"error": SIMULATED_ERROR}
+
+        recorded = self._recorded(params)
+        if recorded is not None:
+            with self.lock:
+                self.replayed += 1
+            return recorded
+
+        engine = params.get("engine")
+        if engine == "google_maps_reviews":
+            return self._reviews_page(params)
+        if engine == "google_maps" and params.get("place_id"):
+            return self._place_results(params["place_id"])
+        if engine == "google_maps":
+            return self._local_results(params)
+        return {"error": f"Unsupported engine: {engine}"}
+
+    def _recorded(self, params):
+        if not self.recordings_dir:
+            return None
+        from serpapi_cache import cache_key
+        key = cache_key(params)
+        try:
+            with open(os.path.join(self.recordings_dir, key[:2], f"{key}.json"), "r", encoding="utf-8") as f:
+                return json.load(f).get("response")
+        except (OSError, ValueError):
+            return None
+
+    def _place_results(self, place_id):
+        if place_id not in self.places:
+            return {"error": NO_RESULTS_ERROR}
+        place_info, reviews = self.places[place_id]
+        return {"place_results": {
+            "place_id": place_id,
+            "title": place_info.get("title", ""),
+            "address": place_info.get("address", ""),
+            "rating": place_info.get("rating"),
+            "reviews": place_info.get("reviews_count") or len(reviews),
+            "phone": place_info.get("phone", ""),
+            "website": place_info.get("website", ""),
+            "hours": place_info.get("hours", []),
+            "type": place_info.get("type", [])
+        }}
+
+    def _local_results(self, params):
+        start = int(params.get("start", 0))
+        places = list(self.places.values())[start:start + SEARCH_PAGE_SIZE]
+        if not places:
+            return {"error": NO_RESULTS_ERROR}
+
+        result = {"local_results": [
+            {
+                "place_id": place_info["place_id"],
+                "title": place_info.get("title", ""),
+                "address": place_info.get("address", ""),
+                "rating": place_info.get("rating"),
+                "reviews": place_info.get("reviews_count") or len(reviews)
+            }
+            for place_info, reviews in places
+        ]}
+        if start + SEARCH_PAGE_SIZE < len(self.places):
+            next_params = {k: v for k, v in params.items() if k != "api_key"}
+            next_params["start"] = start + SEARCH_PAGE_SIZE
+            result["serpapi_pagination"] = {"next": f"{ENDPOINT}?{urlencode(next_params)}"}
+        return result
+
+    def _sorted_reviews(self, place_id, sort_by):
+        reviews = self.places[place_id][1]
+        if sort_by != "newestFirst":
+            return reviews
+        with self.lock:
+            if place_id not in self.newest_first:
+                self.newest_first[place_id] = sorted(reviews, key=lambda r: r.get("iso_date") or "", reverse=True)
+            return self.newest_first[place_id]
+
+    def _reviews_page(self, params):
+        place_id = params.get("place_id")
+        if place_id not in self.places:
+            return {"error": NO_RESULTS_ERROR}
+
+        # The page token is the offset of the page's first review
+        token = params.get("next_page_token")
+        start = int(token) if token else 0
+        size = FIRST_PAGE_REVIEWS if not token else NEXT_PAGE_REVIEWS
+        reviews = self._sorted_reviews(place_id, params.get("sort_by"))
+        place_info = self.places[place_id][0]
+
+        result = {
+            "search_parameters": {k: v for k, v in params.items() if k != "api_key"},
+            "place_info": {
+                "title": place_info.get("title", ""),
+                "address": place_info.get("address", ""),
+                "rating": place_info.get("rating"),
+                "reviews": place_info.get("reviews_count") or len(reviews)
+            },
+            "reviews": reviews[start:start + size]
+        }
+        if start + size < len(reviews):
+            next_params = {k: v for k, v in params.items() if k not in ("api_key", "next_page_token", "num")}
+            next_params.update(next_page_token=str(start + size), num=NEXT_PAGE_REVIEWS)
+            result["serpapi_pagination"] = {
+                "next": f"{ENDPOINT}?{urlencode(next_params)}",
+                "next_page_token": str(start + size)
+            }
+        return result
+
+
+_default_server = None
+_default_lock = threading.Lock()
+
+
+def default_server():
+    """The process-wide server configured by the SERPAPI_FAKE_* environment variables."""
+    global _default_server
+    with _default_lock:
+        if _default_server is None:
+            _default_server = FakeSerpApi(FAKE_DIR or None, RECORDINGS_DIR or None, FAKE_LATENCY, FAKE_ERROR_RATE)
+        return _default_server
+
+
+def install(server):
+    """Make `server` answer every GoogleSearch created from now on."""
+    global _default_server
+    with _default_lock:
+        _default_server = server
+
+
+class GoogleSearch:
+    """Same interface as serpapi.GoogleSearch for the calls this repo makes."""
+
+    def __init__(self, params):
+        self.params = params
+
+    def get_dict(self):
+        return default_server().search(self.params)
+
+    def get_account(self):
+        return {"account_id": "fake", "plan_searches_left": 1000000}
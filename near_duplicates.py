@@ -0,0 +1,141 @@
+"""
+This module finds near-duplicate reviews (stock phrases like "Nice service", copy-pasted or
+templated text) so the summarizer can send each of them to Bedrock once instead of once per copy.
+
+Key functionalities include:
+1. Normalizing every review (case, punctuation, whitespace) and splitting it into overlapping
+   5-byte shingles.
+2. MinHash signatures computed for a whole block of reviews at once with numpy, with no
+   per-shingle Python loop.
+3. LSH banding: reviews whose signatures agree on a band land in the same bucket and join the
+   bucket's first review when their estimated similarity reaches SIMILARITY_THRESHOLD.
+   Buckets are built with numpy and every review is compared with at most one other review
+   per band, so clustering runs in roughly linear time across all branches.
+4. One representative (the first occurrence) per cluster, plus the cluster sizes for statistics.
+
+Example:
+    clusters = find_near_duplicates(reviews)
+    for text, count in clusters.representatives():
+        print(count, text)
+"""
+
+import re
+
+import numpy as np
+
+NUM_PERMUTATIONS = 64  # MinHash signature length
+BANDS = 16  # LSH bands; NUM_PERMUTATIONS / BANDS signature rows per band
+SIMILARITY_THRESHOLD = 0.7  # Estimated Jaccard similarity needed to join a cluster
+SHINGLE_SIZE = 5  # Bytes per shingle (at most 8)
+SIGNATURE_BLOCK_SIZE = 10000  # Reviews hashed per numpy batch
+SEED = 1
+
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+def normalize(text):
+    """Lowercase, drop punctuation and collapse whitespace. Falls back to the raw text (e.g. emoji only)."""
+    normalized = " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+    return normalized or text.strip()
+
+
+class MinHasher:
+    def __init__(self, num_permutations=NUM_PERMUTATIONS, seed=SEED):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+
+    def signatures(self, texts):
+        """
+        Return a (len(texts), num_permutations) uint32 array of MinHash signatures.
+        The shingles of the whole block are hashed in one array per permutation.
+        Duplicate shingles within a review do not change its minimum, so they are not removed.
+        """
+        if not texts:
+            return np.empty((0, len(self.a)), dtype=np.uint32)
+        encoded = [text.encode("utf-8").ljust(SHINGLE_SIZE, b"\0") for text in texts]
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        lengths = np.array([len(e) for e in encoded])
+
+        # Pack every SHINGLE_SIZE-byte window into one integer (exact, as SHINGLE_SIZE <= 8)
+        windows = np.zeros(len(data) - SHINGLE_SIZE + 1, dtype=np.uint64)
+        for k in range(SHINGLE_SIZE):
+            windows |= data[k:len(windows) + k] << np.uint64(8 * k)
+
+        # Keep the windows that lie inside one review; each review's shingles stay contiguous
+        counts = lengths - SHINGLE_SIZE + 1
+        offsets = np.cumsum(counts) - counts
+        starts = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+        flat = windows[positions] % MERSENNE_PRIME
+
+        signatures = np.empty((len(texts), len(self.a)), dtype=np.uint32)
+        for j, (a, b) in enumerate(zip(self.a, self.b)):
+            signatures[:, j] = np.minimum.reduceat((a * flat + b) % MERSENNE_PRIME, offsets)
+        return signatures
+
+
+class NearDuplicateClusters:
+    """
+    Result of find_near_duplicates: `labels[i]` is the index of the first review of review i's cluster.
+    """
+
+    def __init__(self, texts, labels):
+        self.texts = texts
+        self.labels = labels
+        self.counts = {}
+        for label in labels:
+            self.counts[label] = self.counts.get(label, 0) + 1
+
+    def representatives(self):
+        """(text, cluster size) for every cluster, in order of first occurrence."""
+        return [(self.texts[label], count) for label, count in self.counts.items()]
+
+    def sizes(self):
+        return list(self.counts.values())
+
+    def largest(self, n=5):
+        """The n most repeated texts, likely stock phrases or templated spam."""
+        top = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [(self.texts[label], count) for label, count in top if count > 1]
+
+
+def find_near_duplicates(texts, threshold=SIMILARITY_THRESHOLD, bands=BANDS, num_permutations=NUM_PERMUTATIONS):
+    """
+    Cluster near-duplicate texts with MinHash + LSH. Returns a NearDuplicateClusters.
+    """
+    rows = num_permutations // bands
+    hasher = MinHasher(num_permutations)
+    normalized = [normalize(text) for text in texts]
+
+    signatures = np.empty((len(texts), num_permutations), dtype=np.uint32)
+    for start in range(0, len(texts), SIGNATURE_BLOCK_SIZE):
+        block = normalized[start:start + SIGNATURE_BLOCK_SIZE]
+        signatures[start:start + len(block)] = hasher.signatures(block)
+
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    indices = np.arange(len(texts))
+    for band in range(bands):
+        # Bucket the band's rows (viewed as one opaque key per review) and find each bucket's first review
+        band_keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        band_keys = band_keys.view(np.dtype((np.void, band_keys.dtype.itemsize * rows))).ravel()
+        _, first_index, bucket = np.unique(band_keys, return_index=True, return_inverse=True)
+        first = first_index[bucket.ravel()]
+
+        # Banding only proposes candidates; check the full signature before merging
+        candidates = indices[first != indices]
+        similar = (signatures[candidates] == signatures[first[candidates]]).sum(axis=1) >= threshold * num_permutations
+
+        for i, j in zip(candidates[similar].tolist(), first[candidates[similar]].tolist()):
+            root_i, root_j = find(i), find(j)
+            # The earlier review stays the cluster's representative
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    return NearDuplicateClusters(texts, [find(i) for i in range(len(texts))])
@@ -0,0 +1,225 @@
+"""
+This module is the shared instrumentation layer of the pipeline (collector, branch scraper,
+merge and summarizer). It records where a run spends its time and money and exports the
+numbers at the end of the run.
+
+Key functionalities include:
+1. Per-stage wall time (`with metrics.stage("collector.reviews"): ...`).
+2. Request counts by status and latency histograms per service and engine
+   (`with metrics.request("serpapi", "google_maps_reviews") as call: ...`).
+3. SerpApi credits (live searches only; cache hits are counted separately), review pages
+   per place, and Bedrock input/output tokens and time to first token per call.
+4. Export as a JSON run report and a Prometheus text-format file
+   (METRICS_DIR/<run>.json and METRICS_DIR/<run>.prom, e.g. for node_exporter's textfile collector).
+
+Recording is a lock plus a few dictionary updates per event, so it can stay on in production.
+Set PIPELINE_METRICS=0 to turn recording and export off.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+METRICS_ENABLED = os.getenv("PIPELINE_METRICS", "1") == "1"
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+HELP = {
+    "pipeline_stage_seconds_total": "Wall time spent in each pipeline stage",
+    "pipeline_stage_runs_total": "Times each pipeline stage ran",
+    "requests_total": "External API requests by service, engine and status",
+    "request_latency_seconds": "External API request latency",
+    "serpapi_credits_total": "SerpApi searches that used a credit",
+    "serpapi_cache_hits_total": "SerpApi requests answered from the local cache",
+    "serpapi_pages_per_place": "Review pages fetched per place",
+    "serpapi_pages_per_tile": "Search result pages fetched per map tile",
+    "bedrock_tokens_total": "Bedrock tokens by direction (input/output)",
+    "bedrock_errors_total": "Failed Bedrock calls by error code",
+    "merge_files_total": "Review files seen by the merge, by status",
+    "merge_rows_total": "Review rows written by the merge",
+    "bedrock_time_to_first_token_seconds": "Time until the first streamed Bedrock token",
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestTimer:
+    """Handed out by Metrics.request(); set `status` (default "ok") before the block ends."""
+
+    def __init__(self):
+        self.status = "ok"
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms, keyed by metric name and labels.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def stage(self, name):
+        """Add the wall time of the block to the stage's total."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.inc("pipeline_stage_seconds_total", time.perf_counter() - start, stage=name)
+            self.inc("pipeline_stage_runs_total", stage=name)
+
+    @contextmanager
+    def request(self, service, engine):
+        """Count one external request and record its latency. Exceptions count as status "error"."""
+        timer = RequestTimer()
+        start = time.perf_counter()
+        try:
+            yield timer
+        except BaseException:
+            timer.status = "error"
+            raise
+        finally:
+            self.observe("request_latency_seconds", time.perf_counter() - start, service=service, engine=engine)
+            self.inc("requests_total", service=service, engine=engine, status=timer.status)
+
+    def record_bedrock_tokens(self, input_tokens, output_tokens):
+        self.inc("bedrock_tokens_total", input_tokens or 0, direction="input")
+        self.inc("bedrock_tokens_total", output_tokens or 0, direction="output")
+
+    def report(self, run_name):
+        """The run report as a JSON-serializable dict."""
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": h.count,
+                    "sum": h.sum,
+                    "mean": h.sum / h.count if h.count else 0.0,
+                    "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts))
+                }
+                for (name, labels), h in sorted(self.histograms.items())
+            ]
+
+        stages = {
+            c["labels"]["stage"]: round(c["value"], 3)
+            for c in counters if c["name"] == "pipeline_stage_seconds_total"
+        }
+        return {
+            "run": run_name,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "duration_seconds": round(time.time() - self.started_at, 3),
+            "stages": stages,
+            "counters": counters,
+            "histograms": histograms
+        }
+
+    def prometheus_text(self, run_name):
+        """All metrics in the Prometheus text exposition format, labelled with the run name."""
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        def label_text(labels, **extra):
+            pairs = [("run", run_name)] + list(labels) + list(extra.items())
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                header(name, "counter")
+                lines.append(f"{name}{label_text(labels)} {_number(value)}")
+
+            for (name, labels), h in sorted(self.histograms.items()):
+                header(name, "histogram")
+                cumulative = 0
+                for bound, count in zip(list(h.buckets) + ["+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{label_text(labels, le=bound)} {cumulative}")
+                lines.append(f"{name}_sum{label_text(labels)} {_number(h.sum)}")
+                lines.append(f"{name}_count{label_text(labels)} {h.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, run_name, out_dir=None):
+        """
+        Write METRICS_DIR/<run>.json and METRICS_DIR/<run>.prom (atomically). Returns the JSON path,
+        or None when metrics are disabled.
+        """
+        if not self.enabled:
+            return None
+
+        out_dir = out_dir or METRICS_DIR
+        os.makedirs(out_dir, exist_ok=True)
+        json_path = os.path.join(out_dir, f"{run_name}.json")
+        prom_path = os.path.join(out_dir, f"{run_name}.prom")
+
+        with open(json_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.report(run_name), f, indent=2)
+        os.replace(json_path + ".tmp", json_path)
+
+        with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text(run_name))
+        os.replace(prom_path + ".tmp", prom_path)
+
+        print(f"📈 Run metrics saved to: {json_path} and {prom_path}")
+        return json_path
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Process-wide registry used by every script
+metrics = Metrics()
@@ -0,0 +1,261 @@
+"""
+This module decides which places to re-crawl, and how deep, so a fixed SerpApi credit budget
+goes to the branches that actually have new reviews instead of being spread evenly.
+
+Key functionalities include:
+1. A refresh state file (REFRESH_STATE_FILE) with each place's last crawl time, its last
+   `reviews_count` from get_place_info, its review velocity and any review backlog left by a
+   crawl that ran out of credits.
+2. Review velocity (reviews per day) estimated from the `iso_date` of the saved reviews and
+   from the change in `reviews_count` between crawls.
+3. A planner that, given a credit budget, picks places by expected new reviews per credit and
+   gives each the number of review pages its expected new reviews need. New reviews at
+   tracked places come before backfilling never-crawled places; leftover credits refresh
+   places that have not been crawled for MAX_STALENESS_DAYS, oldest first.
+4. A thread-safe credit budget with per-place reservations. Every request must be granted a
+   credit first, so a run never spends more than its budget.
+
+A refresh costs one credit for get_place_info (the `reviews_count` probe) plus one per review
+page. Run it often (e.g. hourly): busy branches accumulate expected reviews quickly and are
+picked every few runs, while quiet branches wait until they are stale.
+"""
+
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+from review_records import to_epoch
+
+REFRESH_STATE_FILE = os.getenv("REFRESH_STATE_FILE", "refresh_state.json")
+
+# Reviews per google_maps_reviews page
+FIRST_PAGE_REVIEWS = 8
+NEXT_PAGE_REVIEWS = 20
+
+PROBE_CREDITS = 1  # get_place_info before the review pages
+MAX_PAGES_PER_PLACE = 25  # Deepest refresh of one place in one run
+MIN_EXPECTED_NEW = 0.5  # Expected new reviews needed before a place is refreshed for its velocity
+VELOCITY_WINDOW_DAYS = 90  # Recent reviews used to estimate the velocity
+MAX_STALENESS_DAYS = 30  # Quiet places are refreshed at least this often when credits are left
+
+
+def pages_for(review_count):
+    """Review pages needed to fetch `review_count` reviews (at least one)."""
+    if review_count <= FIRST_PAGE_REVIEWS:
+        return 1
+    return 1 + math.ceil((review_count - FIRST_PAGE_REVIEWS) / NEXT_PAGE_REVIEWS)
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def date_velocity(reviews, now, window_days=VELOCITY_WINDOW_DAYS):
+    """
+    Reviews per day over the last `window_days`, from the reviews' `iso_date`.
+    Places with a shorter history are measured over their own age.
+    """
+    times = [t for t in (to_epoch(r.get("iso_date")) for r in reviews) if t]
+    if not times:
+        return 0.0
+
+    window_start = now - window_days * 86400
+    recent = sum(1 for t in times if t >= window_start)
+    days = (now - max(window_start, min(times))) / 86400
+    return recent / max(days, 1.0)
+
+
+def find_saved_file(place_id):
+    """The saved review JSON of a place (`<title>_<place_id>.json` here or in reviews/), or None."""
+    for pattern in (f"*_{place_id}.json", os.path.join("reviews", f"*_{place_id}.json")):
+        # browser_<place_id>.json holds browser-scraped reviews (browser_reviews_ingest.py), not a crawl
+        matches = [path for path in glob.glob(pattern) if not os.path.basename(path).startswith("browser_")]
+        matches = sorted(matches, key=os.path.getmtime, reverse=True)
+        if matches:
+            return matches[0]
+    return None
+
+
+class RefreshState:
+    """
+    Per-place crawl history, saved as JSON: {place_id: {"last_crawled_at", "reviews_count",
+    "velocity", "backlog", "file"}}.
+    """
+
+    def __init__(self, path=REFRESH_STATE_FILE):
+        self.path = path
+        self.places = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.places = json.load(f)
+
+    def save(self):
+        with self.lock:
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.places, f, ensure_ascii=False, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+
+    def get(self, place_id):
+        return self.places.get(place_id)
+
+    def seed_from_files(self, place_ids):
+        """
+        Start tracking places crawled before the scheduler existed, using their saved review
+        file (its modification time is taken as the last crawl). Returns the number seeded.
+        """
+        seeded = 0
+        for place_id in place_ids:
+            if place_id in self.places:
+                continue
+            path = find_saved_file(place_id)
+            if not path:
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            reviews = data.get("reviews", [])
+            if not reviews and not data.get("place_info"):
+                continue  # Empty placeholder file of a failed crawl
+            crawled_at = os.path.getmtime(path)
+            self.places[place_id] = {
+                "last_crawled_at": crawled_at,
+                "reviews_count": _as_int(data.get("place_info", {}).get("reviews_count")),
+                "velocity": date_velocity(reviews, crawled_at),
+                "backlog": 0,
+                "file": path
+            }
+            seeded += 1
+        return seeded
+
+    def record_crawl(self, place_id, reviews_count, reviews, backlog=0, path=None, now=None):
+        """
+        Update a place after a refresh. The velocity averages the review-date estimate with the
+        `reviews_count` change since the previous crawl, when both counts are known.
+        """
+        now = now or time.time()
+        reviews_count = _as_int(reviews_count)
+        with self.lock:
+            previous = self.places.get(place_id, {})
+            velocity = date_velocity(reviews, now)
+
+            elapsed_days = (now - previous["last_crawled_at"]) / 86400 if previous.get("last_crawled_at") else 0
+            if reviews_count is not None and previous.get("reviews_count") is not None and elapsed_days > 0:
+                delta = max(reviews_count - previous["reviews_count"], 0)
+                velocity = (velocity + delta / max(elapsed_days, 1 / 24)) / 2
+
+            self.places[place_id] = {
+                "last_crawled_at": now,
+                "reviews_count": reviews_count,
+                "velocity": velocity,
+                "backlog": backlog,
+                "file": path or previous.get("file")
+            }
+
+
+def expected_new_reviews(branch, entry, now):
+    """Reviews a place is expected to have gained since its last crawl."""
+    if not entry:
+        # Never crawled: everything is new
+        return float(_as_int(branch.get("reviews")) or _as_int(branch.get("reviews_count")) or 1)
+    hours = max(now - entry["last_crawled_at"], 0) / 3600
+    return entry.get("velocity", 0.0) * hours / 24 + entry.get("backlog", 0)
+
+
+def plan_refresh(branches, state, credit_budget, now=None):
+    """
+    Choose the places to refresh this run and the review pages for each, within `credit_budget`.
+    Returns a list of dicts (place_id, title, pages, credits, expected_new, reason) whose
+    credits add up to at most the budget.
+    """
+    now = now or time.time()
+    candidates = []
+    for branch in branches:
+        entry = state.get(branch["place_id"])
+        expected = expected_new_reviews(branch, entry, now)
+        pages = min(pages_for(math.ceil(expected)), MAX_PAGES_PER_PLACE)
+        candidates.append({
+            "place_id": branch["place_id"],
+            "title": branch.get("title", ""),
+            "pages": pages,
+            "credits": PROBE_CREDITS + pages,
+            "expected_new": round(expected, 2),
+            "reason": "new" if not entry else "velocity",
+            "staleness_days": (now - entry["last_crawled_at"]) / 86400 if entry else None
+        })
+
+    plan = []
+    remaining = credit_budget
+
+    # Fresh reviews at tracked places before backfilling never-crawled ones,
+    # each group by most expected new reviews per credit
+    active = [c for c in candidates if c["expected_new"] >= MIN_EXPECTED_NEW]
+    for candidate in sorted(active, key=lambda c: (c["reason"] != "velocity", -c["expected_new"] / c["credits"])):
+        if candidate["credits"] > remaining:
+            # Refresh it partially rather than not at all
+            if remaining < PROBE_CREDITS + 1:
+                continue
+            candidate["pages"] = remaining - PROBE_CREDITS
+            candidate["credits"] = remaining
+        plan.append(candidate)
+        remaining -= candidate["credits"]
+
+    # Then places nobody has looked at for a while, oldest first, one page each
+    planned = {c["place_id"] for c in plan}
+    stale = [
+        c for c in candidates
+        if c["place_id"] not in planned and c["staleness_days"] is not None and c["staleness_days"] >= MAX_STALENESS_DAYS
+    ]
+    for candidate in sorted(stale, key=lambda c: c["staleness_days"], reverse=True):
+        if remaining < PROBE_CREDITS + 1:
+            break
+        candidate.update(pages=1, credits=PROBE_CREDITS + 1, reason="stale")
+        plan.append(candidate)
+        remaining -= candidate["credits"]
+
+    for candidate in plan:
+        del candidate["staleness_days"]
+    return plan
+
+
+class CreditBudget:
+    """
+    Thread-safe SerpApi credit budget. Each planned place reserves its credits; `spend(place_id)`
+    grants a credit from the place's reservation first and then from unreserved credits, and
+    returns False when neither is left. `release(place_id)` frees what a place did not use.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.spent = 0
+        self.reserved = {}
+        self.lock = threading.Lock()
+
+    def reserve(self, place_id, credits):
+        with self.lock:
+            if self.spent + sum(self.reserved.values()) + credits > self.limit:
+                raise ValueError(f"Reserving {credits} credits for {place_id} would exceed the budget of {self.limit}.")
+            self.reserved[place_id] = self.reserved.get(place_id, 0) + credits
+
+    def spend(self, place_id):
+        with self.lock:
+            if self.reserved.get(place_id, 0) > 0:
+                self.reserved[place_id] -= 1
+            elif self.spent + sum(self.reserved.values()) >= self.limit:
+                return False
+            self.spent += 1
+            return True
+
+    def release(self, place_id):
+        with self.lock:
+            self.reserved.pop(place_id, None)
+
+    @property
+    def remaining(self):
+        with self.lock:
+            return self.limit - self.spent
@@ -0,0 +1,234 @@
+"""
+This module keeps a local SQLite index of all collected reviews so they can be searched
+without loading every JSON file or the combined CSV into pandas.
+
+Key functionalities include:
+1. One row per review with `review_id` as the primary key, so re-fetched or duplicate
+   pages are absorbed instead of stored twice.
+2. Indexes on place_id and iso_date for branch and date-range lookups.
+3. An FTS5 full-text table over the review text and the owner's response.
+4. A small query API (`search_reviews`) and a command line interface:
+
+   python review_index.py index Samples/Motilal/reviews
+   python review_index.py search brokerage --place ChIJr8upcH2HXjkR_7zjK9J0KlM --from 2024-01-01
+   python review_index.py search "app OR login" --raw --limit 20
+
+The collector and the Samples/Motilal/app.py merge feed the index when REVIEW_INDEX_DB is set.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+
+INDEX_DB = os.getenv("REVIEW_INDEX_DB", "reviews_index.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id TEXT PRIMARY KEY,
+    place_id TEXT NOT NULL,
+    branch_name TEXT,
+    rating INTEGER,
+    iso_date TEXT,
+    author_name TEXT,
+    snippet TEXT,
+    owner_response TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_reviews_place_date ON reviews(place_id, iso_date);
+CREATE INDEX IF NOT EXISTS idx_reviews_date ON reviews(iso_date);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+    snippet, owner_response, content='reviews', content_rowid='rowid'
+);
+
+CREATE TRIGGER IF NOT EXISTS reviews_ai AFTER INSERT ON reviews BEGIN
+    INSERT INTO reviews_fts(rowid, snippet, owner_response)
+    VALUES (new.rowid, new.snippet, new.owner_response);
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_ad AFTER DELETE ON reviews BEGIN
+    INSERT INTO reviews_fts(reviews_fts, rowid, snippet, owner_response)
+    VALUES ('delete', old.rowid, old.snippet, old.owner_response);
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_au AFTER UPDATE ON reviews BEGIN
+    INSERT INTO reviews_fts(reviews_fts, rowid, snippet, owner_response)
+    VALUES ('delete', old.rowid, old.snippet, old.owner_response);
+    INSERT INTO reviews_fts(rowid, snippet, owner_response)
+    VALUES (new.rowid, new.snippet, new.owner_response);
+END;
+"""
+
+UPSERT = """
+INSERT INTO reviews (review_id, place_id, branch_name, rating, iso_date, author_name, snippet, owner_response)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(review_id) DO UPDATE SET
+    place_id = excluded.place_id,
+    branch_name = excluded.branch_name,
+    rating = excluded.rating,
+    iso_date = excluded.iso_date,
+    author_name = excluded.author_name,
+    snippet = excluded.snippet,
+    owner_response = excluded.owner_response
+WHERE snippet IS NOT excluded.snippet
+   OR owner_response IS NOT excluded.owner_response
+   OR rating IS NOT excluded.rating
+   OR iso_date IS NOT excluded.iso_date
+   OR branch_name IS NOT excluded.branch_name
+"""
+
+
+def connect(db_path=None):
+    """
+    Open the index (creating it if needed). WAL mode lets readers run while a writer indexes.
+    """
+    conn = sqlite3.connect(db_path or INDEX_DB, timeout=60)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def review_key(place_id, review):
+    """
+    Return the review_id, or a content hash for reviews that have none.
+    """
+    if review.get("review_id"):
+        return review["review_id"]
+    user = review.get("user") or {}
+    content = "\0".join([place_id, user.get("name", ""), review.get("snippet") or ""])
+    return "sha1:" + hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def index_reviews(conn, place_info, reviews):
+    """
+    Insert or update reviews of one place in a single transaction. Returns the number of reviews.
+    """
+    place_id = place_info.get("place_id", "")
+    rows = []
+    for review in reviews:
+        review_place_id = place_id or review.get("place_id", "")
+        rating = review.get("rating")
+        rows.append((
+            review_key(review_place_id, review),
+            review_place_id,
+            place_info.get("title", ""),
+            int(rating) if rating not in (None, "") else None,
+            review.get("iso_date"),
+            (review.get("user") or {}).get("name"),
+            review.get("snippet"),
+            (review.get("response") or {}).get("snippet")
+        ))
+
+    with conn:
+        conn.executemany(UPSERT, rows)
+    return len(rows)
+
+
+def index_file(conn, filepath):
+    """
+    Index a collector JSON file ({"place_info": ..., "reviews": [...]}) or a streamed JSONL file.
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        if filepath.endswith(".jsonl"):
+            reviews = []
+            for line in f:
+                try:
+                    reviews.append(json.loads(line))
+                except ValueError:
+                    continue
+            return index_reviews(conn, {}, reviews)
+
+        data = json.load(f)
+    return index_reviews(conn, data.get("place_info", {}), data.get("reviews", []))
+
+
+def fts_query(keyword):
+    """
+    Quote every term of a plain keyword search as an FTS5 string, so input like "app-login",
+    "50%" or a stray quote matches literally instead of being parsed as query syntax.
+    """
+    return " ".join('"' + term.replace('"', '""') + '"' for term in keyword.split())
+
+
+def search_reviews(conn, keyword=None, place_id=None, date_from=None, date_to=None, limit=50, raw=False):
+    """
+    Look up reviews by full-text keyword, branch and/or ISO date range. Keyword terms are
+    matched literally unless `raw` is set, in which case the keyword is FTS5 query syntax.
+    Keyword results are ranked by relevance, others by newest first.
+    """
+    conditions = []
+    params = []
+
+    if keyword:
+        query = (
+            "SELECT r.* FROM reviews_fts f JOIN reviews r ON r.rowid = f.rowid "
+            "WHERE reviews_fts MATCH ?"
+        )
+        params.append(keyword if raw else fts_query(keyword))
+    else:
+        query = "SELECT r.* FROM reviews r WHERE 1 = 1"
+
+    if place_id:
+        conditions.append("r.place_id = ?")
+        params.append(place_id)
+    if date_from:
+        conditions.append("r.iso_date >= ?")
+        params.append(date_from)
+    if date_to:
+        # Dates are ISO strings, so a bare date includes that whole day
+        conditions.append("r.iso_date <= ?")
+        params.append(date_to + "T23:59:59Z" if len(date_to) == 10 else date_to)
+
+    for condition in conditions:
+        query += f" AND {condition}"
+
+    query += " ORDER BY bm25(reviews_fts)" if keyword else " ORDER BY r.iso_date DESC"
+    query += " LIMIT ?"
+    params.append(limit)
+
+    return [dict(row) for row in conn.execute(query, params)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and search collected Google reviews.")
+    parser.add_argument("--db", default=INDEX_DB, help="SQLite database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="Index review JSON/JSONL files")
+    index_parser.add_argument("paths", nargs="+", help="Files or folders to index")
+
+    search_parser = subparsers.add_parser("search", help="Search indexed reviews")
+    search_parser.add_argument("keyword", nargs="?", help="Words to search for, e.g. brokerage or app-login")
+    search_parser.add_argument("--raw", action="store_true", help="Treat the keyword as FTS5 query syntax, e.g. \"app OR login\"")
+    search_parser.add_argument("--place", help="Only this place_id")
+    search_parser.add_argument("--from", dest="date_from", help="Earliest date (YYYY-MM-DD)")
+    search_parser.add_argument("--to", dest="date_to", help="Latest date (YYYY-MM-DD)")
+    search_parser.add_argument("--limit", type=int, default=50)
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+
+    if args.command == "index":
+        for path in args.paths:
+            files = [path]
+            if os.path.isdir(path):
+                files = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith((".json", ".jsonl"))]
+            for filepath in files:
+                count = index_file(conn, filepath)
+                print(f"Indexed {filepath} ({count} reviews)")
+        return
+
+    results = search_reviews(conn, args.keyword, args.place, args.date_from, args.date_to, args.limit, args.raw)
+    for review in results:
+        text = (review["snippet"] or "").replace("\n", " ")
+        print(f"[{(review['iso_date'] or '')[:10]}] {review['rating']}★ {review['author_name']} ({review['place_id']})")
+        print(f"    {text[:200]}")
+    print(f"\n{len(results)} reviews found.")
+
+
+if __name__ == "__main__":
+    main()
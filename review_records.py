@@ -0,0 +1,186 @@
+"""
+This module keeps reviews in memory (and on disk) as compact records instead of the full
+SerpApi payload, which repeats review and profile links, thumbnails, an `extracted_snippet`
+copy of the text and a relative date next to `iso_date` for every review.
+
+Key functionalities include:
+1. `ReviewRecord`, a `__slots__` class holding only the projected fields, with integer epoch
+   timestamps and a small-int rating.
+2. A configurable field projection (REVIEW_FIELDS), applied while each page is parsed.
+3. Conversion back to a SerpApi-shaped dict with only the kept keys (`review_id`, `rating`,
+   `iso_date`, `user`, `snippet`, `response`), so the merge, the review store, the review
+   index and the summarizer read compact files like full ones. `record.get(key)` works like
+   `dict.get` on that shape, reading each key straight from its slot.
+4. A full-payload mode for debugging (REVIEW_PAYLOAD=full) that keeps the raw dicts unchanged.
+5. `parse_iso_date`, the one ISO date parser of the pipeline (the review store and the
+   refresh scheduler use it too).
+6. Parsing Google's relative dates ("a week ago", "Edited 3 months ago") for files and CSVs
+   that only carry those, shared by the sampler, the report and the browser ingest.
+
+Example:
+    reviews = parse_reviews(result.get("reviews", []))
+    json.dump(review_dicts(reviews), f)
+"""
+
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+FIELDS = (
+    "review_id",
+    "rating",
+    "timestamp",
+    "author_name",
+    "contributor_id",
+    "snippet",
+    "owner_response",
+    "owner_response_timestamp",
+)
+
+# "compact" keeps ReviewRecords with the REVIEW_FIELDS projection, "full" keeps the raw SerpApi dicts
+REVIEW_PAYLOAD = os.getenv("REVIEW_PAYLOAD", "compact")
+REVIEW_FIELDS = tuple(f.strip() for f in os.getenv("REVIEW_FIELDS", ",".join(FIELDS)).split(",") if f.strip())
+
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+RELATIVE_DATE_PATTERN = re.compile(r"(\d+|an?)\s+(day|week|month|year)s?\s+ago", re.IGNORECASE)
+RELATIVE_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+
+def parse_iso_date(value):
+    """
+    Aware UTC datetime of an ISO date ("2024-05-01T10:20:30Z", also with fractional seconds
+    or an offset), or None if it is empty or not a date. Dates without an offset are UTC.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def to_epoch(iso_date):
+    parsed = parse_iso_date(iso_date)
+    return None if parsed is None else int(parsed.timestamp())
+
+
+def to_iso(epoch):
+    return time.strftime(ISO_FORMAT, time.gmtime(epoch))
+
+
+def parse_relative_dates(relative, reference):
+    """
+    Vectorized parsing of a pandas Series of relative dates, counted back from `reference`
+    (a UTC pandas Timestamp). Values that are not relative dates become NaT.
+    """
+    import pandas as pd
+    parts = relative.astype("string").str.extract(RELATIVE_DATE_PATTERN, expand=True)
+    n = pd.to_numeric(parts[0].str.lower().replace({"a": "1", "an": "1"}), errors="coerce")
+    days = n * parts[1].str.lower().map(RELATIVE_UNIT_DAYS)
+    return reference - pd.to_timedelta(days, unit="D")
+
+
+def _rating(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# How each field is read from a raw SerpApi review
+EXTRACTORS = {
+    "review_id": lambda r: r.get("review_id"),
+    "rating": lambda r: _rating(r.get("rating")),
+    "timestamp": lambda r: to_epoch(r.get("iso_date")),
+    "author_name": lambda r: (r.get("user") or {}).get("name"),
+    "contributor_id": lambda r: (r.get("user") or {}).get("contributor_id"),
+    "snippet": lambda r: r.get("snippet"),
+    "owner_response": lambda r: (r.get("response") or {}).get("snippet"),
+    "owner_response_timestamp": lambda r: to_epoch((r.get("response") or {}).get("iso_date")),
+}
+
+
+class ReviewRecord:
+    __slots__ = FIELDS
+
+    def __init__(self, **values):
+        for field in FIELDS:
+            setattr(self, field, values.get(field))
+
+    @classmethod
+    def from_serpapi(cls, review, fields=REVIEW_FIELDS):
+        """Project a raw SerpApi review (or a dict written by to_dict) onto `fields`."""
+        record = cls()
+        for field in fields:
+            setattr(record, field, EXTRACTORS[field](review))
+        return record
+
+    def to_dict(self):
+        """SerpApi-shaped dict with only the fields that are set."""
+        review = {}
+        for key, getter in GETTERS.items():
+            value = getter(self)
+            if value is not None:
+                review[key] = value
+        return review
+
+    def _user(self):
+        user = {}
+        if self.author_name is not None:
+            user["name"] = self.author_name
+        if self.contributor_id is not None:
+            user["contributor_id"] = self.contributor_id
+        return user or None
+
+    def _response(self):
+        response = {}
+        if self.owner_response is not None:
+            response["snippet"] = self.owner_response
+        if self.owner_response_timestamp is not None:
+            response["iso_date"] = to_iso(self.owner_response_timestamp)
+        return response or None
+
+    def get(self, key, default=None):
+        getter = GETTERS.get(key)
+        if getter is None:
+            return default
+        value = getter(self)
+        return default if value is None else value
+
+    def __repr__(self):
+        return f"ReviewRecord({self.review_id!r}, rating={self.rating}, timestamp={self.timestamp})"
+
+
+# How each key of the SerpApi-shaped dict is read from a ReviewRecord (None when not set),
+# in to_dict's key order
+GETTERS = {
+    "review_id": lambda r: r.review_id,
+    "rating": lambda r: r.rating,
+    "iso_date": lambda r: None if r.timestamp is None else to_iso(r.timestamp),
+    "user": ReviewRecord._user,
+    "snippet": lambda r: r.snippet,
+    "response": ReviewRecord._response,
+}
+
+
+def parse_reviews(raw_reviews, fields=None, payload=None):
+    """
+    Turn one page of SerpApi reviews into ReviewRecords (or keep the raw dicts in "full" mode).
+    """
+    if (payload or REVIEW_PAYLOAD) == "full":
+        return list(raw_reviews)
+    fields = fields or REVIEW_FIELDS
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown review fields {sorted(unknown)}; choose from {list(FIELDS)}.")
+    return [ReviewRecord.from_serpapi(review, fields) for review in raw_reviews]
+
+
+def review_dicts(reviews):
+    """JSON-ready dicts for a mix of ReviewRecords and raw dicts."""
+    return [review.to_dict() if isinstance(review, ReviewRecord) else review for review in reviews]
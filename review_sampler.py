@@ -0,0 +1,279 @@
+"""
+This module picks a representative subset of reviews that fits a fixed token budget, so a
+branch with 50k reviews can be summarized for the same Bedrock cost as one with 2k.
+
+Key functionalities include:
+1. Stratifying reviews by star rating and time period (year by default). Reviews without an
+   ISO date (e.g. the combined CSV's relative `review_date`, "3 months ago") are dated by
+   counting back from the time the CSV was written.
+2. Splitting the token budget across strata in proportion to their size, with a minimum
+   share so rare strata (e.g. 1-star reviews of an old year) are still represented.
+3. Diversifying within each stratum: reviews are clustered on TF-IDF vectors and the review
+   closest to each cluster centre is taken, largest clusters first, until the stratum's budget is used.
+   Emoji count as terms; if no review has any term left (only stop words), a seeded random
+   pick fills each stratum's budget instead.
+4. Per-stratum counts of all reviews, so the summary can still quote overall proportions.
+5. A quality check comparing category mention shares (see category_tagger.py) of the weighted
+   sample with those of all reviews:
+
+   python review_sampler.py motilal_oswal_reviews_combined.csv --budget 6000
+
+Requires scikit-learn (`pip install scikit-learn`).
+"""
+
+import argparse
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from category_tagger import CategoryTagger
+from review_records import parse_relative_dates
+
+TEXT_COLUMNS = ["review", "review_text", "snippet"]
+RATING_COLUMNS = ["rating", "review_rating"]
+DATE_COLUMNS = ["review_iso_date", "iso_date"]
+RELATIVE_DATE_COLUMNS = ["review_date", "date"]
+
+# Words of two or more characters, plus single symbols such as emoji
+TOKEN_PATTERN = r"(?u)\b\w\w+\b|[^\w\s]"
+
+SAMPLE_TOKEN_BUDGET = 6000  # Review tokens sent to the model in sample mode
+SAMPLE_PERIOD = "Y"  # Time period of a stratum ("Y" year, "Q" quarter, "M" month)
+MIN_STRATUM_SHARE = 0.02  # Smallest share of the budget given to a non-empty stratum
+SAMPLE_QUALITY_TOLERANCE = 0.10  # Largest allowed category share error of the sample
+RANDOM_STATE = 0
+
+
+def _first_present(columns, candidates):
+    return next((c for c in candidates if c in columns), None)
+
+
+def load_review_frame(path):
+    """
+    Load review text, rating and date as columns `text`, `rating`, `date` from a CSV
+    (summarizer "review" CSV or the combined CSV) or a Parquet review store folder.
+    Dates missing an ISO value are parsed from the relative date column, if any.
+    """
+    if os.path.isdir(path):
+        from review_store import read_reviews
+        df = read_reviews(path, columns=["snippet", "rating", "iso_date"]).to_pandas()
+        df = df.rename(columns={"snippet": "text", "iso_date": "date"})
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        text_column = _first_present(header, TEXT_COLUMNS)
+        if not text_column:
+            raise ValueError(f"CSV must contain one of the columns {TEXT_COLUMNS}.")
+        columns = {text_column: "text"}
+        rating_column = _first_present(header, RATING_COLUMNS)
+        date_column = _first_present(header, DATE_COLUMNS)
+        relative_column = _first_present(header, RELATIVE_DATE_COLUMNS)
+        if rating_column:
+            columns[rating_column] = "rating"
+        if date_column:
+            columns[date_column] = "date"
+        if relative_column:
+            columns[relative_column] = "relative_date"
+        df = pd.read_csv(path, usecols=list(columns), dtype={text_column: "string"}).rename(columns=columns)
+
+        dates = pd.to_datetime(df["date"], utc=True, errors="coerce") if "date" in df else pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns, UTC]")
+        relative = df.pop("relative_date") if "relative_date" in df else None
+        missing = dates.isna()
+        if relative is not None and missing.any():
+            # Relative dates count back from when the CSV was written
+            reference = pd.Timestamp(datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc))
+            dates = dates.where(~missing, parse_relative_dates(relative, reference))
+        df["date"] = dates
+
+    df = df.dropna(subset=["text"]).reset_index(drop=True)
+    df["text"] = df["text"].astype(str)
+    return df
+
+
+def add_strata(df, period=SAMPLE_PERIOD):
+    """Add `stratum_rating` and `stratum_period` columns ("unknown" where missing)."""
+    rating = pd.to_numeric(df["rating"], errors="coerce") if "rating" in df else pd.Series(float("nan"), index=df.index)
+    df["stratum_rating"] = rating.round().astype("Int64").astype("string").fillna("unknown")
+
+    dates = pd.to_datetime(df["date"], utc=True, errors="coerce") if "date" in df else pd.Series(pd.NaT, index=df.index)
+    df["stratum_period"] = dates.dt.tz_localize(None).dt.to_period(period).astype("string").fillna("unknown")
+    return df
+
+
+def allocate_budget(stratum_sizes, token_budget):
+    """
+    Split the token budget across strata proportionally to their size, with every stratum
+    getting at least MIN_STRATUM_SHARE of it.
+    """
+    shares = (stratum_sizes / stratum_sizes.sum()).clip(lower=MIN_STRATUM_SHARE)
+    return (shares / shares.sum() * token_budget).astype(int)
+
+
+def _random_pick(tokens, budget):
+    """Row positions of a seeded random order of one stratum's reviews, within `budget` tokens."""
+    picked = []
+    used = 0
+    for position in pd.Series(tokens).sample(frac=1, random_state=RANDOM_STATE).index:
+        if used + tokens[position] <= budget:
+            picked.append(position)
+            used += tokens[position]
+    return picked
+
+
+def _diverse_pick(vectors, tokens, budget):
+    """
+    Cluster one stratum's TF-IDF vectors and return row positions of the reviews closest to
+    the cluster centres, largest clusters first, within `budget` tokens.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    typical_tokens = max(int(pd.Series(tokens).median()), 1)
+    n_clusters = min(len(tokens), max(1, budget // typical_tokens))
+    if n_clusters == 1:
+        order = pd.Series(tokens).sort_values().index
+        return [i for i in order[:1] if tokens[i] <= budget]
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=RANDOM_STATE, n_init=3).fit(vectors)
+    distances = kmeans.transform(vectors).min(axis=1)
+    members = pd.DataFrame({"cluster": kmeans.labels_, "distance": distances, "tokens": tokens})
+
+    central = members.sort_values("distance").groupby("cluster").head(1)
+    sizes = members["cluster"].value_counts()
+    central = central.assign(size=central["cluster"].map(sizes)).sort_values("size", ascending=False)
+
+    picked = []
+    used = 0
+    for position, row in central.iterrows():
+        if used + row["tokens"] <= budget:
+            picked.append(position)
+            used += row["tokens"]
+    return picked
+
+
+class ReviewSample:
+    """
+    A budgeted sample: `reviews` (sampled rows with a `weight` column) and `strata`
+    (reviews and sampled reviews per rating/period).
+    """
+
+    def __init__(self, population, reviews, strata):
+        self.population = population
+        self.reviews = reviews
+        self.strata = strata
+
+    def statistics_text(self):
+        """Counts of all reviews, for the prompt, so proportions refer to the whole population."""
+        total = len(self.population)
+        lines = [f"Total reviews: {total}"]
+
+        ratings = self.population["stratum_rating"].value_counts().sort_index(ascending=False)
+        lines.append("Reviews by rating: " + ", ".join(
+            f"{rating}★ {count} ({count / total:.1%})" for rating, count in ratings.items()
+        ))
+
+        lines.append("Reviews by rating and period (all reviews / sampled):")
+        for row in self.strata.itertuples():
+            lines.append(f"- {row.stratum_rating}★, {row.stratum_period}: {row.reviews} / {row.sampled}")
+        return "\n".join(lines)
+
+    def review_lines(self):
+        """Sampled reviews grouped under one "rating, period" heading per stratum."""
+        lines = []
+        for (rating, period), reviews in self.reviews.groupby(["stratum_rating", "stratum_period"], sort=False):
+            lines.append(f"### {rating}★, {period}")
+            lines.extend(reviews["text"])
+        return lines
+
+
+def sample_reviews(df, token_budget, count_tokens):
+    """
+    Pick a stratified, diversified subset of `df` (see load_review_frame) within `token_budget`
+    review tokens. `count_tokens` maps a list of texts to a list of token counts.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    df = add_strata(df.copy())
+    df["tokens"] = count_tokens(df["text"].tolist())
+
+    strata = df.groupby(["stratum_rating", "stratum_period"]).size().rename("reviews")
+    budgets = allocate_budget(strata, token_budget)
+
+    # One vocabulary for all strata
+    try:
+        vectors = TfidfVectorizer(stop_words="english", sublinear_tf=True, token_pattern=TOKEN_PATTERN).fit_transform(df["text"])
+    except ValueError:
+        # Empty vocabulary: every review is only stop words
+        vectors = None
+
+    picked = []
+    for key, rows in df.groupby(["stratum_rating", "stratum_period"]).groups.items():
+        rows = list(rows)
+        tokens = df.loc[rows, "tokens"].tolist()
+        if sum(tokens) <= budgets[key]:
+            picked.extend(rows)
+        elif vectors is None:
+            picked.extend(rows[i] for i in _random_pick(tokens, budgets[key]))
+        else:
+            picked.extend(rows[i] for i in _diverse_pick(vectors[rows], tokens, budgets[key]))
+
+    sampled = df.loc[sorted(picked)].copy()
+    strata = strata.to_frame()
+    strata["sampled"] = sampled.groupby(["stratum_rating", "stratum_period"]).size().reindex(strata.index, fill_value=0)
+    # Each sampled review stands for this many reviews of its stratum
+    sampled["weight"] = [
+        strata.loc[key, "reviews"] / strata.loc[key, "sampled"]
+        for key in zip(sampled["stratum_rating"], sampled["stratum_period"])
+    ]
+
+    strata = strata.reset_index().sort_values(["stratum_rating", "stratum_period"], ascending=[False, True])
+    return ReviewSample(df, sampled, strata)
+
+
+def check_sample_quality(sample, tagger=None, tolerance=SAMPLE_QUALITY_TOLERANCE):
+    """
+    Compare the share of reviews mentioning each category (weighted sample vs all reviews).
+    Returns per-category shares, the largest error and whether it is within `tolerance`.
+    """
+    tagger = tagger or CategoryTagger()
+    population = tagger.add_category_columns(sample.population[["text"]].copy(), "text")
+    reviews = tagger.add_category_columns(sample.reviews[["text", "weight"]].copy(), "text")
+
+    population_shares = population[tagger.categories].mean()
+    weights = reviews["weight"] / reviews["weight"].sum()
+    sample_shares = reviews[tagger.categories].mul(weights, axis=0).sum()
+
+    errors = (sample_shares - population_shares).abs()
+    return {
+        "population_shares": population_shares.to_dict(),
+        "sample_shares": sample_shares.to_dict(),
+        "max_error": float(errors.max()),
+        "within_tolerance": bool(errors.max() <= tolerance)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick a token-budgeted representative review sample.")
+    parser.add_argument("path", help="Reviews CSV or Parquet review store folder")
+    parser.add_argument("--budget", type=int, default=SAMPLE_TOKEN_BUDGET, help="Review tokens in the sample")
+    args = parser.parse_args()
+
+    import tiktoken
+    tokenizer = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(texts):
+        return [len(tokens) for tokens in tokenizer.encode_ordinary_batch(texts)]
+
+    sample = sample_reviews(load_review_frame(args.path), args.budget, count_tokens)
+    print(sample.statistics_text())
+    print(f"\nSampled {len(sample.reviews)} of {len(sample.population)} reviews "
+          f"({int(sample.reviews['tokens'].sum())} of {int(sample.population['tokens'].sum())} tokens)")
+
+    quality = check_sample_quality(sample)
+    for category, share in quality["population_shares"].items():
+        print(f"   {category}: {share:.1%} of all reviews, {quality['sample_shares'][category]:.1%} in weighted sample")
+    status = "✅ within" if quality["within_tolerance"] else "⚠️ outside"
+    print(f"{status} tolerance: largest category share error {quality['max_error']:.1%} (limit {SAMPLE_QUALITY_TOLERANCE:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+This module stores collected reviews in a columnar Parquet dataset instead of one
+pretty-printed JSON file per place.
+
+Key functionalities include:
+1. Typed columns (rating, review date, author contributor ID, review text, owner response)
+   without the repeated links, thumbnails and duplicate extracted snippets of the raw payload.
+2. Hive-style partitioning by place and review month:
+   <store>/place_id=<id>/month=<YYYY-MM>/part-<uuid>.parquet
+3. Atomic file writes: every file is written to a staging folder first and moved into its
+   partition with a single rename, so readers never see half-written files. Replacing a whole
+   place takes two renames (see `replace_place`), so a reader running at that moment can see
+   the place without reviews.
+4. Readers that load only the columns and partitions they ask for.
+
+Requires pyarrow (`pip install pyarrow`).
+"""
+
+import os
+import shutil
+import uuid
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from review_records import parse_iso_date
+
+STAGING_DIR = "_staging"  # Ignored by readers because of the leading underscore
+OLD_PLACE_PREFIX = "old_place_id="  # Previous partitions of a place while replace_place swaps them
+READ_RETRIES = 3  # Reads retried when a file is moved away by a concurrent replace_place
+
+SCHEMA = pa.schema([
+    ("review_id", pa.string()),
+    ("rating", pa.int8()),
+    ("iso_date", pa.timestamp("s", tz="UTC")),
+    ("author_name", pa.string()),
+    ("contributor_id", pa.string()),
+    ("snippet", pa.string()),
+    ("owner_response", pa.string()),
+    ("owner_response_iso_date", pa.timestamp("s", tz="UTC")),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([("place_id", pa.string()), ("month", pa.string())]), flavor="hive")
+
+
+def review_to_row(review):
+    """
+    Project a raw SerpApi review onto the store's typed columns.
+    """
+    user = review.get("user") or {}
+    response = review.get("response") or {}
+    rating = review.get("rating")
+
+    return {
+        "review_id": review.get("review_id"),
+        "rating": int(rating) if rating not in (None, "") else None,
+        "iso_date": parse_iso_date(review.get("iso_date")),
+        "author_name": user.get("name"),
+        "contributor_id": user.get("contributor_id"),
+        "snippet": review.get("snippet"),
+        "owner_response": response.get("snippet"),
+        "owner_response_iso_date": parse_iso_date(response.get("iso_date")),
+    }
+
+
+def _group_by_month(reviews):
+    months = {}
+    for review in reviews:
+        row = review_to_row(review)
+        month = row["iso_date"].strftime("%Y-%m") if row["iso_date"] else "unknown"
+        months.setdefault(month, []).append(row)
+    return months
+
+
+def _write_partitions(place_dir, reviews, staging_root):
+    """
+    Write one Parquet file per month under `place_dir`, going through `staging_root`.
+    """
+    for month, rows in _group_by_month(reviews).items():
+        partition_dir = os.path.join(place_dir, f"month={month}")
+        os.makedirs(partition_dir, exist_ok=True)
+
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        staging_path = os.path.join(staging_root, name)
+        pq.write_table(pa.Table.from_pylist(rows, schema=SCHEMA), staging_path, compression="zstd")
+        os.replace(staging_path, os.path.join(partition_dir, name))
+
+
+def append_reviews(store_dir, place_id, reviews):
+    """
+    Append new reviews of a place. Each month's rows become a new file in that month's partition.
+    """
+    if not reviews:
+        return
+
+    _recover_swap(store_dir, place_id)
+    staging_root = os.path.join(store_dir, STAGING_DIR)
+    os.makedirs(staging_root, exist_ok=True)
+    _write_partitions(os.path.join(store_dir, f"place_id={place_id}"), reviews, staging_root)
+
+
+def _recover_swap(store_dir, place_id):
+    """
+    Finish swaps of `place_id` interrupted between the two renames of replace_place. Once the
+    old partitions were moved aside the new ones were complete, so a missing place gets them back.
+    """
+    staging = os.path.join(store_dir, STAGING_DIR)
+    place_dir = os.path.join(store_dir, f"place_id={place_id}")
+    if not os.path.isdir(staging):
+        return
+
+    for name in os.listdir(staging):
+        staging_root = os.path.join(staging, name)
+        if not os.path.isdir(os.path.join(staging_root, f"{OLD_PLACE_PREFIX}{place_id}")):
+            continue
+        new_place_dir = os.path.join(staging_root, f"place_id={place_id}")
+        if os.path.isdir(new_place_dir) and not os.path.exists(place_dir):
+            os.replace(new_place_dir, place_dir)
+        if not os.path.exists(new_place_dir):
+            shutil.rmtree(staging_root, ignore_errors=True)
+
+
+def replace_place(store_dir, place_id, reviews):
+    """
+    Replace all stored reviews of a place with a full snapshot.
+
+    The new partitions are built in the staging folder, then the old place folder is moved
+    aside and the new one moved in. These are two renames, not one atomic swap: between them
+    the place has no folder, so a concurrent reader sees it without reviews (read it again
+    after the merge), and a crash there leaves the new partitions in the staging folder.
+    The next replace_place or append_reviews of the place moves them back in first.
+    """
+    _recover_swap(store_dir, place_id)
+
+    staging_root = os.path.join(store_dir, STAGING_DIR, uuid.uuid4().hex)
+    new_place_dir = os.path.join(staging_root, f"place_id={place_id}")
+    os.makedirs(new_place_dir)
+    _write_partitions(new_place_dir, reviews, staging_root)
+
+    place_dir = os.path.join(store_dir, f"place_id={place_id}")
+    old_place_dir = os.path.join(staging_root, f"{OLD_PLACE_PREFIX}{place_id}")
+    if os.path.exists(place_dir):
+        os.replace(place_dir, old_place_dir)
+    os.replace(new_place_dir, place_dir)
+    shutil.rmtree(staging_root, ignore_errors=True)
+
+
+def _dataset(store_dir):
+    return ds.dataset(store_dir, format="parquet", partitioning=PARTITIONING)
+
+
+def _filter(place_ids=None, months=None):
+    expression = None
+    if place_ids:
+        expression = ds.field("place_id").isin(list(place_ids))
+    if months:
+        month_filter = ds.field("month").isin(list(months))
+        expression = month_filter if expression is None else expression & month_filter
+    return expression
+
+
+def read_reviews(store_dir, columns=None, place_ids=None, months=None):
+    """
+    Read reviews as a pyarrow Table, loading only the requested columns and partitions.
+    Use `.to_pandas()` on the result for a DataFrame. A read that finds a file moved away by a
+    concurrent replace_place is started again.
+    """
+    for attempt in range(READ_RETRIES):
+        try:
+            return _dataset(store_dir).to_table(columns=columns, filter=_filter(place_ids, months))
+        except FileNotFoundError:
+            if attempt == READ_RETRIES - 1:
+                raise
+
+
+def iter_review_batches(store_dir, columns=None, place_ids=None, months=None, batch_size=50000):
+    """
+    Yield pyarrow RecordBatches of reviews, so large stores can be scanned with bounded memory.
+    """
+    scanner = _dataset(store_dir).scanner(columns=columns, filter=_filter(place_ids, months), batch_size=batch_size)
+    yield from scanner.to_batches()
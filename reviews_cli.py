@@ -0,0 +1,183 @@
+"""
+This script is the single command-line entry point of the pipeline, installed as `google-reviews`
+(`pip install -e .`, see pyproject.toml). Starting it only imports argparse; every subcommand
+loads its numbered script, and through it serpapi, pandas, boto3 or the tokenizer, when it runs,
+so cron jobs and batch runs can call it many times cheaply.
+
+Key functionalities include:
+1. discover: find a brand's branches in a region (3. branches_scraper.py) and save them as JSON and CSV.
+2. collect: fetch or refresh the reviews of one or more place IDs, given as arguments or read from
+   a branches CSV/JSON written by `discover` (1. serpapi_place_reviews_collector.py).
+3. merge: combine a folder of review JSON files into one CSV (Samples/Motilal/app.py).
+4. summarize: summarize a review CSV with Bedrock (2. review_summarizer_bedrock.py), with the
+   summary mode, fake client and streaming set by options instead of environment variables.
+5. report: render the charts and the Markdown/PDF report (4. review_analytics_report.py).
+
+Example:
+    google-reviews discover "Honest restaurant Gujarat" --brand Honest --region Gujarat
+    google-reviews collect --from honest_branches_gujarat.csv
+    google-reviews merge reviews
+    google-reviews summarize motilal_oswal_reviews_combined.csv --mode batch
+    google-reviews report motilal_oswal_reviews_combined.csv --out report
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DISCOVER_SCRIPT = "3. branches_scraper.py"
+COLLECT_SCRIPT = "1. serpapi_place_reviews_collector.py"
+MERGE_SCRIPT = os.path.join("Samples", "Motilal", "app.py")
+SUMMARIZE_SCRIPT = "2. review_summarizer_bedrock.py"
+REPORT_SCRIPT = "4. review_analytics_report.py"
+
+SUMMARY_MODES = ["full", "sections", "sample", "batch"]
+
+
+def script_path(filename):
+    path = os.path.join(ROOT, filename)
+    if not os.path.exists(path):
+        raise SystemExit(f"❌ {filename} not found in {ROOT}. Install the CLI from a checkout with `pip install -e .`")
+    return path
+
+
+def load_script(filename, module_name):
+    """Import one of the numbered scripts (their file names are not valid module names)."""
+    # Shared modules (serpapi_cache.py, pipeline_metrics.py, ...) live next to the scripts
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    spec = importlib.util.spec_from_file_location(module_name, script_path(filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_place_ids(path):
+    """The place_id values of a branches file (.json list or .csv with a place_id column)."""
+    if path.endswith(".json"):
+        import json
+        with open(path, "r", encoding="utf-8") as f:
+            return [branch["place_id"] for branch in json.load(f) if branch.get("place_id")]
+
+    import csv
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return [row["place_id"] for row in csv.DictReader(f) if row.get("place_id")]
+
+
+def run_discover(args):
+    scraper = load_script(DISCOVER_SCRIPT, "branches_scraper")
+    if args.brand:
+        scraper.BRAND_KEYWORD = args.brand
+    if args.region:
+        scraper.REGION_KEYWORD = args.region
+
+    branches = scraper.main(
+        args.query or scraper.QUERY,
+        tuple(args.bounds) if args.bounds else scraper.REGION_BOUNDS,
+        args.rows or scraper.TILE_ROWS,
+        args.cols or scraper.TILE_COLS,
+        args.json or scraper.BRANCHES_JSON,
+        args.csv or scraper.BRANCHES_CSV
+    )
+    return 0 if branches else 1
+
+
+def run_collect(args):
+    place_ids = list(args.place_ids)
+    if args.from_file:
+        place_ids.extend(read_place_ids(args.from_file))
+    # Keep the order, drop repeats
+    place_ids = list(dict.fromkeys(place_ids))
+    if not place_ids:
+        print("❌ No place IDs given. Pass them as arguments or with --from <branches file>.")
+        return 2
+
+    collector = load_script(COLLECT_SCRIPT, "collector")
+    if args.format:
+        collector.OUTPUT_FORMAT = args.format
+    if args.full:
+        collector.INCREMENTAL_MODE = False
+    return 0 if collector.main(place_ids) else 1
+
+
+def run_merge(args):
+    # app.py converts files in worker processes, which need it importable by path: run it as a script
+    import subprocess
+    command = [sys.executable, script_path(MERGE_SCRIPT)]
+    if args.folder:
+        command.append(args.folder)
+    return subprocess.run(command).returncode
+
+
+def run_summarize(args):
+    summarizer = load_script(SUMMARIZE_SCRIPT, "summarizer")
+    if args.mode:
+        summarizer.SUMMARY_MODE = args.mode
+    if args.batch_job:
+        summarizer.SUMMARY_MODE = "batch"
+        summarizer.BATCH_JOB_FILE = args.batch_job
+    if args.fake:
+        summarizer.BEDROCK_FAKE = True
+    if args.no_stream:
+        summarizer.STREAM_OUTPUT = False
+    return 0 if summarizer.main(args.csv_path) else 1
+
+
+def run_report(args):
+    report = load_script(REPORT_SCRIPT, "review_analytics_report")
+    return 0 if report.main([args.csv_path, "--out", args.out]) else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="google-reviews", description="Collect, merge, summarize and report on Google Maps reviews.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    discover = subparsers.add_parser("discover", help="Find a brand's branches in a region")
+    discover.add_argument("query", nargs="?", help='Google Maps search, e.g. "Honest restaurant Gujarat"')
+    discover.add_argument("--brand", help="Keep only places whose title contains this")
+    discover.add_argument("--region", help="Keep only places whose address contains this")
+    discover.add_argument("--bounds", nargs=4, type=float, metavar=("SOUTH", "WEST", "NORTH", "EAST"),
+                          help="Bounding box of the region")
+    discover.add_argument("--rows", type=int, help="Tile rows over the bounding box")
+    discover.add_argument("--cols", type=int, help="Tile columns over the bounding box")
+    discover.add_argument("--json", help="Output JSON file")
+    discover.add_argument("--csv", help="Output CSV file")
+    discover.set_defaults(handler=run_discover)
+
+    collect = subparsers.add_parser("collect", help="Fetch or refresh the reviews of places")
+    collect.add_argument("place_ids", nargs="*", help="Google place IDs")
+    collect.add_argument("--from", dest="from_file", help="Branches CSV/JSON with a place_id column (from discover)")
+    collect.add_argument("--format", choices=["json", "jsonl"], help="Output format (default: json)")
+    collect.add_argument("--full", action="store_true", help="Fetch every review, not only the new ones")
+    collect.set_defaults(handler=run_collect)
+
+    merge = subparsers.add_parser("merge", help="Combine review JSON files into one CSV")
+    merge.add_argument("folder", nargs="?", help="Folder of review JSON files (default: $REVIEWS_FOLDER or reviews)")
+    merge.set_defaults(handler=run_merge)
+
+    summarize = subparsers.add_parser("summarize", help="Summarize a review CSV with Bedrock")
+    summarize.add_argument("csv_path", help="CSV with a review column, the combined CSV, or a Parquet review store folder")
+    summarize.add_argument("--mode", choices=SUMMARY_MODES, help="Summary mode (default: $SUMMARY_MODE or full)")
+    summarize.add_argument("--batch-job", help="Write a Bedrock batch-inference JSONL job instead of calling Bedrock")
+    summarize.add_argument("--fake", action="store_true", help="Use the local fake Bedrock client")
+    summarize.add_argument("--no-stream", action="store_true", help="Print the summary at the end instead of streaming it")
+    summarize.set_defaults(handler=run_summarize)
+
+    report = subparsers.add_parser("report", help="Render the review analysis charts and report")
+    report.add_argument("csv_path", nargs="?", default="motilal_oswal_reviews_combined.csv", help="Combined reviews CSV")
+    report.add_argument("--out", default="report", help="Output folder for charts and reports")
+    report.set_defaults(handler=run_report)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
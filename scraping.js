@@ -1,22 +1,38 @@
 // # --------------------------------------------------------------------------------
 // # AUTO SCRAPING ON BROWSER ONCE PASTED ON CONSOLE IT STARTS SCROLLING AND SCRAPE ALL THE REVIEWS
 // # --------------------------------------------------------------------------------
+//
+// MODE 'observer' (default) reacts to newly inserted review nodes with a MutationObserver,
+// scrolls as soon as new reviews arrive and downloads the CSV in parts of EXPORT_CHUNK_SIZE
+// reviews (google_maps_reviews_part001.csv, ...), so large places stay fast.
+// MODE 'poll' is the original scraper: rescan the page every 2.5 s and download one CSV at the end.
+// Load the CSV files with browser_reviews_ingest.py to add them to the combined dataset.
 
 (async () => {
+    const MODE = 'observer';
+    const EXPORT_CHUNK_SIZE = 1000;   // Reviews per downloaded CSV part (observer mode)
+    const STALL_TIMEOUT_MS = 4000;    // No new review for this long counts as one stall (observer mode)
+    const MAX_STALL_ATTEMPTS = 5;
+    const MAX_EMPTY_FRAMES = 30;      // Frames a review without text is re-read before it counts as rating-only (observer mode)
+    const MAX_EMPTY_POLLS = 2;        // Same, in 2.5 s rescans (poll mode)
+
+    const REVIEW_SELECTOR = '[data-review-id], .jftiEf';
+    const MORE_BUTTON_SELECTOR = 'button.w8nwRe, button[aria-label*="More"], button[aria-label*="mehr"], button[aria-label*="更多"]';
+
     // Wait for reviews to appear
-    while (!document.querySelector('[data-review-id], .jftiEf')) {
+    while (!document.querySelector(REVIEW_SELECTOR)) {
         console.log("Waiting for reviews to load...");
         await new Promise(r => setTimeout(r, 1000));
     }
 
     // Optional: Click "Sort" → "Newest"
     try {
-        let sortButton = document.querySelector('button[jsaction*="sort"]') || 
+        let sortButton = document.querySelector('button[jsaction*="sort"]') ||
                          [...document.querySelectorAll('button')].find(b => /sort|排序|クラス/i.test(b.innerText));
         if (sortButton && sortButton.offsetParent !== null) {
             sortButton.click();
             await new Promise(r => setTimeout(r, 1500));
-            let newestOption = [...document.querySelectorAll('li, div, span')].find(el => 
+            let newestOption = [...document.querySelectorAll('li, div, span')].find(el =>
                 /newest|最新|neueste|plus récent/i.test(el.innerText)
             );
             if (newestOption) {
@@ -38,58 +54,214 @@
         .map(sel => document.querySelector(sel))
         .find(el => el) || window;
 
-    const capturedReviews = new Map();
-    let stalledAttempts = 0;
-    const MAX_STALL_ATTEMPTS = 5;
+    const scrollToEnd = () => {
+        if (scrollContainer === window) {
+            window.scrollTo(0, document.body.scrollHeight);
+        } else {
+            scrollContainer.scrollTop = scrollContainer.scrollHeight;
+        }
+    };
+
+    const isVisible = btn => btn.offsetHeight > 0 && getComputedStyle(btn).visibility !== 'hidden';
 
     // Expand "More" buttons
-    const expandMoreButtons = () => {
-        document.querySelectorAll('button.w8nwRe, button[aria-label*="More"], button[aria-label*="mehr"], button[aria-label*="更多"]')
-            .forEach(btn => {
-                if (btn.offsetHeight > 0 && getComputedStyle(btn).visibility !== 'hidden') {
-                    btn.click();
-                }
-            });
+    const expandMoreButtons = (root = document) => {
+        root.querySelectorAll(MORE_BUTTON_SELECTOR).forEach(btn => {
+            if (isVisible(btn)) {
+                btn.click();
+            }
+        });
     };
 
-    // Start scrolling & capturing
-    console.log("🚀 Starting to load all reviews...");
+    const reviewId = review => review.getAttribute('data-review-id') ||
+                               review.getAttribute('data-id') ||
+                               review.id ||
+                               Array.from(review.classList).join(' ');
+
+    // Read one review node, or null if neither its text nor its rating is rendered (yet).
+    // Rating-only reviews have an empty text; the scrapers re-read those a few times first,
+    // since the text of a review can also still be rendering (e.g. right after "More").
+    const extractReview = review => {
+        const textEl = review.querySelector('.wiI7pd') ||
+                       review.querySelector('[data-expandable-section]') ||
+                       review.querySelector('.MyEned');
+        const text = textEl?.innerText?.trim() || '';
+        const rating = review.querySelector('[role="img"]')?.getAttribute('aria-label') || '';
+        if (!text && !rating) return null;
+
+        const author = review.querySelector('.d4r55')?.innerText || '';
+        const date = review.querySelector('.rsqaWe')?.innerText || '';
+        return { text, rating, author, date };
+    };
+
+    const csvField = value => `"${String(value).replace(/"/g, '""')}"`;
+
+    const downloadCsv = (reviews, filename) => {
+        const headers = ['Author', 'Rating', 'Date', 'Review'];
+        const rows = reviews.map(r => [r.author, r.rating, r.date, r.text].map(csvField).join(','));
+        const csvContent = [headers.join(','), ...rows].join('\n');
+        const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
+        const url = URL.createObjectURL(blob);
+
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = filename;
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
+        URL.revokeObjectURL(url);
+
+        console.log(`📁 ${filename} downloaded (${reviews.length} reviews)`);
+    };
+
+    // Event-driven: only newly inserted review nodes are read, and only IDs are kept in memory
+    const scrapeWithObserver = () => new Promise(resolve => {
+        const seen = new Set();
+        let queue = [];
+        let pending = [];
+        let part = 0;
+        let total = 0;
+        let stalledAttempts = 0;
+        let stallTimer = null;
+        let frameQueued = false;
+        const emptyFrames = new WeakMap();  // Node -> frames it was read without text
+
+        const flush = (force = false) => {
+            while (pending.length >= EXPORT_CHUNK_SIZE || (force && pending.length)) {
+                part++;
+                downloadCsv(pending.slice(0, EXPORT_CHUNK_SIZE), `google_maps_reviews_part${String(part).padStart(3, '0')}.csv`);
+                pending = pending.slice(EXPORT_CHUNK_SIZE);
+            }
+        };
+
+        const resetStallTimer = () => {
+            clearTimeout(stallTimer);
+            stallTimer = setTimeout(onStall, STALL_TIMEOUT_MS);
+        };
+
+        const finish = () => {
+            observer.disconnect();
+            clearTimeout(stallTimer);
+            flush(true);
+            resolve(total);
+        };
+
+        // Process queued nodes once per frame, after their "More" buttons were clicked
+        const processQueue = () => {
+            frameQueued = false;
+            const nodes = queue;
+            queue = [];
+
+            let foundNew = 0;
+            for (const node of nodes) {
+                const id = reviewId(node);
+                if (!id || seen.has(id)) continue;
+                const review = extractReview(node);
+                if (!review?.text) {
+                    // Not rendered yet: read it again next frame, then keep it as rating-only
+                    const frames = (emptyFrames.get(node) || 0) + 1;
+                    if (frames < MAX_EMPTY_FRAMES && node.isConnected) {
+                        emptyFrames.set(node, frames);
+                        queue.push(node);
+                        continue;
+                    }
+                    if (!review) continue;
+                }
+                seen.add(id);
+                pending.push(review);
+                foundNew++;
+            }
+
+            if (queue.length && !frameQueued) {
+                frameQueued = true;
+                requestAnimationFrame(processQueue);
+            }
+
+            if (foundNew) {
+                total += foundNew;
+                stalledAttempts = 0;
+                console.log(`✅ Captured ${total} unique reviews so far...`);
+                flush();
+                scrollToEnd();
+                resetStallTimer();
+            }
+        };
+
+        const enqueue = node => {
+            if (!seen.has(reviewId(node))) {
+                expandMoreButtons(node);
+                queue.push(node);
+            }
+            if (!frameQueued) {
+                frameQueued = true;
+                requestAnimationFrame(processQueue);
+            }
+        };
+
+        // Nothing new for STALL_TIMEOUT_MS: nudge the list so it loads the next page
+        const onStall = () => {
+            stalledAttempts++;
+            if (stalledAttempts >= MAX_STALL_ATTEMPTS) {
+                finish();
+                return;
+            }
+            if (scrollContainer === window) {
+                window.scrollBy(0, -200);
+            } else {
+                scrollContainer.scrollTop -= 200;
+            }
+            setTimeout(scrollToEnd, 100);
+            resetStallTimer();
+        };
+
+        const observer = new MutationObserver(mutations => {
+            for (const mutation of mutations) {
+                for (const node of mutation.addedNodes) {
+                    if (node.nodeType !== Node.ELEMENT_NODE) continue;
+                    if (node.matches(REVIEW_SELECTOR)) enqueue(node);
+                    node.querySelectorAll(REVIEW_SELECTOR).forEach(enqueue);
+                }
+            }
+        });
+        observer.observe(scrollContainer === window ? document.body : scrollContainer, { childList: true, subtree: true });
+
+        // Reviews already on the page
+        document.querySelectorAll(REVIEW_SELECTOR).forEach(enqueue);
+        scrollToEnd();
+        resetStallTimer();
+    });
+
+    // Original fixed-interval scraper
+    const scrapeWithPolling = () => new Promise((resolve) => {
+        const capturedReviews = new Map();
+        const emptyPolls = new Map();  // Review ID -> rescans it was read without text
+        let stalledAttempts = 0;
 
-    return new Promise((resolve) => {
         const intervalId = setInterval(() => {
             expandMoreButtons();
 
             let foundNew = false;
-            const reviews = document.querySelectorAll('[data-review-id], .jftiEf');
+            const reviews = document.querySelectorAll(REVIEW_SELECTOR);
 
             for (const review of reviews) {
-                const id = review.getAttribute('data-review-id') ||
-                          review.getAttribute('data-id') ||
-                          review.id ||
-                          Array.from(review.classList).join(' ');
-
+                const id = reviewId(review);
                 if (!id || capturedReviews.has(id)) continue;
 
-                const textEl = review.querySelector('.wiI7pd') ||
-                               review.querySelector('[data-expandable-section]') ||
-                               review.querySelector('.MyEned');
-                const text = textEl?.innerText?.trim();
-                if (!text) continue;
-
-                const rating = review.querySelector('[role="img"]')?.getAttribute('aria-label') || '';
-                const author = review.querySelector('.d4r55')?.innerText || '';
-                const date = review.querySelector('.rsqaWe')?.innerText || '';
+                const captured = extractReview(review);
+                if (!captured?.text) {
+                    // Not rendered yet: read it again next rescan, then keep it as rating-only
+                    const polls = (emptyPolls.get(id) || 0) + 1;
+                    emptyPolls.set(id, polls);
+                    if (!captured || polls < MAX_EMPTY_POLLS) continue;
+                }
 
-                capturedReviews.set(id, { text: text.replace(/"/g, '""'), rating, author, date });
+                emptyPolls.delete(id);
+                capturedReviews.set(id, captured);
                 foundNew = true;
             }
 
             // Scroll
-            if (scrollContainer === window) {
-                window.scrollTo(0, document.body.scrollHeight);
-            } else {
-                scrollContainer.scrollTop = scrollContainer.scrollHeight;
-            }
+            scrollToEnd();
 
             console.log(`✅ Captured ${capturedReviews.size} unique reviews so far...`);
 
@@ -97,31 +269,27 @@
                 stalledAttempts++;
                 if (stalledAttempts >= MAX_STALL_ATTEMPTS) {
                     clearInterval(intervalId);
-                    console.log(`🎉 Done! Total reviews captured: ${capturedReviews.size}`);
                     resolve(Array.from(capturedReviews.values()));
                 }
             } else {
                 stalledAttempts = 0;
             }
         }, 2500); // 2.5s delay — safe for most connections
-    }).then(reviews => {
-        // Export as CSV
-        const headers = ['Author', 'Rating', 'Date', 'Review'];
-        const rows = reviews.map(r => `"${r.author}","${r.rating}","${r.date}","${r.text}"`);
-        const csvContent = [headers.join(','), ...rows].join('\n');
-        const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-        const url = URL.createObjectURL(blob);
+    });
 
-        const a = document.createElement('a');
-        a.href = url;
-        a.download = 'google_maps_reviews.csv';
-        document.body.appendChild(a);
-        a.click();
-        document.body.removeChild(a);
-        URL.revokeObjectURL(url);
+    // Start scrolling & capturing
+    console.log("🚀 Starting to load all reviews...");
 
-        console.log("📁 CSV file downloaded!");
-    }).catch(err => {
+    try {
+        if (MODE === 'observer') {
+            const total = await scrapeWithObserver();
+            console.log(`🎉 Done! Total reviews captured: ${total}`);
+        } else {
+            const reviews = await scrapeWithPolling();
+            console.log(`🎉 Done! Total reviews captured: ${reviews.length}`);
+            downloadCsv(reviews, 'google_maps_reviews.csv');
+        }
+    } catch (err) {
         console.error("❌ Error:", err);
-    });
-})();
\ No newline at end of file
+    }
+})();
@@ -0,0 +1,222 @@
+"""
+This module adds a persistent on-disk cache in front of SerpApi requests so that re-running
+a pipeline does not pay for the same searches twice.
+
+Key functionalities include:
+1. Keying every response by the normalized request params (the api_key is never part of the key).
+2. Per-engine expiry times, so place details can be kept longer than review pages. The first
+   newest-first review page is never served from the cache, so new reviews are always seen.
+3. A size-bounded store that evicts the least recently used responses first. The cache size
+   is tracked as a running total, so the folder is only scanned when it goes over the cap.
+4. An offline mode (SERPAPI_OFFLINE=1) that serves responses only from the cache and
+   never spends credits.
+5. Request latency, credit and cache hit metrics for every search (see pipeline_metrics.py).
+6. Sending requests to the local replay stand-in in fake_serpapi.py instead of SerpApi when
+   SERPAPI_FAKE_DIR or SERPAPI_RECORDINGS_DIR is set.
+7. Importing the SerpApi client on the first live request only, so cache hits and offline
+   runs start fast.
+
+Use `cached_search(params)` anywhere `GoogleSearch(params).get_dict()` was used before.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from pipeline_metrics import metrics
+
+# SerpApi client class, imported on the first live request so cache hits and offline runs skip it
+GoogleSearch = None
+
+CACHE_DIR = os.getenv("SERPAPI_CACHE_DIR", ".serpapi_cache")
+CACHE_MAX_BYTES = int(os.getenv("SERPAPI_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+CACHE_EVICT_TO = 0.9  # Eviction frees space down to this share of the cap, so it runs only now and then
+OFFLINE_MODE = os.getenv("SERPAPI_OFFLINE", "0") == "1"
+
+# How long a cached response stays valid, in seconds, per SerpApi engine
+ENGINE_TTLS = {
+    "google_maps": 7 * 24 * 3600,          # Place details and branch searches change slowly
+    "google_maps_reviews": 12 * 3600,      # Review pages get new entries every day
+}
+DEFAULT_TTL = 24 * 3600
+
+
+def request_ttl(params):
+    """
+    Cache lifetime of one request. The first newest-first review page has the same params on
+    every run, and is exactly what incremental and refresh crawls check for new reviews, so it
+    is always fetched live (it is still stored for offline runs).
+    """
+    engine = params.get("engine")
+    if engine == "google_maps_reviews" and params.get("sort_by") == "newestFirst" and not params.get("next_page_token"):
+        return 0
+    return ENGINE_TTLS.get(engine, DEFAULT_TTL)
+
+
+# Running cache size per cache folder: scanned once per process, then updated on every store
+_cache_bytes = {}
+_cache_bytes_lock = threading.Lock()
+
+
+class CacheMiss(Exception):
+    """Raised in offline mode when a request is not in the cache."""
+
+
+def google_search_class():
+    """GoogleSearch from serpapi, or from fake_serpapi.py when SERPAPI_FAKE_DIR or SERPAPI_RECORDINGS_DIR is set."""
+    global GoogleSearch
+    if GoogleSearch is None:
+        if os.getenv("SERPAPI_FAKE_DIR") or os.getenv("SERPAPI_RECORDINGS_DIR"):
+            # Local replay stand-in (see fake_serpapi.py): no API key, no credits
+            from fake_serpapi import GoogleSearch as search_class
+        else:
+            from serpapi import GoogleSearch as search_class
+        GoogleSearch = search_class
+    return GoogleSearch
+
+
+def cache_key(params):
+    """
+    Build a stable key from the request params, ignoring the api_key and param order.
+    """
+    normalized = {str(k): str(v) for k, v in params.items() if k != "api_key"}
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.json")
+
+
+def get_cached(params, ttl=None):
+    """
+    Return the cached response for these params, or None if it is missing or expired.
+    """
+    path = _cache_path(cache_key(params))
+    if ttl is None:
+        ttl = request_ttl(params)
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - entry.get("cached_at", 0) > ttl:
+        return None
+
+    # Touch the file so eviction sees it as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    return entry.get("response")
+
+
+def store(params, response):
+    """
+    Save a response to the cache and evict old entries if the cache is over its size cap.
+    """
+    path = _cache_path(cache_key(params))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entry = {
+        "cached_at": time.time(),
+        "params": {k: v for k, v in params.items() if k != "api_key"},
+        "response": response
+    }
+
+    try:
+        old_size = os.path.getsize(path)
+    except OSError:
+        old_size = 0
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+        new_size = f.tell()
+    os.replace(tmp_path, path)
+
+    # The whole cache is only scanned when the running total says it is over the cap
+    with _cache_bytes_lock:
+        if CACHE_DIR in _cache_bytes:
+            _cache_bytes[CACHE_DIR] += new_size - old_size
+        else:
+            _cache_bytes[CACHE_DIR] = _scan_cache()[1]
+        over_cap = _cache_bytes[CACHE_DIR] > CACHE_MAX_BYTES
+    if over_cap:
+        evict(int(CACHE_MAX_BYTES * CACHE_EVICT_TO))
+
+
+def _scan_cache():
+    """Return ([(mtime, size, path), ...], total size) of every cached entry."""
+    entries = []
+    total = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    return entries, total
+
+
+def evict(max_bytes=None):
+    """
+    Delete least recently used entries until the cache fits in `max_bytes`.
+    """
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+
+    entries, total = _scan_cache()
+    if total > max_bytes:
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= max_bytes:
+                break
+
+    with _cache_bytes_lock:
+        _cache_bytes[CACHE_DIR] = total
+
+
+def cached_search(params, ttl=None, offline=None):
+    """
+    Return the SerpApi response for `params`, from the cache when possible.
+    Error responses are returned but never cached. In offline mode a missing entry
+    raises CacheMiss instead of calling SerpApi.
+    """
+    if offline is None:
+        offline = OFFLINE_MODE
+    engine = params.get("engine", "")
+
+    # Offline runs accept expired entries: a stale response beats no response
+    response = get_cached(params, float("inf") if offline else ttl)
+    if response is not None:
+        metrics.inc("serpapi_cache_hits_total", engine=engine)
+        return response
+
+    if offline:
+        raise CacheMiss(f"Offline mode: no cached response for {engine} request")
+
+    with metrics.request("serpapi", engine) as call:
+        response = google_search_class()(params).get_dict()
+        if "error" in response:
+            call.status = "error"
+
+    if "error" not in response:
+        # SerpApi only charges successful searches
+        metrics.inc("serpapi_credits_total", engine=engine)
+        store(params, response)
+
+    return response
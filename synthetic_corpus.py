@@ -0,0 +1,245 @@
+"""
+This module generates synthetic review corpora of any size (up to tens of millions of reviews)
+from the real sample reviews, for benchmarks and offline tests of the collector, merge and summarizer.
+
+Key functionalities include:
+1. Learning from a seed folder of collector JSON files (Samples/Motilal/reviews by default):
+   the sentences of each star rating, the rating distribution and the branch titles/addresses.
+2. Spreading reviews over places with a heavy-tailed distribution (most branches have a few
+   reviews, a few have thousands), like the real branch list.
+3. Reviews in the SerpApi shape (review_id, rating, iso_date, snippet, user, ...), with text
+   built from sentences of the same rating, so category mentions, near-duplicates and
+   rating/text correlation resemble the real data.
+4. Output as per-place review JSON files (fixtures for fake_serpapi.py and input for
+   Samples/Motilal/app.py), as the combined CSV of app.py, or as a summarizer "review" CSV.
+   Reviews are generated and written one place at a time, so memory stays flat at any size:
+
+   python synthetic_corpus.py corpus.csv --reviews 10000000 --places 5000
+   python synthetic_corpus.py corpus_reviews --format json --reviews 200000 --places 500
+
+The same seed and arguments always produce the same corpus.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import string
+from datetime import datetime, timezone
+
+import numpy as np
+
+SEED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Samples", "Motilal", "reviews")
+RANDOM_SEED = 7
+YEARS_OF_REVIEWS = 5  # Review dates are spread over this many years before today
+PLACE_SIZE_SIGMA = 1.5  # Log-normal spread of reviews per place (larger = more skewed)
+
+COMBINED_COLUMNS = [
+    "place_id", "branch_name", "branch_address", "branch_rating", "review_rating",
+    "review_date", "review_text", "review_author", "review_id", "review_iso_date"
+]
+
+FALLBACK_SENTENCES = {
+    1: ["Very bad service.", "Nobody picks up the phone.", "Brokerage charges are too high."],
+    2: ["Support is slow.", "The app keeps logging me out."],
+    3: ["Average experience.", "Service is okay but could be faster."],
+    4: ["Good service.", "Helpful staff at the branch."],
+    5: ["Excellent service!", "Very helpful team.", "Highly recommended for investments."],
+}
+FIRST_NAMES = ["Amit", "Priya", "Rahul", "Neha", "Vikas", "Pooja", "Kiran", "Ravi", "Sneha", "Arjun", "Meera", "Harsh"]
+LAST_NAMES = ["Patel", "Shah", "Mehta", "Desai", "Joshi", "Sharma", "Trivedi", "Parmar", "Modi", "Rana"]
+
+
+class SeedData:
+    """Sentences per star rating, the rating distribution and branch templates from real reviews."""
+
+    def __init__(self, seed_dir=SEED_DIR):
+        self.sentences = {rating: [] for rating in range(1, 6)}
+        self.rating_counts = np.zeros(5)
+        self.places = []
+
+        if seed_dir and os.path.isdir(seed_dir):
+            for name in sorted(os.listdir(seed_dir)):
+                if name.endswith(".json"):
+                    with open(os.path.join(seed_dir, name), "r", encoding="utf-8") as f:
+                        self._add_file(json.load(f))
+
+        for rating, fallback in FALLBACK_SENTENCES.items():
+            if not self.sentences[rating]:
+                self.sentences[rating] = list(fallback)
+        if not self.rating_counts.sum():
+            self.rating_counts[:] = [1, 1, 2, 4, 12]
+        if not self.places:
+            self.places = [{"title": "Motilal Oswal Financial Services Limited", "address": "Ahmedabad, Gujarat, India"}]
+
+        self.rating_weights = self.rating_counts / self.rating_counts.sum()
+        self.sentence_arrays = {rating: np.array(sentences, dtype=object) for rating, sentences in self.sentences.items()}
+
+    def _add_file(self, data):
+        place_info = data.get("place_info") or {}
+        if place_info.get("title"):
+            self.places.append({"title": place_info["title"], "address": place_info.get("address", "")})
+
+        for review in data.get("reviews", []):
+            rating = int(round(review.get("rating") or 0))
+            if not 1 <= rating <= 5:
+                continue
+            self.rating_counts[rating - 1] += 1
+            for sentence in re.split(r"(?<=[.!?])\s+|\n+", review.get("snippet") or ""):
+                sentence = sentence.strip()
+                if len(sentence) > 3:
+                    self.sentences[rating].append(sentence)
+
+
+class CorpusGenerator:
+    def __init__(self, seed_data=None, random_seed=RANDOM_SEED, now=None):
+        self.seed = seed_data or SeedData()
+        self.rng = np.random.default_rng(random_seed)
+        self.now = now or datetime.now(timezone.utc).replace(microsecond=0)
+
+    def _tokens(self, count, length, alphabet=string.ascii_letters + string.digits):
+        """`count` random strings of `length` characters, generated as one byte array."""
+        letters = np.frombuffer(alphabet.encode("ascii"), dtype=np.uint8)
+        codes = letters[self.rng.integers(0, len(letters), size=(count, length))]
+        return [token.decode("ascii") for token in codes.view(f"S{length}").ravel()]
+
+    def place_sizes(self, total_reviews, places):
+        """Reviews per place: log-normal weights, adding up to exactly `total_reviews`."""
+        weights = self.rng.lognormal(0, PLACE_SIZE_SIGMA, size=places)
+        return self.rng.multinomial(total_reviews, weights / weights.sum())
+
+    def place_info(self, index, reviews_count):
+        template = self.seed.places[index % len(self.seed.places)]
+        return {
+            "place_id": "ChIJ" + self._tokens(1, 23, string.ascii_letters + string.digits + "-_")[0],
+            "title": template["title"],
+            "address": f"Unit {index + 1}, {template['address']}",
+            "rating": None,  # Filled in from the generated reviews
+            "reviews_count": int(reviews_count)
+        }
+
+    def reviews(self, count):
+        """`count` reviews in the SerpApi google_maps_reviews shape, newest first."""
+        if not count:
+            return []
+        ratings = self.rng.choice(np.arange(1, 6), size=count, p=self.seed.rating_weights)
+        sentence_counts = self.rng.integers(1, 5, size=count)
+        seconds_ago = np.sort(self.rng.integers(0, YEARS_OF_REVIEWS * 365 * 86400, size=count))
+        first_names = self.rng.integers(0, len(FIRST_NAMES), size=count)
+        last_names = self.rng.integers(0, len(LAST_NAMES), size=count)
+        review_ids = self._tokens(count, 68)
+        iso_dates = np.datetime_as_string(
+            np.datetime64(self.now.replace(tzinfo=None), "s") - seconds_ago.astype("timedelta64[s]")
+        )
+
+        texts = np.empty(count, dtype=object)
+        for rating in range(1, 6):
+            positions = np.flatnonzero(ratings == rating)
+            if not len(positions):
+                continue
+            pool = self.seed.sentence_arrays[rating]
+            counts = sentence_counts[positions]
+            picks = pool[self.rng.integers(0, len(pool), size=int(counts.sum()))].tolist()
+            ends = np.cumsum(counts)
+            texts[positions] = [" ".join(picks[a:b]) for a, b in zip((ends - counts).tolist(), ends.tolist())]
+
+        return [
+            {
+                "rating": float(rating),
+                "date": _relative_date(ago),
+                "iso_date": f"{iso_date}Z",
+                "source": "Google",
+                "review_id": review_id,
+                "user": {"name": f"{FIRST_NAMES[first]} {LAST_NAMES[last]}"},
+                "snippet": text
+            }
+            for rating, ago, iso_date, review_id, first, last, text in zip(
+                ratings.tolist(), seconds_ago.tolist(), iso_dates.tolist(), review_ids,
+                first_names.tolist(), last_names.tolist(), texts.tolist()
+            )
+        ]
+
+    def iter_places(self, total_reviews, places):
+        """Yield (place_info, reviews) one place at a time."""
+        for index, size in enumerate(self.place_sizes(total_reviews, places)):
+            reviews = self.reviews(int(size))
+            place_info = self.place_info(index, size)
+            if reviews:
+                place_info["rating"] = round(sum(r["rating"] for r in reviews) / len(reviews), 1)
+            yield place_info, reviews
+
+
+def _relative_date(seconds):
+    days = int(seconds // 86400)
+    if days < 1:
+        return "a day ago"
+    if days < 30:
+        return f"{days} days ago"
+    if days < 365:
+        months = days // 30
+        return "a month ago" if months == 1 else f"{months} months ago"
+    years = days // 365
+    return "a year ago" if years == 1 else f"{years} years ago"
+
+
+def write_json_files(out_dir, total_reviews, places, generator=None):
+    """Write one collector-style `<title>_<place_id>.json` file per place. Returns the review count."""
+    generator = generator or CorpusGenerator()
+    os.makedirs(out_dir, exist_ok=True)
+    written = 0
+    for place_info, reviews in generator.iter_places(total_reviews, places):
+        safe_title = place_info["title"].replace(" ", "_").replace("/", "_").lower()
+        path = os.path.join(out_dir, f"{safe_title}_{place_info['place_id']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"place_info": place_info, "reviews": reviews, "total_reviews": len(reviews)}, f, ensure_ascii=False)
+        written += len(reviews)
+    return written
+
+
+def write_csv(path, total_reviews, places, generator=None, review_column_only=False):
+    """
+    Write the combined CSV of Samples/Motilal/app.py, or with `review_column_only` a CSV with
+    just the "review" column the summarizer reads. Returns the review count.
+    """
+    generator = generator or CorpusGenerator()
+    written = 0
+    with open(path + ".tmp", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["review"] if review_column_only else COMBINED_COLUMNS)
+        for place_info, reviews in generator.iter_places(total_reviews, places):
+            if review_column_only:
+                writer.writerows([r["snippet"]] for r in reviews)
+            else:
+                writer.writerows(
+                    [place_info["place_id"], place_info["title"], place_info["address"], place_info["rating"],
+                     r["rating"], r["date"], r["snippet"], r["user"]["name"], r["review_id"], r["iso_date"]]
+                    for r in reviews
+                )
+            written += len(reviews)
+    os.replace(path + ".tmp", path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic review corpus from the sample reviews.")
+    parser.add_argument("out", help="Output CSV file, or folder with --format json")
+    parser.add_argument("--reviews", type=int, default=100000, help="Total number of reviews")
+    parser.add_argument("--places", type=int, default=500, help="Number of places (branches)")
+    parser.add_argument("--format", choices=["combined", "review", "json"], default="combined",
+                        help='"combined" (app.py CSV), "review" (summarizer CSV) or "json" (collector files)')
+    parser.add_argument("--seed-dir", default=SEED_DIR, help="Collector JSON files to learn from")
+    parser.add_argument("--random-seed", type=int, default=RANDOM_SEED)
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(SeedData(args.seed_dir), args.random_seed)
+    print(f"🧪 Generating {args.reviews} reviews over {args.places} places...")
+    if args.format == "json":
+        written = write_json_files(args.out, args.reviews, args.places, generator)
+    else:
+        written = write_csv(args.out, args.reviews, args.places, generator, review_column_only=args.format == "review")
+    print(f"✅ Wrote {written} reviews to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()